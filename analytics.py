@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analytics Module for the ASV Natz Penalty Tracker
+Keeps the penalty fact table as a pandas frame and computes reports with vectorized group-bys
+"""
+
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Columns of the fact table, in the order the loader returns them
+FRAME_COLUMNS = ["id", "date", "player_id", "penalty_type_id", "quantity", "amount_cents"]
+CATEGORY_COLUMNS = ["player_id", "penalty_type_id"]
+
+# Rolling average windows (days) of the report
+ROLLING_WINDOWS = (7, 30)
+
+
+def build_frame(records):
+    """
+    Build the fact frame from (id, date, player_id, penalty_type_id, quantity, amount_cents) rows
+
+    Players and penalty types become categorical codes, amounts stay integer cents.
+    """
+    frame = pd.DataFrame.from_records(list(records), columns=FRAME_COLUMNS)
+    frame = frame.astype({"id": "int64", "quantity": "int32", "amount_cents": "int64"})
+    frame["date"] = pd.to_datetime(frame["date"])
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].astype("int64").astype("category")
+    return frame
+
+
+def append_frame(frame, new_rows):
+    """Append newly loaded rows, keeping the categorical columns categorical"""
+    if new_rows.empty:
+        return frame
+    combined = pd.concat([frame, new_rows], ignore_index=True)
+    for column in CATEGORY_COLUMNS:
+        if not isinstance(combined[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype("int64").astype("category")
+    return combined
+
+
+class PenaltyFrameCache:
+    """
+    Per-process fact frame, refreshed from the version counters of the database
+
+    New penalties are appended by id watermark; edits and deletes (history version) force a full reload.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.version = None
+        self.history_version = None
+        self.watermark = 0
+        self.lock = threading.Lock()
+
+    def get(self, version, history_version, penalty_count, load):
+        """
+        Return the current frame
+
+        Args:
+            version (int): Data version (changes on every write)
+            history_version (int): History version (changes when existing penalties change)
+            penalty_count (int): Number of penalties in the database, catches rows committed out of id order
+            load (callable): load(after_id) returns the fact rows with a larger id
+        """
+        with self.lock:
+            if self.frame is None or history_version != self.history_version:
+                self._reload(load)
+            elif version != self.version:
+                self.frame = append_frame(self.frame, build_frame(load(self.watermark)))
+                if len(self.frame) != penalty_count:
+                    self._reload(load)
+
+            if not self.frame.empty:
+                self.watermark = int(self.frame["id"].max())
+            self.version = version
+            self.history_version = history_version
+            return self.frame
+
+    def _reload(self, load):
+        self.frame = build_frame(load(0))
+        self.watermark = 0
+
+
+def select_range(frame, date_from, date_to):
+    """Rows with date_from <= date <= date_to"""
+    dates = frame["date"]
+    return frame[(dates >= pd.Timestamp(date_from)) & (dates <= pd.Timestamp(date_to))]
+
+
+def daily_amounts(frame, date_from, date_to):
+    """Zero-filled daily totals in cents as a Series indexed by day"""
+    days = pd.date_range(date_from, date_to, freq="D")
+    selected = select_range(frame, date_from, date_to)
+    return selected.groupby("date")["amount_cents"].sum().reindex(days, fill_value=0)
+
+
+def daily_series(frame, date_from, date_to):
+    """Zero-filled chart series with running totals since date_from (starts at the first booked day)"""
+    if frame.empty:
+        return []
+    date_from = max(date_from, frame["date"].min().date())
+    if date_from > date_to:
+        return []
+
+    selected = select_range(frame, date_from, date_to)
+    days = pd.date_range(date_from, date_to, freq="D")
+    daily = selected.groupby("date").agg(penalty_count=("id", "size"), amount_cents=("amount_cents", "sum"))\
+        .reindex(days, fill_value=0)
+    cumulative = daily["amount_cents"].cumsum()
+
+    return [
+        {
+            "date": day.strftime("%Y-%m-%d"),
+            "penalty_count": int(count),
+            "daily_amount": cents / 100,
+            "cumulative_amount": running / 100
+        }
+        for day, count, cents, running in zip(days, daily["penalty_count"].tolist(),
+                                              daily["amount_cents"].tolist(), cumulative.tolist())
+    ]
+
+
+def _breakdown(selected, column, names):
+    grouped = selected.groupby(column, observed=True)["amount_cents"].agg(["size", "sum"])
+    stats = [
+        {"name": names.get(key), "count": int(count), "total": cents / 100}
+        for key, count, cents in zip(grouped.index.tolist(), grouped["size"].tolist(), grouped["sum"].tolist())
+    ]
+    return sorted(stats, key=lambda stat: (-stat["total"], stat["name"] or ""))
+
+
+def statistics(frame, date_from, date_to, player_names, penalty_type_names):
+    """Everything /statistics shows, in the structure of app.compute_statistics()"""
+    selected = select_range(frame, date_from, date_to)
+    total_count = len(selected)
+    total_amount = int(selected["amount_cents"].sum()) / 100
+
+    return {
+        "total_count": total_count,
+        "total_amount": total_amount,
+        "avg_per_penalty": total_amount / total_count if total_count > 0 else 0,
+        "max_penalty": int(selected["amount_cents"].max()) / 100 if total_count else 0.0,
+        "player_stats": _breakdown(selected, "player_id", player_names),
+        "penalty_stats": _breakdown(selected, "penalty_type_id", penalty_type_names),
+        "cumulative_data": daily_series(frame, date_from, date_to)
+    }
+
+
+def player_month_matrix(frame, date_from, date_to, player_names):
+    """Amount per player and month (all months of the range, zero-filled)"""
+    selected = select_range(frame, date_from, date_to)
+    months = pd.period_range(date_from, date_to, freq="M")
+    matrix = selected.assign(month=selected["date"].dt.to_period("M"))\
+        .pivot_table(index="player_id", columns="month", values="amount_cents",
+                     aggfunc="sum", fill_value=0, observed=True)\
+        .reindex(columns=months, fill_value=0)
+
+    return {
+        "months": [str(month) for month in months],
+        "players": [
+            {"name": player_names.get(player_id), "amounts": (row / 100).tolist(), "total": row.sum() / 100}
+            for player_id, row in zip(matrix.index.tolist(), matrix.to_numpy(dtype=np.int64))
+        ]
+    }
+
+
+def type_breakdown(frame, date_from, date_to, penalty_type_names):
+    """Count, quantity, amount and share of the total per penalty type"""
+    selected = select_range(frame, date_from, date_to)
+    grouped = selected.groupby("penalty_type_id", observed=True)\
+        .agg(count=("id", "size"), quantity=("quantity", "sum"), amount_cents=("amount_cents", "sum"))\
+        .sort_values("amount_cents", ascending=False)
+    total = grouped["amount_cents"].sum()
+    share = grouped["amount_cents"] / total if total else grouped["amount_cents"] * 0.0
+
+    return [
+        {"name": penalty_type_names.get(type_id), "count": int(count), "quantity": int(quantity),
+         "total": cents / 100, "share": round(part, 4)}
+        for type_id, count, quantity, cents, part in zip(
+            grouped.index.tolist(), grouped["count"].tolist(), grouped["quantity"].tolist(),
+            grouped["amount_cents"].tolist(), share.tolist())
+    ]
+
+
+def rolling_averages(frame, date_from, date_to, windows=ROLLING_WINDOWS):
+    """Rolling daily average amount per window, using the days before date_from as history"""
+    history_start = date_from - timedelta(days=max(windows) - 1)
+    daily = daily_amounts(frame, history_start, date_to) / 100
+    result = {"dates": [day.strftime("%Y-%m-%d") for day in daily.index if day.date() >= date_from]}
+    for window in windows:
+        averages = daily.rolling(window, min_periods=1).mean()
+        result[f"{window}d"] = averages[averages.index >= pd.Timestamp(date_from)].round(2).tolist()
+    return result
+
+
+def period_comparison(frame, date_from, date_to, player_names):
+    """Compare the range with the preceding period of the same length, overall and per player"""
+    length = date_to - date_from
+    previous_to = date_from - timedelta(days=1)
+    previous_from = previous_to - length
+
+    current = select_range(frame, date_from, date_to)
+    previous = select_range(frame, previous_from, previous_to)
+    per_player = pd.DataFrame({
+        "current": current.groupby("player_id", observed=True)["amount_cents"].sum(),
+        "previous": previous.groupby("player_id", observed=True)["amount_cents"].sum()
+    }).fillna(0).astype("int64")
+    per_player["change"] = per_player["current"] - per_player["previous"]
+    per_player = per_player.sort_values("change", ascending=False)
+
+    def totals(selected):
+        return {"count": len(selected), "total": int(selected["amount_cents"].sum()) / 100}
+
+    current_totals, previous_totals = totals(current), totals(previous)
+    change = current_totals["total"] - previous_totals["total"]
+    return {
+        "previous_from": previous_from.strftime("%Y-%m-%d"),
+        "previous_to": previous_to.strftime("%Y-%m-%d"),
+        "current": current_totals,
+        "previous": previous_totals,
+        "change": change,
+        "change_percent": round(change / previous_totals["total"] * 100, 1) if previous_totals["total"] else None,
+        "players": [
+            {"name": player_names.get(player_id), "current": cur / 100, "previous": prev / 100, "change": diff / 100}
+            for player_id, cur, prev, diff in zip(
+                per_player.index.tolist(), per_player["current"].tolist(),
+                per_player["previous"].tolist(), per_player["change"].tolist())
+        ]
+    }
+
+
+def report(frame, date_from, date_to, player_names, penalty_type_names, windows=ROLLING_WINDOWS):
+    """Full report of a date range: player×month matrix, type breakdown, rolling averages, period comparison"""
+    return {
+        "date_from": date_from.strftime("%Y-%m-%d"),
+        "date_to": date_to.strftime("%Y-%m-%d"),
+        "player_months": player_month_matrix(frame, date_from, date_to, player_names),
+        "penalty_types": type_breakdown(frame, date_from, date_to, penalty_type_names),
+        "rolling_averages": rolling_averages(frame, date_from, date_to, windows),
+        "comparison": period_comparison(frame, date_from, date_to, player_names)
+    }
@@ -5,22 +5,104 @@ ASV Natz Penalty Tracking Web Application
 Flask-based web interface for penalty management
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, session, Response, stream_with_context, abort, make_response, g, has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, Session
 from datetime import datetime, date, timedelta
 import json
 import csv
 import io
 import os
+import base64
+import hashlib
+import threading
+import time
+import queue
+import sqlite3
+import uuid
+from collections import OrderedDict, namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+import click
+import openpyxl
+import build_strafenlog
 from functools import wraps
 
+try:
+    import analytics
+except ImportError:  # pandas is optional, statistics then come from SQL only
+    analytics = None
+
+# Storage settings: SQLite (default, tuned for several workers) or a pooled Postgres URL.
+# DATABASE_URL / DB_URL select the database, same as streamlit_app.py.
+SQLITE_BUSY_TIMEOUT_MS = 10000
+SQLITE_CACHE_SIZE_KB = 20000
+POSTGRES_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POSTGRES_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+
+def database_url():
+    """Database URL from the environment, defaulting to the local SQLite file"""
+    url = os.environ.get('DATABASE_URL') or os.environ.get('DB_URL') or 'sqlite:///penalty_tracker.db'
+    # Heroku-style URLs are not accepted by SQLAlchemy; use psycopg2 (see requirements.txt) unless a driver is given
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            url = 'postgresql+psycopg2://' + url[len(prefix):]
+    return url
+
+def engine_options(url):
+    """Engine options for the backend of the URL"""
+    if url.startswith('sqlite'):
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        'pool_size': POSTGRES_POOL_SIZE,
+        'max_overflow': POSTGRES_MAX_OVERFLOW,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'pool_timeout': 30
+    }
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Let concurrent workers share the SQLite file instead of failing with 'database is locked'"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+    cursor.close()
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'asv-natz-penalty-tracker-2025'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///penalty_tracker.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
 
+# Rows fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = 1000
+# Characters buffered before a chunk of a streamed export is sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Number of date ranges whose statistics are kept in memory
+STATISTICS_CACHE_SIZE = 32
+
+# Seconds the data version used for ETags is kept in memory; writes in this process invalidate it at
+# once, writes by other processes (workers, CLI imports) show up after at most this long
+DATA_VERSION_TTL = 2.0
+
+# Penalty rows inserted per transaction by the importer
+IMPORT_BATCH_SIZE = 1000
+
+# Page sizes of the penalty list (HTML page and JSON API)
+PENALTIES_PER_PAGE = 20
+API_MAX_PER_PAGE = 100
+
 # Access codes for different roles
 ACCESS_CODES = {
     'kassier': '1970'   # Admin access for treasurer (full access)
@@ -53,6 +135,33 @@ def require_login():
         return decorated_function
     return decorator
 
+# Conditional GET: ETag derived from the data version, answered with 304 before the view runs
+def conditional_get(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Pending flash messages must be rendered, so never answer those requests with 304
+        if session.get('_flashes'):
+            return f(*args, **kwargs)
+        
+        version, updated_at = data_version_cache.get()
+        # Pages depend on the role (kassier actions) and on today's date (default ranges)
+        etag_source = f'{version}|{session.get("user_role")}|{date.today()}'
+        etag = hashlib.sha1(etag_source.encode()).hexdigest()[:20]
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            if updated_at:
+                response.last_modified = updated_at
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
 # Database Models
 class Player(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,102 +173,1546 @@ class PenaltyType(db.Model):
     amount = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(500))
 
+def to_cents(amount):
+    """Euro amount as integer cents"""
+    return int(round((amount or 0) * 100))
+
 class Penalty(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False)
     penalty_type_id = db.Column(db.Integer, db.ForeignKey('penalty_type.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
+    # Rate at booking time, so later catalog changes don't rewrite past penalties
+    unit_amount_cents = db.Column(db.Integer, nullable=False, default=0)
+    total_amount_cents = db.Column(db.Integer, nullable=False, default=0)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     player = db.relationship('Player', backref='penalties')
     penalty_type = db.relationship('PenaltyType', backref='penalties')
     
+    # Matched to the route queries: date ranges, per-player and per-type lookups, recent entries
+    __table_args__ = (
+        # Covers the grouped statistics query (date range, player, type, amount)
+        db.Index('ix_penalty_date_totals', 'date', 'player_id', 'penalty_type_id', 'total_amount_cents'),
+        db.Index('ix_penalty_player_date', 'player_id', 'date'),
+        db.Index('ix_penalty_type_date', 'penalty_type_id', 'date'),
+        db.Index('ix_penalty_created_at', 'created_at'),
+    )
+    
+    @property
+    def unit_amount(self):
+        return self.unit_amount_cents / 100
+    
     @property
     def total_amount(self):
-        return self.quantity * self.penalty_type.amount
+        return self.total_amount_cents / 100
+    
+    def set_amount(self, unit_amount):
+        """Book the penalty at the given rate (call again after changing the quantity)"""
+        self.unit_amount_cents = to_cents(unit_amount)
+        self.total_amount_cents = self.unit_amount_cents * self.quantity
+
+# Aggregate tables (kept up to date by the write routes in the same transaction)
+class PenaltyTypeDailyTotal(db.Model):
+    penalty_type_id = db.Column(db.Integer, db.ForeignKey('penalty_type.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    penalty_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+
+# Daily ledgers: one row per day (zero-filled) with running totals, overall and per player.
+# Range totals are the difference of two running totals; cents keep those differences exact.
+class DailyLedger(db.Model):
+    date = db.Column(db.Date, primary_key=True)
+    penalty_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_cents = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_count = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+class PlayerDailyLedger(db.Model):
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    penalty_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_cents = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_count = db.Column(db.Integer, nullable=False, default=0)
+    cumulative_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+# All-time totals per player (one row per player with penalties), so lists and rankings read one row
+# per player instead of summing the daily rows of the whole history
+class PlayerTotal(db.Model):
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    penalty_count = db.Column(db.Integer, nullable=False, default=0)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_player_total_cents', 'total_cents'),
+    )
+
+def player_total_columns():
+    """PlayerTotal columns as the templates expect them (player_id, penalty_count, total_amount in euro)"""
+    return (
+        PlayerTotal.player_id,
+        PlayerTotal.penalty_count,
+        (db.cast(PlayerTotal.total_cents, db.Float) / 100).label('total_amount')
+    )
+
+# Applied schema migrations (see MIGRATIONS below)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Background export jobs (see /api/jobs): status, progress (0-100) and the path of the finished file
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    result_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+# Dashboard deltas for the live stream, written in the transaction of the change (see /api/dashboard/stream)
+class DashboardEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Version counters bumped by writes, used to invalidate cached results across processes.
+# Row DATA_VERSION_ID changes on every write, REFERENCE_VERSION_ID only when players or penalty types change,
+# HISTORY_VERSION_ID when existing penalties are edited or deleted (inserts alone allow incremental refreshes).
+DATA_VERSION_ID = 1
+REFERENCE_VERSION_ID = 2
+HISTORY_VERSION_ID = 3
+
+class DataVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _bump_version(version_id):
+    result = db.session.execute(
+        db.update(DataVersion).where(DataVersion.id == version_id).values(
+            version=DataVersion.version + 1,
+            updated_at=datetime.utcnow()
+        )
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=version_id, version=1, updated_at=datetime.utcnow()))
+
+def bump_data_version(reference=False, history=False):
+    """Mark the data as changed (reference=True for players/penalty types, history=True for edited
+    or deleted penalties); runs inside the caller's transaction"""
+    _bump_version(DATA_VERSION_ID)
+    data_version_cache.invalidate()
+    # Invalidate again after the commit, a request in between may have cached the old version
+    db.session.info['data_version_bumped'] = True
+    if reference:
+        _bump_version(REFERENCE_VERSION_ID)
+    if history:
+        _bump_version(HISTORY_VERSION_ID)
+
+def current_data_version(version_id=DATA_VERSION_ID):
+    """Return the current data version (0 for a database that was never written)"""
+    row = db.session.get(DataVersion, version_id)
+    return row.version if row else 0
+
+class DataVersionCache:
+    """Per-process copy of the data version (version, updated_at) for conditional GETs, re-read after
+    DATA_VERSION_TTL seconds"""
+    
+    def __init__(self, ttl=DATA_VERSION_TTL):
+        self.ttl = ttl
+        self.entry = None
+        self.expires = 0.0
+        self.generation = 0
+        self.lock = threading.Lock()
+    
+    def get(self):
+        with self.lock:
+            if self.entry is not None and time.monotonic() < self.expires:
+                return self.entry
+            generation = self.generation
+        
+        row = db.session.get(DataVersion, DATA_VERSION_ID)
+        entry = (row.version, row.updated_at) if row else (0, None)
+        with self.lock:
+            # Don't keep a version read while a write invalidated the cache
+            if generation == self.generation:
+                self.entry = entry
+                self.expires = time.monotonic() + self.ttl
+        return entry
+    
+    def invalidate(self):
+        with self.lock:
+            self.entry = None
+            self.generation += 1
+
+data_version_cache = DataVersionCache()
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_data_version(session):
+    if session.info.pop('data_version_bumped', False):
+        data_version_cache.invalidate()
+
+# Reference data cache: players and penalty types as immutable records
+PlayerRecord = namedtuple('PlayerRecord', 'id name')
+PenaltyTypeRecord = namedtuple('PenaltyTypeRecord', 'id name amount description')
+
+class ReferenceDataCache:
+    """Per-process copy of the player and penalty type lists, reloaded when the reference version changes"""
+    
+    def __init__(self):
+        self.version = None
+        self.players = ()
+        self.penalty_types = ()
+        self.lock = threading.Lock()
+    
+    def get(self):
+        # Read the version before the lists: a concurrent write can only cause one extra reload
+        version = current_data_version(REFERENCE_VERSION_ID)
+        with self.lock:
+            if version != self.version:
+                self.players = tuple(
+                    PlayerRecord(*row)
+                    for row in db.session.query(Player.id, Player.name).order_by(Player.name)
+                )
+                self.penalty_types = tuple(
+                    PenaltyTypeRecord(*row)
+                    for row in db.session.query(
+                        PenaltyType.id, PenaltyType.name, PenaltyType.amount, PenaltyType.description
+                    ).order_by(PenaltyType.name)
+                )
+                self.version = version
+            return self.players, self.penalty_types
+
+reference_cache = ReferenceDataCache()
+
+def reference_data():
+    """Return (players, penalty_types) sorted by name, served from the reference cache"""
+    return reference_cache.get()
+
+# Aggregate model and the penalty columns it is grouped by (besides the date)
+AGGREGATE_MODELS = (
+    (PenaltyTypeDailyTotal, ('penalty_type_id',)),
+)
+
+def aggregate_rows(query):
+    """Fetch the columns the aggregate tables need for the penalties of a query"""
+    return query.with_entities(
+        Penalty.player_id,
+        Penalty.penalty_type_id,
+        Penalty.date,
+        Penalty.total_amount_cents
+    ).all()
+
+def upsert(model):
+    """INSERT ... ON CONFLICT statement for the session's backend (SQLite and Postgres)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql_insert(model)
+    return sqlite_insert(model)
+
+def upsert_increment(model, index_elements, columns, rows):
+    """Insert rows or add their columns to the existing rows with the same key, in one executemany.
+
+    Concurrent writers creating the same row don't fail, the second one increments it.
+    """
+    if not rows:
+        return
+    statement = upsert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: getattr(model, column) + getattr(statement.excluded, column) for column in columns}
+    )
+    db.session.execute(statement, rows)
+
+def update_aggregates(rows, sign=1):
+    """Add (sign=1) or remove (sign=-1) penalty rows from the aggregate tables and ledgers.
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    deltas = {model: {} for model, _ in AGGREGATE_MODELS + LEDGER_MODELS}
+    for player_id, penalty_type_id, penalty_date, total_cents in rows:
+        values = {'player_id': player_id, 'penalty_type_id': penalty_type_id}
+        for model, keys in AGGREGATE_MODELS + LEDGER_MODELS:
+            key = tuple(values[k] for k in keys) + (penalty_date,)
+            count, cents = deltas[model].get(key, (0, 0))
+            deltas[model][key] = (count + sign, cents + sign * total_cents)
+    
+    for model, keys in AGGREGATE_MODELS:
+        columns = keys + ('date',)
+        # Increment in SQL so concurrent writers don't lose updates
+        upsert_increment(model, columns, ('penalty_count', 'total_amount'), [
+            dict(zip(columns, key), penalty_count=count, total_amount=cents / 100)
+            for key, (count, cents) in deltas[model].items()
+        ])
+        db.session.execute(db.delete(model).where(model.penalty_count <= 0))
+    
+    update_ledgers(deltas)
+    update_player_totals(deltas[PlayerDailyLedger])
+
+def update_player_totals(player_day_deltas):
+    """Apply the (player_id, date) deltas of update_aggregates() to the all-time player totals"""
+    totals = {}
+    for (player_id, _), (count, cents) in player_day_deltas.items():
+        total_count, total_cents = totals.get(player_id, (0, 0))
+        totals[player_id] = (total_count + count, total_cents + cents)
+    
+    upsert_increment(PlayerTotal, ('player_id',), ('penalty_count', 'total_cents'), [
+        {'player_id': player_id, 'penalty_count': count, 'total_cents': cents}
+        for player_id, (count, cents) in totals.items() if count or cents
+    ])
+    if any(count < 0 for count, _ in totals.values()):
+        db.session.execute(db.delete(PlayerTotal).where(PlayerTotal.penalty_count <= 0))
+
+def compute_aggregates():
+    """Compute the aggregate rows from scratch out of the penalty table"""
+    result = {}
+    for model, keys in AGGREGATE_MODELS:
+        group_columns = [getattr(Penalty, k) for k in keys] + [Penalty.date]
+        rows = db.session.query(
+            *group_columns,
+            db.func.count(Penalty.id),
+            db.func.sum(Penalty.total_amount_cents)
+        ).group_by(*group_columns)\
+         .all()
+        result[model] = {tuple(row[:-2]): (row[-2], (row[-1] or 0) / 100) for row in rows}
+    return result
+
+def rebuild_aggregates():
+    """Rebuild all aggregate tables and return the number of rows that were inconsistent"""
+    expected = compute_aggregates()
+    mismatches = 0
+    
+    for model, keys in AGGREGATE_MODELS:
+        columns = keys + ('date',)
+        stored = {
+            tuple(getattr(row, c) for c in columns): (row.penalty_count, row.total_amount)
+            for row in model.query.all()
+        }
+        for key in set(stored) | set(expected[model]):
+            stored_row = stored.get(key)
+            expected_row = expected[model].get(key)
+            if stored_row is None or expected_row is None \
+                    or stored_row[0] != expected_row[0] \
+                    or abs(stored_row[1] - expected_row[1]) > 0.005:
+                mismatches += 1
+        
+        db.session.execute(db.delete(model))
+        if expected[model]:
+            db.session.execute(db.insert(model), [
+                dict(zip(columns, key), penalty_count=count, total_amount=total)
+                for key, (count, total) in expected[model].items()
+            ])
+    
+    mismatches += rebuild_ledgers()
+    mismatches += rebuild_player_totals()
+    db.session.commit()
+    return mismatches
+
+def rebuild_player_totals():
+    """Rewrite the all-time player totals from the penalty table, returns the number of inconsistent rows;
+    the caller commits"""
+    expected = {
+        player_id: (count, cents or 0) for player_id, count, cents in db.session.query(
+            Penalty.player_id,
+            db.func.count(Penalty.id),
+            db.func.sum(Penalty.total_amount_cents)
+        ).group_by(Penalty.player_id)
+    }
+    stored = {row.player_id: (row.penalty_count, row.total_cents) for row in PlayerTotal.query.all()}
+    mismatches = sum(1 for player_id in set(stored) | set(expected)
+                     if stored.get(player_id) != expected.get(player_id))
+    
+    db.session.execute(db.delete(PlayerTotal))
+    if expected:
+        db.session.execute(db.insert(PlayerTotal), [
+            {'player_id': player_id, 'penalty_count': count, 'total_cents': cents}
+            for player_id, (count, cents) in expected.items()
+        ])
+    return mismatches
+
+# Postgres advisory lock held by the transaction that updates the ledgers
+LEDGER_LOCK_ID = 0x4C454447
+
+# Ledger model and its scope columns (besides the date)
+LEDGER_MODELS = (
+    (DailyLedger, ()),
+    (PlayerDailyLedger, ('player_id',)),
+)
+
+def _days(first, last):
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+def _ledger_row(criteria, day, count=0, cents=0, cumulative_count=0, cumulative_cents=0):
+    return dict(criteria, date=day, penalty_count=count, amount_cents=cents,
+                cumulative_count=cumulative_count, cumulative_cents=cumulative_cents)
+
+def extend_ledger(model, criteria, first_date, last_date):
+    """Add zero days so the ledger of one scope covers first_date..last_date"""
+    start, end = db.session.query(db.func.min(model.date), db.func.max(model.date))\
+        .filter_by(**criteria).one()
+    
+    rows = []
+    if start is None:
+        rows = [_ledger_row(criteria, day) for day in _days(first_date, last_date)]
+    else:
+        if first_date < start:
+            rows += [_ledger_row(criteria, day) for day in _days(first_date, start - timedelta(days=1))]
+        if last_date > end:
+            carry = db.session.query(model.cumulative_count, model.cumulative_cents)\
+                .filter_by(date=end, **criteria).one()
+            rows += [_ledger_row(criteria, day, cumulative_count=carry[0], cumulative_cents=carry[1])
+                     for day in _days(end + timedelta(days=1), last_date)]
+    if rows:
+        db.session.execute(upsert(model).on_conflict_do_nothing(), rows)
+
+def update_ledgers(deltas):
+    """Apply the per-day deltas of update_aggregates() to the ledgers and every later running total.
+
+    Each touched day adds its delta to its own row and the delta accumulated so far to the running totals
+    up to the next touched day, so every ledger row of a scope is written at most once.
+    """
+    # Running totals are read (extend_ledger) and shifted by ranges, so writers must take turns;
+    # SQLite already allows only one writer, on Postgres the lock is released at commit
+    if any(deltas[model] for model, _ in LEDGER_MODELS) and db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(db.text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': LEDGER_LOCK_ID})
+    
+    for model, keys in LEDGER_MODELS:
+        scopes = {}
+        for key, delta in deltas[model].items():
+            if delta != (0, 0):
+                scopes.setdefault(key[:-1], {})[key[-1]] = delta
+        
+        params = []
+        for scope, days in scopes.items():
+            criteria = dict(zip(keys, scope))
+            extend_ledger(model, criteria, min(days), max(days))
+            running_count = running_cents = 0
+            touched = sorted(days)
+            for day, until in zip(touched, touched[1:] + [date.max]):
+                count, cents = days[day]
+                running_count += count
+                running_cents += cents
+                params.append(dict({f'scope_{k}': v for k, v in criteria.items()},
+                                   day=day, until=until, day_count=count, day_cents=cents,
+                                   running_count=running_count, running_cents=running_cents))
+        if not params:
+            continue
+        
+        table = model.__table__
+        is_day = table.c.date == db.bindparam('day')
+        db.session.execute(
+            db.update(table).where(
+                *(table.c[k] == db.bindparam(f'scope_{k}') for k in keys),
+                table.c.date >= db.bindparam('day'),
+                table.c.date < db.bindparam('until')
+            ).values(
+                penalty_count=table.c.penalty_count + db.case((is_day, db.bindparam('day_count')), else_=0),
+                amount_cents=table.c.amount_cents + db.case((is_day, db.bindparam('day_cents')), else_=0),
+                cumulative_count=table.c.cumulative_count + db.bindparam('running_count'),
+                cumulative_cents=table.c.cumulative_cents + db.bindparam('running_cents')
+            ),
+            params
+        )
+
+def compute_ledgers():
+    """Ledger rows of every scope from scratch: {model: {scope: [row dict, ...]}}"""
+    result = {}
+    for model, keys in LEDGER_MODELS:
+        group_columns = [getattr(Penalty, k) for k in keys] + [Penalty.date]
+        daily = {}
+        for *key, count, cents in db.session.query(
+            *group_columns,
+            db.func.count(Penalty.id),
+            db.func.sum(Penalty.total_amount_cents)
+        ).group_by(*group_columns):
+            daily.setdefault(tuple(key[:-1]), {})[key[-1]] = (count, cents or 0)
+        
+        result[model] = {}
+        for scope, days in daily.items():
+            criteria = dict(zip(keys, scope))
+            rows = []
+            cumulative_count = cumulative_cents = 0
+            for day in _days(min(days), max(days)):
+                count, cents = days.get(day, (0, 0))
+                cumulative_count += count
+                cumulative_cents += cents
+                rows.append(_ledger_row(criteria, day, count, cents, cumulative_count, cumulative_cents))
+            result[model][scope] = rows
+    return result
+
+def rebuild_ledgers():
+    """Rewrite the ledgers from the penalty table, returns the number of inconsistent rows; the caller commits"""
+    expected = compute_ledgers()
+    columns = ('penalty_count', 'amount_cents', 'cumulative_count', 'cumulative_cents')
+    mismatches = 0
+    
+    for model, keys in LEDGER_MODELS:
+        stored = {}
+        for row in model.query.all():
+            scope = tuple(getattr(row, k) for k in keys)
+            stored.setdefault(scope, {})[row.date] = tuple(getattr(row, c) for c in columns)
+        
+        for scope in set(stored) | set(expected[model]):
+            rows = expected[model].get(scope, [])
+            expected_days = {row['date']: tuple(row[c] for c in columns) for row in rows}
+            stored_days = stored.get(scope, {})
+            mismatches += sum(1 for day in expected_days if day not in stored_days)
+            # Stored days outside the expected range must be zero days carrying the running total
+            final = (0, 0, rows[-1]['cumulative_count'], rows[-1]['cumulative_cents']) if rows else (0, 0, 0, 0)
+            for day, values in stored_days.items():
+                if day in expected_days:
+                    expected_values = expected_days[day]
+                elif rows and day > rows[-1]['date']:
+                    expected_values = final
+                else:
+                    expected_values = (0, 0, 0, 0)
+                if values != expected_values:
+                    mismatches += 1
+        
+        db.session.execute(db.delete(model))
+        rows = [row for scope_rows in expected[model].values() for row in scope_rows]
+        if rows:
+            db.session.execute(db.insert(model), rows)
+    
+    return mismatches
+
+def _ledger_scope(player_id=None):
+    if player_id:
+        return PlayerDailyLedger, {'player_id': player_id}
+    return DailyLedger, {}
+
+def _running_total(model, criteria, day=None):
+    """(count, cents) of all penalties up to and including day (None: all)"""
+    query = db.session.query(model.cumulative_count, model.cumulative_cents).filter_by(**criteria)
+    if day is not None:
+        query = query.filter(model.date <= day)
+    row = query.order_by(model.date.desc()).first()
+    return (row[0], row[1]) if row else (0, 0)
+
+def ledger_total(date_from=None, date_to=None, player_id=None):
+    """Penalty count and amount of a date range (open ends allowed), returns (count, amount)"""
+    # An inverted range is empty; the difference of the two running totals would be negative
+    if date_from is not None and date_to is not None and date_from > date_to:
+        return 0, 0.0
+    model, criteria = _ledger_scope(player_id)
+    end_count, end_cents = _running_total(model, criteria, date_to)
+    start_count, start_cents = (0, 0) if date_from is None \
+        else _running_total(model, criteria, date_from - timedelta(days=1))
+    return end_count - start_count, (end_cents - start_cents) / 100
+
+def ledger_series(date_from, date_to, player_id=None):
+    """Zero-filled daily amounts and running totals since date_from for a chart.
+
+    Starts at the first booked day if date_from lies before it.
+    """
+    model, criteria = _ledger_scope(player_id)
+    first_day = db.session.query(db.func.min(model.date)).filter_by(**criteria)\
+        .filter(model.cumulative_count > 0).scalar()
+    if first_day is None or first_day > date_to:
+        return []
+    date_from = max(date_from, first_day)
+    
+    rows = {
+        row.date: row for row in model.query.filter_by(**criteria)
+            .filter(model.date >= date_from, model.date <= date_to)
+    }
+    base_count, base_cents = _running_total(model, criteria, date_from - timedelta(days=1))
+    
+    series = []
+    cumulative_cents = base_cents
+    for day in _days(date_from, date_to):
+        row = rows.get(day)
+        # Days after the last booked day carry the running total
+        if row:
+            cumulative_cents = row.cumulative_cents
+        series.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'penalty_count': row.penalty_count if row else 0,
+            'daily_amount': row.amount_cents / 100 if row else 0.0,
+            'cumulative_amount': (cumulative_cents - base_cents) / 100
+        })
+    return series
+
+# Schema migrations for existing databases; db.create_all() only adds missing tables.
+# Each migration must be idempotent, as fresh databases already get the current schema.
+def migrate_penalty_indexes():
+    # Index set of this migration; later migrations replace some of them
+    indexes = (
+        ('ix_penalty_date_player', 'date, player_id'),
+        ('ix_penalty_player_date', 'player_id, date'),
+        ('ix_penalty_type_date', 'penalty_type_id, date'),
+        ('ix_penalty_created_at', 'created_at'),
+    )
+    for name, columns in indexes:
+        db.session.execute(db.text(f'CREATE INDEX IF NOT EXISTS {name} ON penalty ({columns})'))
+
+def migrate_penalty_amounts():
+    """Add the booked amount columns and fill them from the current catalog rates"""
+    connection = db.session.connection()
+    columns = {column['name'] for column in db.inspect(connection).get_columns('penalty')}
+    for column in ('unit_amount_cents', 'total_amount_cents'):
+        if column not in columns:
+            connection.execute(db.text(f'ALTER TABLE penalty ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'))
+    
+    unit_amount = db.select(db.func.round(PenaltyType.amount * 100))\
+        .where(PenaltyType.id == Penalty.penalty_type_id)\
+        .scalar_subquery()
+    connection.execute(db.update(Penalty).values(unit_amount_cents=db.cast(unit_amount, db.Integer)))
+    connection.execute(db.update(Penalty).values(total_amount_cents=Penalty.unit_amount_cents * Penalty.quantity))
+    
+    # The covering statistics index replaces ix_penalty_date_player
+    connection.execute(db.text('DROP INDEX IF EXISTS ix_penalty_date_player'))
+    for index in Penalty.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+def drop_daily_totals():
+    """Drop the overall and per-player daily totals, the ledgers carry the same numbers"""
+    for table in ('daily_total', 'player_daily_total'):
+        db.session.execute(db.text(f'DROP TABLE IF EXISTS {table}'))
+
+MIGRATIONS = [
+    (1, 'Composite indexes on penalty', migrate_penalty_indexes),
+    (2, 'Booked amounts on penalty in cents', migrate_penalty_amounts),
+    (3, 'Daily ledgers with running totals', rebuild_ledgers),
+    (4, 'All-time totals per player', rebuild_player_totals),
+    (5, 'Daily totals replaced by the ledgers', drop_daily_totals),
+]
+
+def run_migrations():
+    """Create missing tables and apply pending migrations, returns the applied versions"""
+    db.create_all()
+    applied = {row.version for row in SchemaMigration.query.all()}
+    
+    newly_applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate()
+        db.session.add(SchemaMigration(version=version, name=name))
+        db.session.commit()
+        newly_applied.append(version)
+    
+    return newly_applied
+
+# Default data seeded by init_database()
+DEFAULT_PLAYERS = [
+    "Maximilian Hofer", "Hannes Peintner", "Alex Braunhofer", "Alex Schraffel",
+    "Andreas Fusco", "Armin Feretti", "Hannes Larcher", "Julian Brunner",
+    "Leo Tauber", "Lukas Mayr", "Manuel Troger", "Martin Gasser",
+    "Matthias Schmid", "Maximilian Schraffl", "Michael Mitterrutzner", "Michael Peintner",
+    "Patrick Auer", "Patrick Pietersteiner", "Stefan Filo", "Stefan Peintner",
+    "Manuel Auer", "Mauro Monti", "Tobias", "Jakob Unterholzner",
+    "Fabian Bacher", "Emil Gabrieli", "Mardochee", "Oleg Schleiermann"
+]
+
+DEFAULT_PENALTY_TYPES = [
+    ("Unentschuldigtes Fehlen im Trainingslager", 50, ""),
+    ("Bier bei Essen Trainingslager", 10, ""),
+    ("Busfahrer pflanzen", 5, ""),
+    ("Alpha Aktion", 5, ""),
+    ("Ball in Q5", 2, ""),
+    ("Socken ohschneiden", 20, ""),
+    ("Valentinstog fahln", 50, ""),
+    ("Abschlussmatch verloren", 2, ""),
+    ("Fehlen beim Spiel wegen Urlaub", 30, ""),
+    ("Abwesenheit Urlaub während Meisterschaft", 10, ""),
+    ("Unentschuldigtes Fehlen Spiel", 50, ""),
+    ("Unentschieden Meisterschaftsspiel", 1, ""),
+    ("Niederlage Meisterschaftsspiel", 2, ""),
+    ("Spiel Socken ohschneiden", 20, ""),
+    ("Elfer verursachen", 10, ""),
+    ("Unentschuldigtes Fehlen beim Training", 20, ""),
+    ("100%ige Chance liegen lossen", 5, ""),
+    ("Falscher Einwurf", 5, ""),
+    ("Elfer verschiaßn", 10, ""),
+    ("Tormonn Papelle kregn", 5, ""),
+    ("Freitig glei nochn Training gian", 2, ""),
+    ("Schuache in Kabine ohklopfn", 5, ""),
+    ("Kistenplan net einholten /pro Kopf", 30, ""),
+    ("Übung bei training vertschecken", 1, ""),
+    ("Torello 20 Pässe", 2, ""),
+    ("Übern tennisplotz mit FB schuach gian", 5, ""),
+    ("Nochn training gian ohne eps zu verraumen", 5, ""),
+    ("Gelbsperre/Rotsperre pro Spiel", 15, ""),
+    ("Kabinendienst vernachlässigt", 10, ""),
+    ("Freitags Abschluss-Spiel verloren", 2, ""),
+    ("Abwesenheit Urlaub in Vorbereitung", 5, ""),
+    ("Glei nochn Hoamspiel gian(min 30 min.)", 10, ""),
+    ("Saufn vorn Spiel", 50, ""),
+    ("Unsportliches Verhalten gegenüber Mitspieler/Trai", 50, ""),
+    ("Erstes Tor/Startelfeinsatz", 0, "Kasten (ansonsten 20€)"),
+    ("Eigentor", 0, "Kasten (ansonsten 20€)"),
+    ("Foto in Zeitung/Online", 2, ""),
+    ("Sachen in Kabine/Platz vergessen", 5, ""),
+    ("Unentschuldigtes fehlen beim Training ohne Absage", 15, ""),
+    ("Rauchen im Trikot", 15, ""),
+    ("Bei Spiel folscher Trainer", 20, ""),
+    ("Folsches Trainingsgewond", 5, ""),
+    ("Handy leitn in do kabine", 5, ""),
+    ("Schiffn in do Dusche", 20, ""),
+    ("Oan setzn in do Kabine (wenns stinkt 20€)", 5, ""),
+    ("Frau/freindin fa an Mitspieler verraumen", 500, ""),
+    ("Geburtstogsessen net innerholb 1 Monat gebrocht", 150, ""),
+    ("Rote Karte wegn Unsportlichkeit", 50, ""),
+    ("Gelbe Karte wegn Unsportlichkeit", 20, ""),
+    ("Zu spät - Pauschale", 5, "")
+]
 
 def init_database():
     """Initialize database with default data"""
-    db.create_all()
+    run_migrations()
     
     # Add players if not exist
     if Player.query.count() == 0:
-        players = [
-            "Maximilian Hofer", "Hannes Peintner", "Alex Braunhofer", "Alex Schraffel",
-            "Andreas Fusco", "Armin Feretti", "Hannes Larcher", "Julian Brunner",
-            "Leo Tauber", "Lukas Mayr", "Manuel Troger", "Martin Gasser",
-            "Matthias Schmid", "Maximilian Schraffl", "Michael Mitterrutzner", "Michael Peintner",
-            "Patrick Auer", "Patrick Pietersteiner", "Stefan Filo", "Stefan Peintner",
-            "Manuel Auer", "Mauro Monti", "Tobias", "Jakob Unterholzner",
-            "Fabian Bacher", "Emil Gabrieli", "Mardochee", "Oleg Schleiermann"
-        ]
-        
-        for player_name in players:
+        for player_name in DEFAULT_PLAYERS:
             player = Player(name=player_name)
             db.session.add(player)
     
     # Add penalty types if not exist
     if PenaltyType.query.count() == 0:
-        penalties = [
-            ("Unentschuldigtes Fehlen im Trainingslager", 50, ""),
-            ("Bier bei Essen Trainingslager", 10, ""),
-            ("Busfahrer pflanzen", 5, ""),
-            ("Alpha Aktion", 5, ""),
-            ("Ball in Q5", 2, ""),
-            ("Socken ohschneiden", 20, ""),
-            ("Valentinstog fahln", 50, ""),
-            ("Abschlussmatch verloren", 2, ""),
-            ("Fehlen beim Spiel wegen Urlaub", 30, ""),
-            ("Abwesenheit Urlaub während Meisterschaft", 10, ""),
-            ("Unentschuldigtes Fehlen Spiel", 50, ""),
-            ("Unentschieden Meisterschaftsspiel", 1, ""),
-            ("Niederlage Meisterschaftsspiel", 2, ""),
-            ("Spiel Socken ohschneiden", 20, ""),
-            ("Elfer verursachen", 10, ""),
-            ("Unentschuldigtes Fehlen beim Training", 20, ""),
-            ("100%ige Chance liegen lossen", 5, ""),
-            ("Falscher Einwurf", 5, ""),
-            ("Elfer verschiaßn", 10, ""),
-            ("Tormonn Papelle kregn", 5, ""),
-            ("Freitig glei nochn Training gian", 2, ""),
-            ("Schuache in Kabine ohklopfn", 5, ""),
-            ("Kistenplan net einholten /pro Kopf", 30, ""),
-            ("Übung bei training vertschecken", 1, ""),
-            ("Torello 20 Pässe", 2, ""),
-            ("Übern tennisplotz mit FB schuach gian", 5, ""),
-            ("Nochn training gian ohne eps zu verraumen", 5, ""),
-            ("Gelbsperre/Rotsperre pro Spiel", 15, ""),
-            ("Kabinendienst vernachlässigt", 10, ""),
-            ("Freitags Abschluss-Spiel verloren", 2, ""),
-            ("Abwesenheit Urlaub in Vorbereitung", 5, ""),
-            ("Glei nochn Hoamspiel gian(min 30 min.)", 10, ""),
-            ("Saufn vorn Spiel", 50, ""),
-            ("Unsportliches Verhalten gegenüber Mitspieler/Trai", 50, ""),
-            ("Erstes Tor/Startelfeinsatz", 0, "Kasten (ansonsten 20€)"),
-            ("Eigentor", 0, "Kasten (ansonsten 20€)"),
-            ("Foto in Zeitung/Online", 2, ""),
-            ("Sachen in Kabine/Platz vergessen", 5, ""),
-            ("Unentschuldigtes fehlen beim Training ohne Absage", 15, ""),
-            ("Rauchen im Trikot", 15, ""),
-            ("Bei Spiel folscher Trainer", 20, ""),
-            ("Folsches Trainingsgewond", 5, ""),
-            ("Handy leitn in do kabine", 5, ""),
-            ("Schiffn in do Dusche", 20, ""),
-            ("Oan setzn in do Kabine (wenns stinkt 20€)", 5, ""),
-            ("Frau/freindin fa an Mitspieler verraumen", 500, ""),
-            ("Geburtstogsessen net innerholb 1 Monat gebrocht", 150, ""),
-            ("Rote Karte wegn Unsportlichkeit", 50, ""),
-            ("Gelbe Karte wegn Unsportlichkeit", 20, ""),
-            ("Zu spät - Pauschale", 5, "")
-        ]
-        
-        for name, amount, description in penalties:
+        for name, amount, description in DEFAULT_PENALTY_TYPES:
             penalty_type = PenaltyType(name=name, amount=amount, description=description)
             db.session.add(penalty_type)
     
+    if db.session.new:
+        bump_data_version(reference=True)
     db.session.commit()
+    
+    # Fill the aggregate tables and ledgers for databases created before they existed
+    if DailyLedger.query.first() is None and Penalty.query.first() is not None:
+        rebuild_aggregates()
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Upgrade an existing database to the current schema"""
+    versions = run_migrations()
+    if versions:
+        click.echo(f'✅ Migrationen angewendet: {", ".join(map(str, versions))}')
+    else:
+        click.echo('✅ Datenbank ist aktuell')
+
+@app.cli.command('rebuild-aggregates')
+def rebuild_aggregates_command():
+    """Recompute the aggregate tables from scratch and check their consistency"""
+    db.create_all()
+    mismatches = rebuild_aggregates()
+    if mismatches:
+        click.echo(f'⚠️  {mismatches} inkonsistente Summenzeilen korrigiert')
+    else:
+        click.echo('✅ Summentabellen sind konsistent')
+
+# Request metrics: latency, SQL and template cost per endpoint, exported at /metrics (Prometheus text format).
+# Counters live in the process, so with several workers every worker reports its own series.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# SERVER_TIMING=1 adds the db/tpl/app breakdown of every request as Server-Timing header (browser devtools)
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '0') == '1'
+# Bearer token required by /metrics when set
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+class RequestTiming:
+    """Cost of the current request, collected by the engine and template signal hooks"""
+    __slots__ = ('start', 'sql_count', 'sql_seconds', 'template_seconds', 'template_start')
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_start = None
+
+class Histogram:
+    """Cumulative Prometheus histogram (bucket counts, sum and count)"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+    
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+class RequestMetrics:
+    """Per-endpoint request metrics of this process"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._endpoints = {}
+    
+    def record(self, endpoint, method, status, timing, duration, size):
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = {
+                    'latency': Histogram(METRICS_LATENCY_BUCKETS),
+                    'size': Histogram(METRICS_SIZE_BUCKETS),
+                    'sql_count': 0,
+                    'sql_seconds': 0.0,
+                    'template_seconds': 0.0
+                }
+            metrics = self._endpoints[endpoint]
+            metrics['latency'].observe(duration)
+            metrics['size'].observe(size)
+            metrics['sql_count'] += timing.sql_count
+            metrics['sql_seconds'] += timing.sql_seconds
+            metrics['template_seconds'] += timing.template_seconds
+    
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = ['# HELP penalty_tracker_requests_total Handled HTTP requests',
+                     '# TYPE penalty_tracker_requests_total counter']
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'penalty_tracker_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            
+            histograms = [('penalty_tracker_request_duration_seconds', 'latency', 'Request latency until the response is sent'),
+                          ('penalty_tracker_response_size_bytes', 'size', 'Response body size')]
+            for name, key, help_text in histograms:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, metrics in sorted(self._endpoints.items()):
+                    lines += metrics[key].lines(name, f'endpoint="{endpoint}"')
+            
+            counters = [('penalty_tracker_db_statements_total', 'sql_count', 'SQL statements executed', '{}'),
+                        ('penalty_tracker_db_seconds_total', 'sql_seconds', 'Time spent in SQL statements', '{:.6f}'),
+                        ('penalty_tracker_template_seconds_total', 'template_seconds', 'Time spent rendering templates', '{:.6f}')]
+            for name, key, help_text, value_format in counters:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, metrics in sorted(self._endpoints.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} ' + value_format.format(metrics[key]))
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+def current_timing():
+    """RequestTiming of the active request, None outside of requests"""
+    return g.get('request_timing') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('statement_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    timing = current_timing()
+    if timing:
+        timing.sql_count += 1
+        timing.sql_seconds += elapsed
+    if elapsed * 1000 >= app.config['SLOW_QUERY_THRESHOLD_MS']:
+        slow_query_log.record(conn, cursor, statement, parameters, executemany, elapsed)
+
+@event.listens_for(Engine, 'handle_error')
+def discard_statement_timer(exception_context):
+    # after_cursor_execute is skipped for failing statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('statement_start'):
+        connection.info['statement_start'].pop()
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    timing = current_timing()
+    if timing:
+        timing.template_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    timing = current_timing()
+    if timing and timing.template_start is not None:
+        timing.template_seconds += time.perf_counter() - timing.template_start
+        timing.template_start = None
+
+@app.before_request
+def start_request_timer():
+    g.request_timing = RequestTiming()
+
+@app.after_request
+def record_request_metrics(response):
+    timing = g.get('request_timing')
+    if timing is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    
+    if app.config['SERVER_TIMING']:
+        elapsed = time.perf_counter() - timing.start
+        app_seconds = max(elapsed - timing.sql_seconds - timing.template_seconds, 0)
+        response.headers['Server-Timing'] = \
+            f'db;dur={timing.sql_seconds * 1000:.1f};desc="{timing.sql_count} SQL", ' \
+            f'tpl;dur={timing.template_seconds * 1000:.1f}, app;dur={app_seconds * 1000:.1f}'
+    
+    # calculate_content_length() would buffer a generator body, so only ask for sequences
+    size = response.calculate_content_length() if response.is_sequence else None
+    if size is None:
+        # Streamed bodies (CSV export, event stream) are measured once the server has sent the last chunk
+        sent = [0]
+        response.response = _counting_iterable(response.response, sent)
+        response.call_on_close(lambda: request_metrics.record(
+            endpoint, method, response.status_code, timing, time.perf_counter() - timing.start, sent[0]))
+    else:
+        request_metrics.record(endpoint, method, response.status_code, timing,
+                               time.perf_counter() - timing.start, size)
+    return response
+
+def _counting_iterable(body, sent):
+    for chunk in body:
+        sent[0] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield chunk
+
+# Slow-query log: statements above the threshold with parameters, endpoint and query plan (admin page /admin/slow_queries)
+app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', 100))
+# Statements whose plan is captured (EXPLAIN of anything else is not useful or not allowed)
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+SlowQuery = namedtuple('SlowQuery', ['timestamp', 'duration_ms', 'endpoint', 'statement', 'parameters', 'plan'])
+
+class SlowQueryLog:
+    """Ring buffer of the last slow statements of this process"""
+    
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+    
+    def record(self, conn, cursor, statement, parameters, executemany, elapsed):
+        endpoint = request.endpoint if has_request_context() else None
+        if executemany:
+            plan = f'executemany ({len(parameters)} Zeilen), kein Plan'
+        else:
+            plan = explain_statement(conn, cursor, statement, parameters)
+        entry = SlowQuery(datetime.now(), elapsed * 1000, endpoint or '-', statement,
+                          _format_parameters(parameters), plan)
+        with self._lock:
+            self._entries.append(entry)
+        app.logger.warning('Langsame Abfrage (%.1f ms, %s): %s', entry.duration_ms, entry.endpoint, ' '.join(statement.split()))
+    
+    def entries(self):
+        """Newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_LOG_SIZE)
+
+def _format_parameters(parameters, limit=500):
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + '…'
+
+def explain_statement(conn, cursor, statement, parameters):
+    """Query plan of a statement that has just run, on the same DBAPI connection (no engine events)"""
+    if not statement.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    explain_cursor = cursor.connection.cursor()
+    try:
+        explain_cursor.execute(prefix + statement, parameters)
+        rows = explain_cursor.fetchall()
+    except Exception as e:
+        return f'EXPLAIN fehlgeschlagen: {e}'
+    finally:
+        explain_cursor.close()
+    if conn.dialect.name == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(row[3] for row in rows)
+    return '\n'.join(row[0] for row in rows)
+
+# Shared filters of the penalty list and exports
+def penalty_filters():
+    """Read the player/date filters of the current request"""
+    return {
+        'player': request.args.get('player'),
+        'date_from': request.args.get('date_from'),
+        'date_to': request.args.get('date_to')
+    }
+
+def validate_penalty_filters(filters):
+    """Raise ValueError unless the player filter is a number and the dates are YYYY-MM-DD"""
+    if filters['player']:
+        int(filters['player'])
+    for key in ('date_from', 'date_to'):
+        if filters[key]:
+            datetime.strptime(filters[key], '%Y-%m-%d')
+
+def apply_penalty_filters(query, filters):
+    """Restrict a penalty query to the given player/date filters"""
+    if filters['player']:
+        query = query.filter(Penalty.player_id == filters['player'])
+    
+    if filters['date_from']:
+        date_from_obj = datetime.strptime(filters['date_from'], '%Y-%m-%d').date()
+        query = query.filter(Penalty.date >= date_from_obj)
+    
+    if filters['date_to']:
+        date_to_obj = datetime.strptime(filters['date_to'], '%Y-%m-%d').date()
+        query = query.filter(Penalty.date <= date_to_obj)
+    
+    return query
+
+# Keyset pagination over (date, id), newest first
+def encode_cursor(penalty, newer=False):
+    """Build the opaque cursor pointing after (or with newer=True: before) the given penalty"""
+    raw = f'{penalty.date.isoformat()}|{penalty.id}' + ('|newer' if newer else '')
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (date, id, newer) of a cursor, raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_date, cursor_id, *direction = raw.split('|')
+        if direction not in ([], ['newer']):
+            raise ValueError(raw)
+        return datetime.strptime(cursor_date, '%Y-%m-%d').date(), int(cursor_id), bool(direction)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Ungültiger Cursor: {cursor}') from e
+
+def penalty_list_query(filters, cursor=None):
+    """Filtered penalty query ordered newest first, starting after the cursor.
+
+    A newer cursor reads the penalties before it in ascending order; penalty_page() reverses them.
+    """
+    query = Penalty.query.options(joinedload(Penalty.player), joinedload(Penalty.penalty_type))
+    query = apply_penalty_filters(query, filters)
+    
+    if cursor:
+        cursor_date, cursor_id, newer = decode_cursor(cursor)
+        if newer:
+            return query.filter(tuple_(Penalty.date, Penalty.id) > (cursor_date, cursor_id))\
+                .order_by(Penalty.date, Penalty.id)
+        query = query.filter(tuple_(Penalty.date, Penalty.id) < (cursor_date, cursor_id))
+    
+    return query.order_by(Penalty.date.desc(), Penalty.id.desc())
+
+def recent_penalties_query(limit=10):
+    """Most recently booked penalties (dashboard)"""
+    return Penalty.query\
+        .options(joinedload(Penalty.player), joinedload(Penalty.penalty_type))\
+        .order_by(Penalty.created_at.desc())\
+        .limit(limit)
+
+def penalty_page(filters, cursor=None, per_page=PENALTIES_PER_PAGE):
+    """Fetch one page of penalties, returns (penalties, next_cursor, prev_cursor)
+
+    next_cursor leads to older penalties, prev_cursor to newer ones (None on the first page).
+    """
+    # One extra row tells whether another page follows
+    items = penalty_list_query(filters, cursor).limit(per_page + 1).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    
+    if cursor and decode_cursor(cursor)[2]:
+        items.reverse()
+        next_cursor = encode_cursor(items[-1]) if items else None
+        prev_cursor = encode_cursor(items[0], newer=True) if more else None
+    else:
+        next_cursor = encode_cursor(items[-1]) if more else None
+        prev_cursor = encode_cursor(items[0], newer=True) if cursor and items else None
+    return items, next_cursor, prev_cursor
+
+def penalty_count(filters):
+    """Count the penalties matching the filters from the ledger running totals"""
+    date_from = datetime.strptime(filters['date_from'], '%Y-%m-%d').date() if filters['date_from'] else None
+    date_to = datetime.strptime(filters['date_to'], '%Y-%m-%d').date() if filters['date_to'] else None
+    count, _ = ledger_total(date_from, date_to, filters['player'])
+    return count
+
+def penalty_to_dict(penalty):
+    """Serialize a penalty for the JSON API"""
+    return {
+        'id': penalty.id,
+        'date': penalty.date.strftime('%Y-%m-%d'),
+        'player_id': penalty.player_id,
+        'player': penalty.player.name,
+        'penalty_type_id': penalty.penalty_type_id,
+        'penalty_type': penalty.penalty_type.name,
+        'description': penalty.penalty_type.description or '',
+        'quantity': penalty.quantity,
+        'amount': penalty.unit_amount,
+        'total_amount': penalty.total_amount,
+        'notes': penalty.notes or ''
+    }
+
+# Statistics engine: all KPIs and breakdowns of a date range from one grouped query
+class StatisticsCache:
+    """LRU cache of statistics results keyed by data version and date range"""
+    
+    def __init__(self, maxsize=STATISTICS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+    
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+statistics_cache = StatisticsCache()
+
+def statistics_query(date_from, date_to):
+    """Grouped penalty totals of a date range, answered from ix_penalty_date_totals alone"""
+    return db.session.query(
+        Penalty.player_id,
+        Penalty.penalty_type_id,
+        db.func.count(Penalty.id),
+        db.func.sum(Penalty.total_amount_cents),
+        db.func.max(Penalty.total_amount_cents)
+    ).filter(Penalty.date >= date_from, Penalty.date <= date_to)\
+     .group_by(Penalty.player_id, Penalty.penalty_type_id)
+
+def reference_names():
+    """Return ({player_id: name}, {penalty_type_id: name}) from the reference cache"""
+    players, penalty_types = reference_data()
+    return ({player.id: player.name for player in players},
+            {penalty_type.id: penalty_type.name for penalty_type in penalty_types})
+
+def compute_statistics_sql(date_from, date_to):
+    """Compute every KPI and breakdown of /statistics (totals and chart from the ledger, breakdowns in one pass)"""
+    player_names, penalty_type_names = reference_names()
+    
+    total_count, total_amount = ledger_total(date_from, date_to)
+    max_penalty = 0.0
+    player_stats = {}
+    penalty_type_stats = {}
+    
+    for player_id, type_id, count, total_cents, largest_cents in statistics_query(date_from, date_to):
+        total = (total_cents or 0) / 100
+        max_penalty = max(max_penalty, (largest_cents or 0) / 100)
+        
+        player = player_stats.setdefault(player_id, {'name': player_names.get(player_id), 'count': 0, 'total': 0.0})
+        player['count'] += count
+        player['total'] += total
+        
+        penalty_type = penalty_type_stats.setdefault(type_id, {'name': penalty_type_names.get(type_id), 'count': 0, 'total': 0.0})
+        penalty_type['count'] += count
+        penalty_type['total'] += total
+    
+    return {
+        'total_count': total_count,
+        'total_amount': total_amount,
+        'avg_per_penalty': total_amount / total_count if total_count > 0 else 0,
+        'max_penalty': max_penalty,
+        'player_stats': sorted(player_stats.values(), key=lambda stat: (-stat['total'], stat['name'] or '')),
+        'penalty_stats': sorted(penalty_type_stats.values(), key=lambda stat: (-stat['total'], stat['name'] or '')),
+        'cumulative_data': ledger_series(date_from, date_to)
+    }
+
+def compute_statistics(date_from, date_to):
+    """Statistics of a date range from the pandas frame or, without pandas, from SQL"""
+    if app.config['ANALYTICS_BACKEND'] == 'pandas':
+        player_names, penalty_type_names = reference_names()
+        return analytics.statistics(penalty_frame(), date_from, date_to, player_names, penalty_type_names)
+    return compute_statistics_sql(date_from, date_to)
+
+def get_statistics(date_from, date_to):
+    """Return the statistics of a date range, memoized until the next write"""
+    key = (current_data_version(), date_from, date_to)
+    result = statistics_cache.get(key)
+    if result is None:
+        result = compute_statistics(date_from, date_to)
+        statistics_cache.put(key, result)
+    return result
+
+# Pandas analytics (analytics.py): per-process fact frame used by /statistics and /api/report
+app.config['ANALYTICS_BACKEND'] = os.environ.get('ANALYTICS_BACKEND', 'pandas' if analytics else 'sql')
+penalty_frame_cache = analytics.PenaltyFrameCache() if analytics else None
+
+def load_penalty_records(after_id=0):
+    """Fact rows of the penalties with an id above after_id, in id order"""
+    return db.session.query(
+        Penalty.id,
+        Penalty.date,
+        Penalty.player_id,
+        Penalty.penalty_type_id,
+        Penalty.quantity,
+        Penalty.total_amount_cents
+    ).filter(Penalty.id > after_id)\
+     .order_by(Penalty.id)\
+     .all()
+
+def penalty_frame():
+    """Fact frame of all penalties, extended after inserts and reloaded after edits or deletes"""
+    penalty_count, _ = ledger_total()
+    return penalty_frame_cache.get(current_data_version(), current_data_version(HISTORY_VERSION_ID),
+                                   penalty_count, load_penalty_records)
+
+# Live dashboard: writes store a small delta in DashboardEvent, one broadcaster thread per process polls
+# the table and fans new events out to the open /api/dashboard/stream connections (Server-Sent Events).
+# Every stream holds a worker thread, so run with threaded workers (e.g. gunicorn -k gthread).
+DASHBOARD_DAYS = 30
+DASHBOARD_TOP_PLAYERS = 10
+DASHBOARD_POLL_SECONDS = 1.0
+DASHBOARD_KEEPALIVE_SECONDS = 15
+DASHBOARD_RETRY_MS = 3000
+# Events kept in the table for reconnecting clients (Last-Event-ID)
+DASHBOARD_EVENT_RETENTION = 1000
+# Undelivered events per client before it is told to reload instead
+DASHBOARD_QUEUE_SIZE = 100
+# Ids below the watermark that are polled again (Postgres may commit ids out of order)
+DASHBOARD_EVENT_LOOKBACK = 20
+
+def publish_dashboard_event(kind, penalty=None, player_ids=(), dates=(), count=1):
+    """Store the dashboard delta of a change (penalty: penalty_to_dict() of the changed penalty);
+    runs inside the caller's transaction after update_aggregates()"""
+    total_penalties, total_amount = ledger_total()
+    today = date.today()
+    first_day = today - timedelta(days=DASHBOARD_DAYS)
+    
+    day_dates = sorted({day for day in dates if first_day <= day <= today} | {today})
+    days = {
+        row.date: row for row in DailyLedger.query.filter(DailyLedger.date.in_(day_dates))
+    }
+    names = dict(db.session.query(Player.id, Player.name).filter(Player.id.in_(set(player_ids))))
+    players = []
+    for player_id in sorted(set(player_ids)):
+        penalty_count, player_amount = ledger_total(player_id=player_id) if player_id in names else (0, 0.0)
+        players.append({'id': player_id, 'name': names.get(player_id),
+                        'penalty_count': penalty_count, 'total_amount': player_amount})
+    
+    payload = {
+        'count': count,
+        'penalty': penalty,
+        'totals': {
+            'total_penalties': total_penalties,
+            'total_amount': total_amount,
+            'today_penalties': days[today].penalty_count if today in days else 0
+        },
+        'players': players,
+        'days': [
+            {'date': day.strftime('%Y-%m-%d'), 'daily_amount': days[day].amount_cents / 100 if day in days else 0.0}
+            for day in day_dates
+        ]
+    }
+    dashboard_event = DashboardEvent(kind=kind, payload=json.dumps(payload))
+    db.session.add(dashboard_event)
+    db.session.flush()
+    db.session.execute(
+        db.delete(DashboardEvent).where(DashboardEvent.id <= dashboard_event.id - DASHBOARD_EVENT_RETENTION)
+    )
+
+class DashboardSubscription:
+    """Event queue of one open stream"""
+    
+    def __init__(self):
+        self.events = queue.Queue(maxsize=DASHBOARD_QUEUE_SIZE)
+        self.overflowed = False
+    
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+        return not self.overflowed
+
+class DashboardBroadcaster:
+    """Per-process poller of the event table, running only while streams are open"""
+    
+    def __init__(self, interval=DASHBOARD_POLL_SECONDS):
+        self.interval = interval
+        self.subscriptions = set()
+        self.last_id = None
+        self.delivered = deque(maxlen=DASHBOARD_EVENT_LOOKBACK * 4)
+        self.thread = None
+        self.lock = threading.Lock()
+    
+    def subscribe(self, last_event_id=None):
+        """Open a subscription, replaying the events after last_event_id (needs an app context)"""
+        subscription = DashboardSubscription()
+        with self.lock:
+            if not self.subscriptions:
+                # Idle broadcasters do not poll: start from the current end of the table
+                self.last_id = db.session.query(db.func.coalesce(db.func.max(DashboardEvent.id), 0)).scalar()
+                self.delivered.clear()
+                self.delivered.extend(
+                    event_id for event_id, in db.session.query(DashboardEvent.id)
+                        .filter(DashboardEvent.id > self.last_id - DASHBOARD_EVENT_LOOKBACK)
+                )
+            if last_event_id is not None and last_event_id < self.last_id:
+                missed = db.session.query(DashboardEvent.id, DashboardEvent.kind, DashboardEvent.payload)\
+                    .filter(DashboardEvent.id > last_event_id, DashboardEvent.id <= self.last_id)\
+                    .order_by(DashboardEvent.id)\
+                    .limit(DASHBOARD_QUEUE_SIZE + 1).all()
+                oldest = db.session.query(db.func.min(DashboardEvent.id)).scalar()
+                if len(missed) > DASHBOARD_QUEUE_SIZE or oldest is None or oldest > last_event_id + 1:
+                    subscription.put((None, 'reload', '{}'))
+                else:
+                    for row in missed:
+                        subscription.put(tuple(row))
+            self.subscriptions.add(subscription)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='dashboard-broadcaster', daemon=True)
+                self.thread.start()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+    
+    def poll(self):
+        """Deliver the events committed since the last poll (needs an app context)"""
+        with self.lock:
+            if not self.subscriptions:
+                return
+            last_id = self.last_id
+        
+        events = db.session.query(DashboardEvent.id, DashboardEvent.kind, DashboardEvent.payload)\
+            .filter(DashboardEvent.id > last_id - DASHBOARD_EVENT_LOOKBACK)\
+            .order_by(DashboardEvent.id).all()
+        events = [tuple(row) for row in events if row.id > last_id or row.id not in self.delivered]
+        if not events:
+            return
+        
+        with self.lock:
+            for subscription in list(self.subscriptions):
+                for evt in events:
+                    if not subscription.put(evt):
+                        self.subscriptions.discard(subscription)
+                        break
+            self.delivered.extend(evt[0] for evt in events)
+            self.last_id = max(self.last_id, events[-1][0])
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception:
+                app.logger.exception('Dashboard broadcaster poll failed')
+
+dashboard_broadcaster = DashboardBroadcaster()
+
+def format_sse(kind, payload, event_id=None):
+    """One Server-Sent Events message"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {kind}', f'data: {payload}']
+    return '\n'.join(lines) + '\n\n'
+
+# Background jobs: heavy exports run in a bounded thread pool instead of the request thread.
+# The job table is shared by all workers, so status and download work from any of them;
+# the pool belongs to the process, EXPORT_JOB_WORKERS bounds the concurrent exports per worker process.
+EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', 2))
+# Jobs waiting or running before new ones are refused
+EXPORT_JOB_MAX_PENDING = 20
+# Finished jobs and their files are deleted after this many hours
+EXPORT_JOB_RETENTION_HOURS = 24
+EXPORT_JOB_DIR = os.path.join(app.instance_path, 'exports')
+
+def csv_export_chunks(filters, progress=None):
+    """Penalties matching the filters as semicolon CSV, in chunks of about EXPORT_CHUNK_SIZE characters.
+
+    progress(rows_written) is called after every chunk.
+    """
+    query = db.session.query(
+        Penalty.date,
+        Player.name,
+        PenaltyType.name,
+        Penalty.quantity,
+        Penalty.unit_amount_cents,
+        Penalty.total_amount_cents,
+        Penalty.notes
+    ).select_from(Penalty).join(Player).join(PenaltyType)
+    query = apply_penalty_filters(query, filters)\
+        .order_by(Penalty.date.desc())\
+        .yield_per(EXPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    
+    # Headers
+    writer.writerow(['Datum', 'Spieler', 'Vergehen', 'Anzahl', 'Einzelbetrag (€)', 'Gesamt (€)', 'Notiz'])
+    yield buffer.getvalue()
+    
+    # Data, flushed whenever the buffer holds a full chunk
+    buffer.seek(0)
+    buffer.truncate()
+    rows = 0
+    for penalty_date, player_name, penalty_type_name, quantity, unit_cents, total_cents, notes in query:
+        writer.writerow([
+            penalty_date.strftime('%Y-%m-%d'),
+            player_name,
+            penalty_type_name,
+            quantity,
+            unit_cents / 100,
+            total_cents / 100,
+            notes or ''
+        ])
+        rows += 1
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if progress:
+                progress(rows)
+    yield buffer.getvalue()
+
+def run_csv_export(path, params, report_progress):
+    """Job: CSV export of the penalties matching params (filters of /penalties)"""
+    total = penalty_count(params) or 1
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        for chunk in csv_export_chunks(params, lambda rows: report_progress(rows * 100 // total)):
+            csvfile.write(chunk)
+
+def database_workbook_rows(progress=None):
+    """All penalties, oldest first, as rows of the Erfassung sheet; progress(rows) after every batch"""
+    query = db.session.query(
+        Penalty.date,
+        Player.name,
+        PenaltyType.name,
+        Penalty.quantity,
+        Penalty.unit_amount_cents,
+        Penalty.total_amount_cents,
+        Penalty.notes
+    ).select_from(Penalty).join(Player).join(PenaltyType)\
+     .order_by(Penalty.date, Penalty.id)\
+     .yield_per(EXPORT_BATCH_SIZE)
+    
+    for rows, (penalty_date, player_name, penalty_type_name, quantity, unit_cents, total_cents, notes) \
+            in enumerate(query, 1):
+        yield penalty_date, player_name, penalty_type_name, quantity, unit_cents / 100, total_cents / 100, notes
+        if progress and rows % EXPORT_BATCH_SIZE == 0:
+            progress(rows)
+
+def export_database_workbook(path, progress=None, precomputed=True):
+    """Write the database as tracking workbook (build_strafenlog.create_database_workbook), returns the row count.
+
+    precomputed=False writes the Statistik sheet as formulas instead of values.
+    """
+    players, penalty_types = reference_data()
+    return build_strafenlog.create_database_workbook(
+        path,
+        database_workbook_rows(progress),
+        [player.name for player in players],
+        [(penalty_type.name, penalty_type.amount, penalty_type.description) for penalty_type in penalty_types],
+        precomputed=precomputed
+    )
+
+def run_database_workbook_export(path, params, report_progress):
+    """Job: workbook with the database contents"""
+    total, _ = ledger_total()
+    export_database_workbook(path, lambda rows: report_progress(rows * 100 // (total or 1)))
+
+def run_workbook_export(path, params, report_progress):
+    """Job: empty tracking workbook from build_strafenlog.py"""
+    build_strafenlog.create_penalty_tracking_workbook(path)
+
+# Job kinds: runner, file extension, mimetype and download name
+ExportJobKind = namedtuple('ExportJobKind', 'run extension mimetype download_name')
+EXPORT_JOB_KINDS = {
+    'csv': ExportJobKind(run_csv_export, '.csv', 'text/csv', 'penalty_export.csv'),
+    'xlsx': ExportJobKind(run_database_workbook_export, '.xlsx',
+                          'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                          'Strafenerfassung_Export.xlsx'),
+    'workbook': ExportJobKind(run_workbook_export, '.xlsx',
+                              'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                              'Strafenerfassung_ASV_Natz.xlsx'),
+}
+
+export_executor = ThreadPoolExecutor(max_workers=EXPORT_JOB_WORKERS, thread_name_prefix='export-job')
+
+def _update_export_job(job_id, **values):
+    # Own connection: the session of the job may still have the export query open
+    with db.engine.begin() as connection:
+        connection.execute(db.update(ExportJob).where(ExportJob.id == job_id).values(**values))
+
+def run_export_job(job_id):
+    """Run a queued job in a pool thread; the file is written under a temporary name and moved into place"""
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        kind = EXPORT_JOB_KINDS[job.kind]
+        params = json.loads(job.params)
+        path = os.path.join(EXPORT_JOB_DIR, job.id + kind.extension)
+        db.session.rollback()
+        _update_export_job(job_id, status='running', started_at=datetime.utcnow())
+        
+        def report_progress(progress):
+            _update_export_job(job_id, progress=min(progress, 99))
+        
+        try:
+            os.makedirs(EXPORT_JOB_DIR, exist_ok=True)
+            kind.run(path + '.part', params, report_progress)
+            os.replace(path + '.part', path)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception('Export job %s failed', job_id)
+            if os.path.exists(path + '.part'):
+                os.remove(path + '.part')
+            _update_export_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+        else:
+            db.session.rollback()
+            _update_export_job(job_id, status='done', progress=100, result_path=path,
+                               finished_at=datetime.utcnow())
+
+def purge_export_jobs():
+    """Delete jobs older than the retention period together with their files"""
+    cutoff = datetime.utcnow() - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)
+    for job in ExportJob.query.filter(ExportJob.created_at < cutoff):
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+
+def enqueue_export_job(kind, params):
+    """Record a job and hand it to the pool, returns the job (None when too many jobs are pending)"""
+    purge_export_jobs()
+    pending = ExportJob.query.filter(ExportJob.status.in_(('queued', 'running'))).count()
+    if pending >= EXPORT_JOB_MAX_PENDING:
+        db.session.commit()
+        return None
+    
+    job = ExportJob(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params))
+    db.session.add(job)
+    db.session.commit()
+    export_executor.submit(run_export_job, job.id)
+    return job
+
+def export_job_to_dict(job):
+    """Serialize a job for the JSON API"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': url_for('export_job_status', job_id=job.id),
+        'download_url': url_for('export_job_download', job_id=job.id) if job.status == 'done' else None
+    }
 
 # Routes
 @app.route('/login', methods=['GET', 'POST'])
@@ -197,55 +1750,29 @@ def logout():
 
 @app.route('/')
 @require_login()
+@conditional_get
 def index():
     """Main dashboard with overview"""
-    total_penalties = Penalty.query.count()
-    total_amount = db.session.query(db.func.sum(PenaltyType.amount * Penalty.quantity))\
-        .select_from(Penalty).join(PenaltyType).scalar() or 0
+    total_penalties, total_amount = ledger_total()
     
     # Recent penalties
-    recent_penalties = Penalty.query\
-        .order_by(Penalty.created_at.desc())\
-        .limit(10)\
-        .all()
+    recent_penalties = recent_penalties_query().all()
     
     # Top players by penalty count
     top_players = db.session.query(
+        Player.id,
         Player.name,
-        db.func.count(Penalty.id).label('penalty_count'),
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('total_amount')
-    ).select_from(Player).join(Penalty).join(PenaltyType)\
-     .group_by(Player.id, Player.name)\
-     .order_by(db.func.sum(PenaltyType.amount * Penalty.quantity).desc())\
+        *player_total_columns()[1:]
+    ).select_from(PlayerTotal).join(Player)\
+     .order_by(PlayerTotal.total_cents.desc())\
      .limit(10).all()
      
     # Daily cumulative data for dashboard chart (last 30 days)
-    thirty_days_ago = (date.today() - timedelta(days=30)).strftime('%Y-%m-%d')
-    today = date.today().strftime('%Y-%m-%d')
-    
-    daily_stats = db.session.query(
-        Penalty.date,
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('daily_total')
-    ).select_from(Penalty).join(PenaltyType)\
-     .filter(Penalty.date >= thirty_days_ago, Penalty.date <= today)\
-     .group_by(Penalty.date)\
-     .order_by(Penalty.date)\
-     .all()
-    
-    # Calculate cumulative sums
-    cumulative_data = []
-    running_total = 0
-    for daily in daily_stats:
-        running_total += float(daily.daily_total)
-        cumulative_data.append({
-            'date': daily.date.strftime('%Y-%m-%d'),
-            'daily_amount': float(daily.daily_total),
-            'cumulative_amount': running_total
-        })
+    today = date.today()
+    cumulative_data = ledger_series(today - timedelta(days=30), today)
     
     # Today's penalties count
-    today = date.today()
-    today_penalties = Penalty.query.filter(Penalty.date == today).count()
+    today_penalties = cumulative_data[-1]['penalty_count'] if cumulative_data else 0
     
     return render_template('dashboard.html', 
                          total_penalties=total_penalties,
@@ -274,81 +1801,408 @@ def add_penalty():
                 quantity=quantity,
                 notes=notes
             )
+            penalty.set_amount(db.session.get(PenaltyType, penalty_type_id).amount)
             
             db.session.add(penalty)
+            db.session.flush()
+            update_aggregates(aggregate_rows(Penalty.query.filter(Penalty.id == penalty.id)))
+            publish_dashboard_event('penalty_added', penalty_to_dict(penalty), [player_id], [penalty_date])
+            bump_data_version()
             db.session.commit()
             
             flash('Strafe erfolgreich hinzugefügt!', 'success')
             return redirect(url_for('penalties'))
             
         except Exception as e:
+            db.session.rollback()
             flash(f'Fehler beim Hinzufügen der Strafe: {str(e)}', 'error')
     
-    players = Player.query.order_by(Player.name).all()
-    penalty_types = PenaltyType.query.order_by(PenaltyType.name).all()
+    players, penalty_types = reference_data()
     
     return render_template('add_penalty.html', 
                          players=players, 
                          penalty_types=penalty_types,
                          today=date.today())
 
-@app.route('/penalties')
-@require_login()
-def penalties():
-    """List all penalties with filtering and player totals"""
-    page = request.args.get('page', 1, type=int)
-    player_filter = request.args.get('player')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
+def parse_quantity(value):
+    """Anzahl of a penalty row: empty means 1, anything else must be a whole number of at least 1"""
+    if value in (None, ''):
+        return 1
+    quantity = _parse_amount(value)
+    if quantity != int(quantity) or quantity < 1:
+        raise ValueError('Anzahl muss eine ganze Zahl von mindestens 1 sein')
+    return int(quantity)
+
+def validate_penalty_rows(rows):
+    """Validate penalty rows together, returns (valid_rows, penalty_type_amounts, errors)"""
+    player_ids = {player_id for player_id, in db.session.query(Player.id)}
+    amounts = dict(db.session.query(PenaltyType.id, PenaltyType.amount).all())
     
-    query = Penalty.query
+    valid_rows = []
+    errors = []
+    for index, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'error': 'Ungültige Eingabe (Zeile ist kein Objekt)'})
+            continue
+        try:
+            penalty_date = row['date']
+            if not isinstance(penalty_date, date):
+                penalty_date = datetime.strptime(penalty_date, '%Y-%m-%d').date()
+            player_id = int(row['player_id'])
+            penalty_type_id = int(row['penalty_type_id'])
+            quantity = parse_quantity(row.get('quantity'))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({'row': index, 'error': f'Ungültige Eingabe ({e})'})
+            continue
+        
+        if player_id not in player_ids:
+            errors.append({'row': index, 'error': f'Spieler {player_id} existiert nicht'})
+        elif penalty_type_id not in amounts:
+            errors.append({'row': index, 'error': f'Vergehen {penalty_type_id} existiert nicht'})
+        else:
+            valid_rows.append({
+                'date': penalty_date,
+                'player_id': player_id,
+                'penalty_type_id': penalty_type_id,
+                'quantity': quantity,
+                'notes': row.get('notes') or ''
+            })
     
-    # Apply filters
-    if player_filter:
-        query = query.filter(Penalty.player_id == player_filter)
+    return valid_rows, amounts, errors
+
+def insert_penalties(rows, amounts):
+    """Insert validated penalty rows with one executemany; the caller commits.
+
+    Rows are booked at amounts[penalty_type_id] unless they carry their own 'unit_amount'.
+    """
+    booked = []
+    for row in rows:
+        row = dict(row)
+        unit_amount = row.pop('unit_amount', None)
+        if unit_amount is None:
+            unit_amount = amounts[row['penalty_type_id']]
+        row['unit_amount_cents'] = to_cents(unit_amount)
+        row['total_amount_cents'] = row['unit_amount_cents'] * row['quantity']
+        booked.append(row)
     
-    if date_from:
-        date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-        query = query.filter(Penalty.date >= date_from_obj)
+    db.session.execute(db.insert(Penalty), booked)
+    update_aggregates([
+        (row['player_id'], row['penalty_type_id'], row['date'], row['total_amount_cents'])
+        for row in booked
+    ])
+    publish_dashboard_event('penalties_added',
+                            player_ids={row['player_id'] for row in booked},
+                            dates={row['date'] for row in booked},
+                            count=len(booked))
+    bump_data_version()
+
+# Import from the Excel workbook (Erfassung sheet) or its semicolon CSV export
+IMPORT_COLUMNS = ['Datum', 'Spieler', 'Vergehen', 'Anzahl', 'Einzelbetrag (€)', 'Gesamt (€)', 'Notiz']
+
+def _parse_amount(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace('€', '').replace(',', '.').strip())
+
+def _parse_import_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Ungültiges Datum: {value}')
+
+def read_workbook_rows(file):
+    """Stream the Erfassung rows of a workbook, returns (rows, catalog amounts by name)"""
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    if 'Erfassung' not in workbook.sheetnames:
+        workbook.close()
+        raise ValueError("Arbeitsblatt 'Erfassung' nicht gefunden!")
     
-    if date_to:
-        date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-        query = query.filter(Penalty.date <= date_to_obj)
+    # Catalog amounts are needed because formula cells have no cached values in generated workbooks
+    catalog = {}
+    if 'Strafenkatalog' in workbook.sheetnames:
+        for name, amount, *_ in workbook['Strafenkatalog'].iter_rows(min_row=2, max_col=3, values_only=True):
+            if name:
+                catalog[str(name).strip()] = _parse_amount(amount) or 0
+    
+    def rows():
+        try:
+            for values in workbook['Erfassung'].iter_rows(min_row=3, max_col=len(IMPORT_COLUMNS), values_only=True):
+                yield dict(zip(IMPORT_COLUMNS, values))
+        finally:
+            workbook.close()
+    
+    return rows(), catalog
+
+def read_csv_rows(file):
+    """Stream the rows of a semicolon CSV as written by export_csv.py or /export_csv"""
+    return csv.DictReader(file, delimiter=';'), {}
+
+def import_penalties(rows, catalog=None, batch_size=IMPORT_BATCH_SIZE):
+    """Import penalty rows given as dicts keyed by IMPORT_COLUMNS.
+
+    Unknown players and penalty types are created. Re-importing the same file is a no-op:
+    a row is only inserted when the file contains more copies of it than the database.
+    Returns a summary dict.
+    """
+    catalog = catalog or {}
+    players = {name: player_id for player_id, name in db.session.query(Player.id, Player.name)}
+    penalty_types = {name: (type_id, amount) for type_id, name, amount
+                     in db.session.query(PenaltyType.id, PenaltyType.name, PenaltyType.amount)}
+    summary = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'players_created': 0,
+               'penalty_types_created': 0, 'errors': []}
+    seen = {}
+    inserted = {}
+    
+    def resolve_player(name):
+        if name not in players:
+            player = Player(name=name)
+            db.session.add(player)
+            db.session.flush()
+            players[name] = player.id
+            summary['players_created'] += 1
+            bump_data_version(reference=True)
+        return players[name]
+    
+    def resolve_penalty_type(name, amount):
+        if name not in penalty_types:
+            if amount is None:
+                amount = catalog.get(name, 0)
+            penalty_type = PenaltyType(name=name, amount=amount, description='')
+            db.session.add(penalty_type)
+            db.session.flush()
+            penalty_types[name] = (penalty_type.id, penalty_type.amount)
+            summary['penalty_types_created'] += 1
+            bump_data_version(reference=True)
+        return penalty_types[name]
     
-    penalties_pagination = query.order_by(Penalty.date.desc())\
-        .paginate(page=page, per_page=20, error_out=False)
+    def flush_batch(batch):
+        if not batch:
+            db.session.commit()
+            return
+        
+        # Copies of each row already in the database (minus those inserted by this import)
+        keys = {key for key, _ in batch}
+        existing = {}
+        # A literal keeps SELECT and GROUP BY identical for Postgres
+        notes = db.func.coalesce(Penalty.notes, db.literal_column("''"))
+        key_columns = (Penalty.date, Penalty.player_id, Penalty.penalty_type_id, Penalty.quantity, notes)
+        for *key, count in db.session.query(*key_columns, db.func.count(Penalty.id))\
+                .filter(Penalty.date.in_(sorted({key[0] for key in keys})))\
+                .group_by(*key_columns):
+            existing[tuple(key)] = count
+        baseline = {key: existing.get(key, 0) - inserted.get(key, 0) for key in keys}
+        
+        new_rows = []
+        for key, row in batch:
+            seen[key] = seen.get(key, 0) + 1
+            if seen[key] > baseline[key]:
+                new_rows.append(row)
+                inserted[key] = inserted.get(key, 0) + 1
+            else:
+                summary['duplicates'] += 1
+        
+        if new_rows:
+            amounts = {type_id: amount for type_id, amount in penalty_types.values()}
+            insert_penalties(new_rows, amounts)
+        db.session.commit()
+        summary['inserted'] += len(new_rows)
     
-    players = Player.query.order_by(Player.name).all()
-    penalty_types = PenaltyType.query.order_by(PenaltyType.name).all()
+    batch = []
+    for line, row in enumerate(rows, 1):
+        player_name = str(row.get('Spieler') or '').strip()
+        type_name = str(row.get('Vergehen') or '').strip()
+        if not row.get('Datum') and not player_name and not type_name:
+            continue
+        
+        summary['rows'] += 1
+        try:
+            if not player_name or not type_name:
+                raise ValueError('Spieler und Vergehen sind erforderlich')
+            penalty_date = _parse_import_date(row.get('Datum'))
+            quantity = parse_quantity(row.get('Anzahl'))
+            amount = _parse_amount(row.get('Einzelbetrag (€)'))
+            total = _parse_amount(row.get('Gesamt (€)'))
+            if amount is None and total is not None:
+                amount = total / quantity
+        except (TypeError, ValueError) as e:
+            summary['errors'].append({'row': line, 'error': str(e)})
+            continue
+        
+        notes = str(row.get('Notiz') or '').strip()
+        penalty_type_id, _ = resolve_penalty_type(type_name, amount)
+        penalty = {
+            'date': penalty_date,
+            'player_id': resolve_player(player_name),
+            'penalty_type_id': penalty_type_id,
+            'quantity': quantity,
+            'notes': notes,
+            'unit_amount': amount
+        }
+        batch.append(((penalty_date, penalty['player_id'], penalty_type_id, quantity, notes), penalty))
+        
+        if len(batch) >= batch_size:
+            flush_batch(batch)
+            batch = []
+    
+    flush_batch(batch)
+    return summary
+
+def import_file(file, filename):
+    """Import a .xlsx workbook or .csv export from a path or binary file object"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        rows, catalog = read_workbook_rows(file)
+        return import_penalties(rows, catalog)
+    
+    if filename.lower().endswith('.csv'):
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, newline='', encoding='utf-8-sig') as csvfile:
+                return import_penalties(*read_csv_rows(csvfile))
+        return import_penalties(*read_csv_rows(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')))
+    
+    raise ValueError('Nur .xlsx- und .csv-Dateien können importiert werden')
+
+@app.cli.command('import-penalties')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def import_penalties_command(paths):
+    """Import penalties from Excel workbooks or CSV exports"""
+    run_migrations()
+    for path in paths:
+        summary = import_file(path, path)
+        click.echo(f'✅ {path}: {summary["inserted"]} neu, {summary["duplicates"]} bereits vorhanden, '
+                   f'{summary["players_created"]} Spieler und {summary["penalty_types_created"]} Vergehen angelegt')
+        for error in summary['errors']:
+            click.echo(f'   ⚠️  Zeile {error["row"]}: {error["error"]}')
+
+@app.cli.command('export-workbook')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--formulas', is_flag=True, help='Statistik als Formeln statt vorberechneter Werte')
+def export_workbook_command(path, formulas):
+    """Export the database as Excel workbook (Erfassung, Spielerliste, Strafenkatalog, Statistik)"""
+    start = time.perf_counter()
+    rows = export_database_workbook(path, precomputed=not formulas)
+    click.echo(f'✅ {path}: {rows} Strafen in {time.perf_counter() - start:.1f} s exportiert')
+
+@app.route('/import_penalties', methods=['GET', 'POST'])
+@require_role('kassier')
+def import_penalties_upload():
+    """Upload a workbook or CSV export and import its penalties"""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Bitte eine Datei auswählen!', 'error')
+            return redirect(url_for('import_penalties_upload'))
+        
+        try:
+            summary = import_file(upload.stream, upload.filename)
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Fehler beim Import: {str(e)}', 'error')
+            return redirect(url_for('import_penalties_upload'))
+        
+        flash(f'Import abgeschlossen: {summary["inserted"]} neue Strafen, {summary["duplicates"]} bereits vorhanden, '
+              f'{summary["players_created"]} Spieler und {summary["penalty_types_created"]} Vergehen angelegt.', 'success')
+        for error in summary['errors'][:20]:
+            flash(f'Zeile {error["row"]}: {error["error"]}', 'warning')
+        return redirect(url_for('penalties'))
+    
+    return render_template('import_penalties.html')
+
+@app.route('/add_penalties_bulk', methods=['GET', 'POST'])
+@require_role('kassier')
+def add_penalties_bulk():
+    """Add penalties for several players at once (e.g. a lost match)"""
+    if request.method == 'POST':
+        if request.is_json:
+            # {"date", "penalty_type_id", "quantity", "notes", "player_ids": [...]} or
+            # {"rows": [{"player_id", "penalty_type_id", "quantity", ...}]} with the top level as defaults
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict) or not isinstance(payload.get('rows', []), list) \
+                    or not isinstance(payload.get('player_ids', []), list):
+                error = 'Ungültige Anfrage: erwartet ein Objekt mit den Listen "rows" und/oder "player_ids"'
+                return jsonify({'inserted': 0, 'errors': [{'row': None, 'error': error}]}), 400
+            defaults = {key: payload.get(key) for key in ('date', 'penalty_type_id', 'quantity', 'notes')}
+            # Rows that are no objects are passed on as they are and reported by validate_penalty_rows()
+            rows = [dict(defaults, **row) if isinstance(row, dict) else row for row in payload.get('rows', [])]
+            rows += [dict(defaults, player_id=player_id) for player_id in payload.get('player_ids', [])]
+        else:
+            defaults = {key: request.form.get(key) for key in ('date', 'penalty_type_id', 'quantity', 'notes')}
+            rows = [dict(defaults, player_id=player_id) for player_id in request.form.getlist('player_ids')]
+        
+        valid_rows, amounts, errors = validate_penalty_rows(rows)
+        
+        try:
+            if valid_rows:
+                insert_penalties(valid_rows, amounts)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            errors.append({'row': None, 'error': f'Fehler beim Speichern: {str(e)}'})
+            valid_rows = []
+        
+        if request.is_json:
+            return jsonify({'inserted': len(valid_rows), 'errors': errors}), 200 if valid_rows or not errors else 400
+        
+        if not rows:
+            flash('Bitte mindestens einen Spieler auswählen!', 'error')
+        if valid_rows:
+            flash(f'{len(valid_rows)} Strafen erfolgreich hinzugefügt!', 'success')
+        for error in errors:
+            prefix = f'Zeile {error["row"]}: ' if error['row'] else ''
+            flash(prefix + error['error'], 'error')
+        if valid_rows and not errors:
+            return redirect(url_for('penalties'))
+    
+    players, penalty_types = reference_data()
+    
+    return render_template('add_penalties_bulk.html',
+                         players=players,
+                         penalty_types=penalty_types,
+                         today=date.today())
+
+@app.route('/penalties')
+@require_login()
+@conditional_get
+def penalties():
+    """List all penalties with filtering and player totals"""
+    cursor = request.args.get('cursor')
+    filters = penalty_filters()
+    
+    try:
+        penalties_page, next_cursor, prev_cursor = penalty_page(filters, cursor)
+    except ValueError:
+        abort(400)
+    
+    players, penalty_types = reference_data()
     
     # Calculate player totals (all-time)
-    player_totals = db.session.query(
-        Player.id,
-        Player.name,
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('total')
-    ).select_from(Player)\
-     .join(Penalty)\
-     .join(PenaltyType)\
-     .group_by(Player.id, Player.name)\
-     .all()
+    player_totals = db.session.query(*player_total_columns()).all()
     
     # Convert to dictionary for easy lookup
-    player_totals_dict = {pt.id: pt.total for pt in player_totals}
+    player_totals_dict = {pt.player_id: pt.total_amount for pt in player_totals}
     
     return render_template('penalties.html', 
-                         penalties=penalties_pagination.items,
-                         pagination=penalties_pagination,
+                         penalties=penalties_page,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
+                         is_first_page=prev_cursor is None,
+                         total_count=penalty_count(filters),
                          players=players,
                          penalty_types=penalty_types,
                          player_totals=player_totals_dict,
-                         filters={
-                             'player': player_filter,
-                             'date_from': date_from,
-                             'date_to': date_to
-                         })
+                         filters=filters)
 
 @app.route('/statistics')
 @require_login()
+@conditional_get
 def statistics():
     """Statistics dashboard"""
     # Date range for analysis
@@ -363,88 +2217,18 @@ def statistics():
     date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
     date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
     
-    # Build query for date range
-    base_query = Penalty.query.filter(
-        Penalty.date >= date_from_obj,
-        Penalty.date <= date_to_obj
-    )
-    
-    # KPIs
-    total_count = base_query.count()
-    total_amount = db.session.query(db.func.sum(PenaltyType.amount * Penalty.quantity))\
-        .select_from(Penalty).join(PenaltyType).filter(
-            Penalty.date >= date_from_obj,
-            Penalty.date <= date_to_obj
-        ).scalar() or 0
-    
-    avg_per_penalty = total_amount / total_count if total_count > 0 else 0
-    
-    max_penalty = db.session.query(db.func.max(PenaltyType.amount * Penalty.quantity))\
-        .select_from(Penalty).join(PenaltyType).filter(
-            Penalty.date >= date_from_obj,
-            Penalty.date <= date_to_obj
-        ).scalar() or 0
-    
-    # Daily penalty sums for chart (cumulative over time)
-    daily_stats = db.session.query(
-        Penalty.date,
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('daily_total')
-    ).select_from(Penalty).join(PenaltyType)\
-     .filter(Penalty.date >= date_from_obj, Penalty.date <= date_to_obj)\
-     .group_by(Penalty.date)\
-     .order_by(Penalty.date)\
-     .all()
-    
-    # Calculate cumulative sums
-    cumulative_data = []
-    running_total = 0
-    for daily in daily_stats:
-        running_total += float(daily.daily_total)
-        cumulative_data.append({
-            'date': daily.date.strftime('%Y-%m-%d'),
-            'daily_amount': float(daily.daily_total),
-            'cumulative_amount': running_total
-        })
-    
-    # Player statistics
-    player_stats = db.session.query(
-        Player.name,
-        db.func.count(Penalty.id).label('count'),
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('total')
-    ).select_from(Player).join(Penalty).join(PenaltyType)\
-     .filter(Penalty.date >= date_from_obj, Penalty.date <= date_to_obj)\
-     .group_by(Player.id, Player.name)\
-     .order_by(db.func.sum(PenaltyType.amount * Penalty.quantity).desc())\
-     .all()
-    
-    # Penalty type statistics
-    penalty_stats = db.session.query(
-        PenaltyType.name,
-        db.func.count(Penalty.id).label('count'),
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('total')
-    ).select_from(PenaltyType).join(Penalty)\
-     .filter(Penalty.date >= date_from_obj, Penalty.date <= date_to_obj)\
-     .group_by(PenaltyType.id, PenaltyType.name)\
-     .order_by(db.func.sum(PenaltyType.amount * Penalty.quantity).desc())\
-     .all()
-    
     return render_template('statistics.html',
                          date_from=date_from,
                          date_to=date_to,
-                         total_count=total_count,
-                         total_amount=total_amount,
-                         avg_per_penalty=avg_per_penalty,
-                         max_penalty=max_penalty,
-                         player_stats=player_stats,
-                         penalty_stats=penalty_stats,
-                         cumulative_data=cumulative_data)
+                         **get_statistics(date_from_obj, date_to_obj))
 
 @app.route('/players')
 @require_role('kassier')
 def players():
     """Manage players"""
-    players = Player.query.order_by(Player.name).all()
-    return render_template('players.html', players=players)
+    players, _ = reference_data()
+    player_totals = {row.player_id: row for row in db.session.query(*player_total_columns())}
+    return render_template('players.html', players=players, player_totals=player_totals)
 
 @app.route('/add_player', methods=['POST'])
 @require_role('kassier')
@@ -455,6 +2239,7 @@ def add_player():
         if not Player.query.filter_by(name=name).first():
             player = Player(name=name)
             db.session.add(player)
+            bump_data_version(reference=True)
             db.session.commit()
             flash('Spieler erfolgreich hinzugefügt!', 'success')
         else:
@@ -484,6 +2269,7 @@ def edit_player():
         return redirect(url_for('players'))
     
     player.name = name
+    bump_data_version(reference=True)
     db.session.commit()
     flash('Spieler erfolgreich bearbeitet!', 'success')
     return redirect(url_for('players'))
@@ -501,10 +2287,17 @@ def delete_player():
     player = Player.query.get_or_404(player_id)
     
     # Delete all penalties for this player first
+    affected_dates = {day for day, in db.session.query(Penalty.date).filter_by(player_id=player_id).distinct()}
+    update_aggregates(aggregate_rows(Penalty.query.filter_by(player_id=player_id)), sign=-1)
     Penalty.query.filter_by(player_id=player_id).delete()
+    PlayerDailyLedger.query.filter_by(player_id=player_id).delete()
+    PlayerTotal.query.filter_by(player_id=player_id).delete()
     
     # Delete the player
     db.session.delete(player)
+    db.session.flush()
+    publish_dashboard_event('player_deleted', player_ids=[player.id], dates=affected_dates, count=0)
+    bump_data_version(reference=True, history=True)
     db.session.commit()
     
     flash(f'Spieler "{player.name}" und alle zugehörigen Strafen wurden gelöscht!', 'success')
@@ -514,8 +2307,14 @@ def delete_player():
 @require_role('kassier')
 def penalty_types():
     """Manage penalty types"""
-    penalty_types = PenaltyType.query.order_by(PenaltyType.name).all()
-    return render_template('penalty_types.html', penalty_types=penalty_types)
+    _, penalty_types = reference_data()
+    penalty_counts = dict(
+        db.session.query(
+            PenaltyTypeDailyTotal.penalty_type_id,
+            db.func.sum(PenaltyTypeDailyTotal.penalty_count)
+        ).group_by(PenaltyTypeDailyTotal.penalty_type_id).all()
+    )
+    return render_template('penalty_types.html', penalty_types=penalty_types, penalty_counts=penalty_counts)
 
 @app.route('/add_penalty_type', methods=['POST'])
 @require_role('kassier')
@@ -530,6 +2329,7 @@ def add_penalty_type():
             if not PenaltyType.query.filter_by(name=name).first():
                 penalty_type = PenaltyType(name=name, amount=amount, description=description)
                 db.session.add(penalty_type)
+                bump_data_version(reference=True)
                 db.session.commit()
                 flash('Vergehen erfolgreich hinzugefügt!', 'success')
             else:
@@ -554,16 +2354,36 @@ def edit_penalty():
     penalty = Penalty.query.get_or_404(penalty_id)
     
     try:
+        penalty_query = Penalty.query.filter(Penalty.id == penalty.id)
+        update_aggregates(aggregate_rows(penalty_query), sign=-1)
+        old_player_id, old_date = penalty.player_id, penalty.date
+        
+        penalty_type_id = int(request.form['penalty_type_id'])
+        # Keep the booked rate unless the penalty type changes
+        if penalty_type_id == penalty.penalty_type_id:
+            unit_amount = penalty.unit_amount
+        else:
+            unit_amount = db.session.get(PenaltyType, penalty_type_id).amount
+        
         penalty.date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
         penalty.player_id = int(request.form['player_id'])
-        penalty.penalty_type_id = int(request.form['penalty_type_id'])
+        penalty.penalty_type_id = penalty_type_id
         penalty.quantity = int(request.form.get('quantity', 1))
         penalty.notes = request.form.get('notes', '')
+        penalty.set_amount(unit_amount)
         
+        db.session.flush()
+        update_aggregates(aggregate_rows(penalty_query))
+        # The relationships still point to the old player and penalty type until expired
+        db.session.expire(penalty, ['player', 'penalty_type'])
+        publish_dashboard_event('penalty_updated', penalty_to_dict(penalty),
+                                [old_player_id, penalty.player_id], [old_date, penalty.date])
+        bump_data_version(history=True)
         db.session.commit()
         flash('Strafe erfolgreich bearbeitet!', 'success')
         
     except Exception as e:
+        db.session.rollback()
         flash(f'Fehler beim Bearbeiten der Strafe: {str(e)}', 'error')
     
     return redirect(url_for('penalties'))
@@ -579,7 +2399,12 @@ def delete_penalty():
         return redirect(url_for('penalties'))
     
     penalty = Penalty.query.get_or_404(penalty_id)
+    deleted = penalty_to_dict(penalty)
+    update_aggregates(aggregate_rows(Penalty.query.filter(Penalty.id == penalty.id)), sign=-1)
     db.session.delete(penalty)
+    db.session.flush()
+    publish_dashboard_event('penalty_deleted', deleted, [penalty.player_id], [penalty.date])
+    bump_data_version(history=True)
     db.session.commit()
     
     flash('Strafe erfolgreich gelöscht!', 'success')
@@ -587,37 +2412,145 @@ def delete_penalty():
 
 @app.route('/export_csv')
 @require_role('kassier')
+@conditional_get
 def export_csv():
-    """Export penalties to CSV"""
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=';')
-    
-    # Headers
-    writer.writerow(['Datum', 'Spieler', 'Vergehen', 'Anzahl', 'Einzelbetrag (€)', 'Gesamt (€)', 'Notiz'])
-    
-    # Data
-    penalties = Penalty.query.order_by(Penalty.date.desc()).all()
-    for penalty in penalties:
-        writer.writerow([
-            penalty.date.strftime('%Y-%m-%d'),
-            penalty.player.name,
-            penalty.penalty_type.name,
-            penalty.quantity,
-            penalty.penalty_type.amount,
-            penalty.total_amount,
-            penalty.notes or ''
-        ])
+    """Export penalties to CSV, streamed in batches (accepts the filters of /penalties)"""
+    # Checked up front: once streaming has started the status can no longer change
+    filters = penalty_filters()
+    try:
+        validate_penalty_filters(filters)
+    except ValueError:
+        abort(400)
     
-    # Create response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    return Response(
+        stream_with_context(csv_export_chunks(filters)),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name='penalty_export.csv'
+        headers={'Content-Disposition': 'attachment; filename=penalty_export.csv'}
     )
 
+@app.route('/api/jobs', methods=['POST'])
+@require_role('kassier')
+def create_export_job():
+    """Start a background export: {"kind": "csv" | "xlsx" | "workbook", "player", "date_from", "date_to"}"""
+    payload = request.get_json(silent=True) if request.is_json else request.form
+    payload = payload or {}
+    kind = payload.get('kind')
+    if kind not in EXPORT_JOB_KINDS:
+        return jsonify({'error': f'Unbekannter Auftragstyp: {kind}'}), 400
+    
+    params = {}
+    if kind == 'csv':
+        params = {key: payload.get(key) or None for key in ('player', 'date_from', 'date_to')}
+        try:
+            validate_penalty_filters(params)
+        except ValueError:
+            return jsonify({'error': 'Ungültiger Filter, erwartet Spieler-ID und Datum JJJJ-MM-TT'}), 400
+    
+    job = enqueue_export_job(kind, params)
+    if job is None:
+        return jsonify({'error': 'Zu viele laufende Exporte, bitte später erneut versuchen'}), 429
+    
+    response = jsonify(export_job_to_dict(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('export_job_status', job_id=job.id)
+    return response
+
+@app.route('/api/jobs/<job_id>')
+@require_role('kassier')
+def export_job_status(job_id):
+    """Status and progress of a background export"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None:
+        return jsonify({'error': 'Auftrag nicht gefunden'}), 404
+    return jsonify(export_job_to_dict(job))
+
+@app.route('/api/jobs/<job_id>/download')
+@require_role('kassier')
+def export_job_download(job_id):
+    """Download the file of a finished background export"""
+    job = db.session.get(ExportJob, job_id)
+    if job is None or (job.status == 'done' and not os.path.exists(job.result_path)):
+        return jsonify({'error': 'Auftrag nicht gefunden'}), 404
+    if job.status != 'done':
+        return jsonify({'error': 'Auftrag noch nicht abgeschlossen', 'status': job.status}), 409
+    
+    kind = EXPORT_JOB_KINDS[job.kind]
+    return send_file(job.result_path, mimetype=kind.mimetype, as_attachment=True,
+                     download_name=kind.download_name)
+
+@app.route('/api/penalties')
+@require_login()
+@conditional_get
+def api_penalties():
+    """JSON list of penalties with keyset pagination (same filters as /penalties)"""
+    filters = penalty_filters()
+    per_page = min(max(request.args.get('limit', PENALTIES_PER_PAGE, type=int), 1), API_MAX_PER_PAGE)
+    
+    try:
+        items, next_cursor, prev_cursor = penalty_page(filters, request.args.get('cursor'), per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = {
+        'penalties': [penalty_to_dict(penalty) for penalty in items],
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    }
+    if request.args.get('include_total'):
+        result['total'] = penalty_count(filters)
+    
+    return jsonify(result)
+
+@app.route('/api/report')
+@require_login()
+@conditional_get
+def api_report():
+    """Analytics report of a date range (default: the last 12 months)"""
+    if penalty_frame_cache is None:
+        return jsonify({'error': 'Auswertungen benötigen pandas'}), 503
+    
+    try:
+        date_to = datetime.strptime(request.args['date_to'], '%Y-%m-%d').date() \
+            if request.args.get('date_to') else date.today()
+        date_from = datetime.strptime(request.args['date_from'], '%Y-%m-%d').date() \
+            if request.args.get('date_from') else date_to - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum'}), 400
+    if date_from > date_to:
+        return jsonify({'error': 'Startdatum liegt nach dem Enddatum'}), 400
+    
+    player_names, penalty_type_names = reference_names()
+    return jsonify(analytics.report(penalty_frame(), date_from, date_to, player_names, penalty_type_names))
+
+@app.route('/api/dashboard/stream')
+@require_login()
+def dashboard_stream():
+    """Server-Sent Events stream of dashboard deltas (penalties added, edited or deleted)"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = dashboard_broadcaster.subscribe(last_event_id)
+    
+    def generate():
+        try:
+            yield f'retry: {DASHBOARD_RETRY_MS}\n\n'
+            while not subscription.overflowed:
+                try:
+                    event_id, kind, payload = subscription.events.get(timeout=DASHBOARD_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(kind, payload, event_id)
+            # Too far behind: the client reloads the page instead of replaying the backlog
+            yield format_sse('reload', '{}')
+        finally:
+            dashboard_broadcaster.unsubscribe(subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/penalty_chart_data')
+@conditional_get
 def penalty_chart_data():
     """API endpoint for chart data"""
     days = request.args.get('days', 30, type=int)
@@ -627,28 +2560,39 @@ def penalty_chart_data():
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
     
-    # Build query
-    query = db.session.query(
-        Penalty.date,
-        db.func.sum(PenaltyType.amount * Penalty.quantity).label('total')
-    ).join(PenaltyType)\
-     .filter(Penalty.date >= start_date, Penalty.date <= end_date)
-    
-    if player_id:
-        query = query.filter(Penalty.player_id == player_id)
-    
-    data = query.group_by(Penalty.date)\
-               .order_by(Penalty.date)\
-               .all()
+    # Zero-filled series from the ledger, so the chart has no gaps
+    series = ledger_series(start_date, end_date, player_id)
     
     # Format for chart
     chart_data = {
-        'dates': [item[0].strftime('%Y-%m-%d') for item in data],
-        'amounts': [float(item[1]) for item in data]
+        'dates': [day['date'] for day in series],
+        'amounts': [day['daily_amount'] for day in series],
+        'cumulative': [day['cumulative_amount'] for day in series]
     }
     
     return jsonify(chart_data)
 
+@app.route('/admin/slow_queries', methods=['GET', 'POST'])
+@require_role('kassier')
+def slow_queries():
+    """Slow-query log of this process"""
+    if request.method == 'POST':
+        slow_query_log.clear()
+        flash('Protokoll geleert', 'success')
+        return redirect(url_for('slow_queries'))
+    
+    return render_template('slow_queries.html',
+                         entries=slow_query_log.entries(),
+                         threshold_ms=app.config['SLOW_QUERY_THRESHOLD_MS'])
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of this process"""
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     with app.app_context():
         init_database()
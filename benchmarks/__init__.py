@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the ASV Natz Penalty Tracker
+Synthetic season data (datagen) and timed runs of routes and exports (run)
+
+Usage: python -m benchmarks.run --sizes 1000 100000 --output bench_results.json
+"""
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deterministic synthetic season data for benchmarks
+Generates players, the seeded penalty catalog and penalties spread over several seasons
+"""
+
+import random
+from datetime import date, timedelta
+
+import openpyxl
+
+# Rows inserted per executemany when filling the database
+INSERT_CHUNK_SIZE = 10000
+
+
+def player_names(n_players, default_players):
+    """Return n player names: the seeded squad first, then numbered extras"""
+    names = list(default_players[:n_players])
+    names += [f"Spieler {i}" for i in range(len(names) + 1, n_players + 1)]
+    return names
+
+
+def generate_penalties(n_penalties, n_players, penalty_types, seasons=3, seed=42, end=None):
+    """
+    Yield n penalties as dicts with 0-based player/penalty type indexes
+    
+    Args:
+        n_penalties (int): Number of penalties to generate
+        n_players (int): Number of players to spread them over
+        penalty_types (list): (name, amount, description) tuples, e.g. DEFAULT_PENALTY_TYPES
+        seasons (int): Number of seasons (years) back from the end date
+        seed (int): Random seed, the same seed always yields the same data
+        end (date): Last possible penalty date (default: today)
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    days = seasons * 365
+    
+    # Cheap offences happen far more often than the expensive ones
+    weights = [1 / (1 + amount / 10) for _, amount, _ in penalty_types]
+    type_indexes = range(len(penalty_types))
+    
+    for i in range(n_penalties):
+        yield {
+            "date": end - timedelta(days=rng.randrange(days)),
+            "player": rng.randrange(n_players),
+            "penalty_type": rng.choices(type_indexes, weights)[0],
+            "quantity": 1 if rng.random() < 0.9 else rng.randint(2, 5),
+            "notes": "Auswärtsspiel" if rng.random() < 0.05 else ""
+        }
+
+
+def populate_database(app_module, n_players, n_penalties, seasons=3, seed=42):
+    """
+    Replace the app's database content with synthetic data (call inside an app context)
+    
+    Returns:
+        tuple: (first date, last date) of the generated penalties
+    """
+    db = app_module.db
+    # The version counters restart with the new tables; continue them so the app's caches notice the new data
+    versions = {}
+    if db.inspect(db.engine).has_table("data_version"):
+        versions = {row.id: row.version for row in app_module.DataVersion.query}
+    db.drop_all()
+    app_module.run_migrations()
+    db.session.add_all(app_module.DataVersion(id=version_id, version=version) for version_id, version in versions.items())
+    
+    players = [app_module.Player(name=name) for name in player_names(n_players, app_module.DEFAULT_PLAYERS)]
+    penalty_types = [
+        app_module.PenaltyType(name=name, amount=amount, description=description)
+        for name, amount, description in app_module.DEFAULT_PENALTY_TYPES
+    ]
+    db.session.add_all(players + penalty_types)
+    db.session.flush()
+    
+    first = last = None
+    chunk = []
+    for penalty in generate_penalties(n_penalties, n_players, app_module.DEFAULT_PENALTY_TYPES, seasons, seed):
+        first = min(first or penalty["date"], penalty["date"])
+        last = max(last or penalty["date"], penalty["date"])
+        penalty_type = penalty_types[penalty["penalty_type"]]
+        unit_amount_cents = app_module.to_cents(penalty_type.amount)
+        chunk.append({
+            "date": penalty["date"],
+            "player_id": players[penalty["player"]].id,
+            "penalty_type_id": penalty_type.id,
+            "quantity": penalty["quantity"],
+            "unit_amount_cents": unit_amount_cents,
+            "total_amount_cents": unit_amount_cents * penalty["quantity"],
+            "notes": penalty["notes"]
+        })
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            db.session.execute(db.insert(app_module.Penalty), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(db.insert(app_module.Penalty), chunk)
+    
+    app_module.bump_data_version(reference=True, history=True)
+    db.session.commit()
+    app_module.rebuild_aggregates()
+    
+    return first, last
+
+
+def write_workbook(template_filename, output_filename, n_penalties, players, penalty_types, seasons=3, seed=42):
+    """Fill the Erfassung sheet of a template workbook with synthetic penalties (values, no formulas)"""
+    workbook = openpyxl.load_workbook(template_filename)
+    worksheet = workbook["Erfassung"]
+    
+    penalties = generate_penalties(n_penalties, len(players), penalty_types, seasons, seed)
+    for row, penalty in enumerate(penalties, 3):
+        name, amount, _ = penalty_types[penalty["penalty_type"]]
+        values = (penalty["date"], players[penalty["player"]], name, penalty["quantity"],
+                  amount, amount * penalty["quantity"], penalty["notes"])
+        for col, value in enumerate(values, 1):
+            worksheet.cell(row=row, column=col, value=value)
+    
+    workbook.save(output_filename)
+    workbook.close()
+    return output_filename
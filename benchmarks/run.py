@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark runner for the ASV Natz Penalty Tracker
+Times the Flask routes and the database workbook export at several data sizes plus the workbook
+generator and CSV export, and writes the results as JSON so runs of different commits can be compared
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import datagen
+
+# Routes timed at every data size ({start}/{end} are the generated date range)
+ROUTES = [
+    ("dashboard", "/"),
+    ("penalties", "/penalties"),
+    ("penalties_player", "/penalties?player=1"),
+    ("statistics", "/statistics"),
+    ("statistics_full_range", "/statistics?date_from={start}&date_to={end}"),
+    ("export_csv", "/export_csv"),
+    ("api_penalties", "/api/penalties?limit=100"),
+    ("api_penalty_chart_data", "/api/penalty_chart_data?days=365"),
+]
+
+
+def time_calls(func, repeat):
+    """Call func repeat times; the first (cold) call is reported separately"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    
+    warm = timings[1:] or timings
+    return {
+        "first": timings[0],
+        "min": min(warm),
+        "median": statistics.median(warm),
+        "mean": statistics.mean(warm),
+        "runs": repeat
+    }, result
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_routes(app_module, sizes, n_players, seasons, seed, repeat):
+    """Populate the database at each size and time every route"""
+    results = {}
+    client = app_module.app.test_client()
+    client.post("/login", data={"access_type": "kassier", "access_code": app_module.ACCESS_CODES["kassier"]})
+    
+    for size in sizes:
+        print(f"📊 {size} Strafen: generiere Daten...")
+        with app_module.app.app_context():
+            start = time.perf_counter()
+            first, last = datagen.populate_database(app_module, n_players, size, seasons, seed)
+            generate_seconds = time.perf_counter() - start
+        
+        routes = {}
+        for name, url in ROUTES:
+            url = url.format(start=first, end=last)
+            
+            def request():
+                response = client.get(url)
+                return response.status_code, len(response.get_data())
+            
+            timing, (status, size_bytes) = time_calls(request, repeat)
+            routes[name] = dict(timing, url=url, status=status, bytes=size_bytes)
+            print(f"   {name:<24} {timing['median'] * 1000:10.1f} ms (erster Aufruf {timing['first'] * 1000:.1f} ms)")
+        
+        results[str(size)] = {"generate_seconds": generate_seconds, "routes": routes}
+        if app_module.analytics is not None:
+            results[str(size)]["analytics"] = benchmark_analytics(app_module, first, last, repeat)
+        results[str(size)]["exports"] = benchmark_exports(app_module)
+    
+    return results
+
+
+def benchmark_analytics(app_module, first, last, repeat):
+    """Compare the SQL statistics path with the pandas frame over the full date range"""
+    analytics = app_module.analytics
+    results = {}
+    with app_module.app.app_context():
+        player_names, penalty_type_names = app_module.reference_names()
+        
+        timing, frame = time_calls(lambda: analytics.build_frame(app_module.load_penalty_records()), repeat)
+        results["frame_load"] = timing
+        results["statistics_sql"], _ = time_calls(lambda: app_module.compute_statistics_sql(first, last), repeat)
+        results["statistics_pandas"], _ = time_calls(
+            lambda: analytics.statistics(frame, first, last, player_names, penalty_type_names), repeat)
+        results["report_pandas"], _ = time_calls(
+            lambda: analytics.report(frame, first, last, player_names, penalty_type_names), repeat)
+    
+    for name, timing in results.items():
+        print(f"   {name:<24} {timing['median'] * 1000:10.1f} ms")
+    return results
+
+
+def benchmark_exports(app_module):
+    """Time the database workbook export once per size (write-only, streamed from the database)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, app_module.app.app_context():
+        path = os.path.join(tmp, "export.xlsx")
+        timing, _ = time_calls(lambda: app_module.export_database_workbook(path), 1)
+        results["database_workbook"] = dict(timing, bytes=os.path.getsize(path))
+    
+    for name, timing in results.items():
+        print(f"   {name:<24} {timing['median'] * 1000:10.1f} ms")
+    return results
+
+
+def benchmark_workbooks(app_module, workbook_sizes, template_rows, n_players, seasons, seed, repeat):
+    """
+    Time build_strafenlog.create_penalty_tracking_workbook() at every template row count and
+    export_csv.export_penalties_to_csv() on templates filled with workbook_sizes penalties
+    """
+    import build_strafenlog
+    import export_csv
+    
+    results = {}
+    players = datagen.player_names(n_players, app_module.DEFAULT_PLAYERS)
+    
+    with tempfile.TemporaryDirectory() as tmp, working_directory(tmp), \
+            contextlib.redirect_stdout(io.StringIO()):
+        timing, template = time_calls(build_strafenlog.create_penalty_tracking_workbook, repeat)
+        results["create_penalty_tracking_workbook"] = dict(timing, bytes=os.path.getsize(template))
+        for rows in template_rows:
+            timing, filename = time_calls(lambda: build_strafenlog.create_penalty_tracking_workbook(
+                f"template_{rows}.xlsx", rows=rows), repeat)
+            results[f"create_penalty_tracking_workbook_{rows}"] = dict(timing, bytes=os.path.getsize(filename))
+        
+        for size in workbook_sizes:
+            workbook = datagen.write_workbook(template, f"bench_{size}.xlsx", size, players,
+                                              app_module.DEFAULT_PENALTY_TYPES, seasons, seed)
+            timing, csv_file = time_calls(
+                lambda: export_csv.export_penalties_to_csv(workbook, f"bench_{size}.csv"), repeat)
+            results[f"export_penalties_to_csv_{size}"] = dict(timing, bytes=os.path.getsize(csv_file))
+    
+    for name, result in results.items():
+        print(f"   {name:<40} {result['median'] * 1000:10.1f} ms {result['bytes'] / 1024:10.1f} KB")
+    return results
+
+
+def compare(baseline, current):
+    """Print the median change of every benchmark present in both result files"""
+    def medians(results):
+        flat = {}
+        for size, data in results.get("routes", {}).items():
+            for name, timing in list(data["routes"].items()) + list(data.get("analytics", {}).items()) \
+                    + list(data.get("exports", {}).items()):
+                flat[f"{name}@{size}"] = timing["median"]
+        for name, timing in results.get("workbooks", {}).items():
+            flat[name] = timing["median"]
+        return flat
+    
+    old, new = medians(baseline), medians(current)
+    print(f"\n📈 Vergleich mit {baseline.get('commit') or 'Basis'}:")
+    for name in sorted(set(old) & set(new)):
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0
+        marker = "⚠️ " if change > 10 else "  "
+        print(f"{marker} {name:<44} {old[name] * 1000:10.1f} ms → {new[name] * 1000:10.1f} ms ({change:+.1f}%)")
+    
+    old_files, new_files = baseline.get("workbooks", {}), current.get("workbooks", {})
+    for name in sorted(set(old_files) & set(new_files)):
+        old_size, new_size = old_files[name].get("bytes"), new_files[name].get("bytes")
+        if old_size and new_size:
+            print(f"   {name:<44} {old_size / 1024:10.1f} KB → {new_size / 1024:10.1f} KB "
+                  f"({(new_size - old_size) / old_size * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks für den ASV Natz Penalty Tracker")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="Anzahl Strafen pro Lauf")
+    parser.add_argument("--workbook-sizes", type=int, nargs="*", default=[1000, 10000],
+                        help="Befüllte Zeilen der Excel-Datei für den CSV-Export")
+    parser.add_argument("--template-rows", type=int, nargs="*", default=[50000],
+                        help="Vorbelegte Zeilen der Vorlage (zusätzlich zur Standardvorlage)")
+    parser.add_argument("--players", type=int, default=28)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Ergebnisse mit einem früheren Lauf vergleichen")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app binds its engine at import time, so point it at a scratch database first
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        import app as app_module
+        
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": vars(args),
+            "routes": benchmark_routes(app_module, args.sizes, args.players, args.seasons, args.seed, args.repeat),
+            "workbooks": benchmark_workbooks(app_module, args.workbook_sizes, args.template_rows, args.players,
+                                             args.seasons, args.seed, args.repeat)
+        }
+        with app_module.app.app_context():
+            app_module.db.engine.dispose()
+    
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"✅ Ergebnisse gespeichert: {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+    
+    return results
+
+
+if __name__ == "__main__":
+    main()
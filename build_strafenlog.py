@@ -5,25 +5,116 @@ Penalty Tracking System for ASV Natz Football Team
 Generates comprehensive Excel workbook with penalty tracking, statistics, and analysis
 """
 
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
 from openpyxl.formatting.rule import CellIsRule, FormulaRule
 from openpyxl.chart import LineChart, BarChart, Reference
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
-from openpyxl.worksheet.table import Table, TableStyleInfo
-from datetime import datetime, date
-import os
+from openpyxl.worksheet.table import Table, TableStyleInfo, TableColumn
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+import argparse
+import sys
+import warnings
 
+# Pre-allocated entry rows of the Erfassung sheet in the template
+TEMPLATE_ROWS = 1500
 
-def create_penalty_tracking_workbook():
-    """Create the complete penalty tracking Excel workbook"""
+CURRENCY_FORMAT = '#,##0.00 [$€-de-DE]'
+
+TEMPLATE_INFO = "Datum, Spieler & Vergehen wählen – Rest füllt sich automatisch. Filter nutzen, um Zeitraum/Spieler zu filtern."
+
+PLAYERS = [
+    "Maximilian Hofer", "Hannes Peintner", "Alex Braunhofer", "Alex Schraffel",
+    "Andreas Fusco", "Armin Feretti", "Hannes Larcher", "Julian Brunner",
+    "Leo Tauber", "Lukas Mayr", "Manuel Troger", "Martin Gasser",
+    "Matthias Schmid", "Maximilian Schraffl", "Michael Mitterrutzner", "Michael Peintner",
+    "Patrick Auer", "Patrick Pietersteiner", "Stefan Filo", "Stefan Peintner",
+    "Manuel Auer", "Mauro Monti", "Tobias", "Jakob Unterholzner",
+    "Fabian Bacher", "Emil Gabrieli", "Mardochee", "Oleg Schleiermann"
+]
+
+PENALTY_CATALOG = [
+    ("Unentschuldigtes Fehlen im Trainingslager", 50, ""),
+    ("Bier bei Essen Trainingslager", 10, ""),
+    ("Busfahrer pflanzen", 5, ""),
+    ("Alpha Aktion", 5, ""),
+    ("Ball in Q5", 2, ""),
+    ("Socken ohschneiden", 20, ""),
+    ("Valentinstog fahln", 50, ""),
+    ("Abschlussmatch verloren", 2, ""),
+    ("Fehlen beim Spiel wegen Urlaub", 30, ""),
+    ("Abwesenheit Urlaub während Meisterschaft", 10, ""),
+    ("Unentschuldigtes Fehlen Spiel", 50, ""),
+    ("Unentschieden Meisterschaftsspiel", 1, ""),
+    ("Niederlage Meisterschaftsspiel", 2, ""),
+    ("Spiel Socken ohschneiden", 20, ""),
+    ("Elfer verursachen", 10, ""),
+    ("Unentschuldigtes Fehlen beim Training", 20, ""),
+    ("100%ige Chance liegen lossen", 5, ""),
+    ("Falscher Einwurf", 5, ""),
+    ("Elfer verschiaßn", 10, ""),
+    ("Tormonn Papelle kregn", 5, ""),
+    ("Freitig glei nochn Training gian", 2, ""),
+    ("Schuache in Kabine ohklopfn", 5, ""),
+    ("Kistenplan net einholten /pro Kopf", 30, ""),
+    ("Übung bei training vertschecken", 1, ""),
+    ("Torello 20 Pässe", 2, ""),
+    ("Übern tennisplotz mit FB schuach gian", 5, ""),
+    ("Nochn training gian ohne eps zu verraumen", 5, ""),
+    ("Gelbsperre/Rotsperre pro Spiel", 15, ""),
+    ("Kabinendienst vernachlässigt", 10, ""),
+    ("Freitags Abschluss-Spiel verloren", 2, ""),
+    ("Abwesenheit Urlaub in Vorbereitung", 5, ""),
+    ("Glei nochn Hoamspiel gian(min 30 min.)", 10, ""),
+    ("Saufn vorn Spiel", 50, ""),
+    ("Unsportliches Verhalten gegenüber Mitspieler/Trai", 50, ""),
+    ("Erstes Tor/Startelfeinsatz", 0, "Kasten (ansonsten 20€)"),
+    ("Eigentor", 0, "Kasten (ansonsten 20€)"),
+    ("Foto in Zeitung/Online", 2, ""),
+    ("Sachen in Kabine/Platz vergessen", 5, ""),
+    ("Unentschuldigtes fehlen beim Training ohne Absage", 15, ""),
+    ("Rauchen im Trikot", 15, ""),
+    ("Bei Spiel folscher Trainer", 20, ""),
+    ("Folsches Trainingsgewond", 5, ""),
+    ("Handy leitn in do kabine", 5, ""),
+    ("Schiffn in do Dusche", 20, ""),
+    ("Oan setzn in do Kabine (wenns stinkt 20€)", 5, ""),
+    ("Frau/freindin fa an Mitspieler verraumen", 500, ""),
+    ("Geburtstogsessen net innerholb 1 Monat gebrocht", 150, ""),
+    ("Rote Karte wegn Unsportlichkeit", 50, ""),
+    ("Gelbe Karte wegn Unsportlichkeit", 20, ""),
+    ("Zu spät - Pauschale", 5, "")
+]
+
+TRAINING_SAMPLE = [
+    ("2024-08-01", "Donnerstag", "19:00", "Konditionstraining", "Stollen"),
+    ("2024-08-03", "Samstag", "10:00", "Testspiel", "Stollen"),
+    ("2024-08-05", "Montag", "19:30", "Techniktraining", "Halle"),
+    ("2024-08-08", "Donnerstag", "19:00", "Spielaufbau", "Stollen"),
+    ("2024-08-10", "Samstag", "15:00", "Meisterschaftsspiel", "Stollen")
+]
+
+
+def create_penalty_tracking_workbook(filename="Strafenerfassung_ASV_Natz.xlsx", rows=TEMPLATE_ROWS):
+    """
+    Create the complete penalty tracking Excel workbook
     
-    # Create new workbook
-    wb = Workbook()
+    Written with the same write-only sheet writers as the database export: formats are set per column
+    and table, validations and conditional formats cover the whole entry range in one rule each.
     
-    # Remove default worksheet
-    wb.remove(wb.active)
+    Args:
+        filename (str): Path of the workbook to write
+        rows (int): Number of pre-allocated entry rows in Erfassung
+    """
+    
+    # Create new workbook (the first sheet is the active one)
+    wb = Workbook(write_only=True)
+    
+    # Define styles
+    create_styles(wb)
     
     # Create all worksheets
     ws_erfassung = wb.create_sheet("Erfassung")
@@ -32,21 +123,14 @@ def create_penalty_tracking_workbook():
     ws_statistik = wb.create_sheet("Statistik")
     ws_trainingsplan = wb.create_sheet("Trainingsplan")
     
-    # Set active sheet to Erfassung
-    wb.active = ws_erfassung
-    
-    # Define styles
-    create_styles(wb)
-    
-    # Create each sheet
-    create_erfassung_sheet(ws_erfassung)
-    create_spielerliste_sheet(ws_spielerliste)
-    create_strafenkatalog_sheet(ws_strafenkatalog)
-    create_statistik_sheet(ws_statistik)
-    create_trainingsplan_sheet(ws_trainingsplan)
+    # Fill each sheet (room for 200 players and 400 catalog entries)
+    write_erfassung_sheet(ws_erfassung, [], 200, 400, entry_rows=rows, info=TEMPLATE_INFO)
+    write_spielerliste_sheet(ws_spielerliste, PLAYERS, 200)
+    write_strafenkatalog_sheet(ws_strafenkatalog, PENALTY_CATALOG, 400)
+    write_statistik_sheet(ws_statistik, PLAYERS, [name for name, _, _ in PENALTY_CATALOG], 200)
+    write_trainingsplan_sheet(ws_trainingsplan, TRAINING_SAMPLE)
     
     # Save workbook
-    filename = "Strafenerfassung_ASV_Natz.xlsx"
     wb.save(filename)
     print(f"✅ Excel-Datei '{filename}' erfolgreich erstellt!")
     
@@ -69,439 +153,460 @@ def create_styles(wb):
     
     # Currency style
     currency_style = NamedStyle(name="currency_style")
-    currency_style.number_format = '#,##0.00 [$€-de-DE]'
+    currency_style.number_format = CURRENCY_FORMAT
     wb.add_named_style(currency_style)
 
 
-def create_erfassung_sheet(ws):
-    """Create the main penalty input sheet"""
+
+# Sheet writers for the template and the database export, using write-only workbooks so rows go
+# straight to disk instead of building the cell graph in memory.
+# Write-only sheets are written top to bottom, so column widths and freeze panes come first
+# and tables, validations and formatting (stored after the rows) are added once the row count is known.
+
+def create_database_workbook(filename, penalties, players, penalty_types, precomputed=True):
+    """
+    Write the tracking workbook with data from the database
+    
+    Args:
+        filename (str): Path of the workbook to write
+        penalties (iterable): (date, player, penalty type, quantity, unit amount, total, notes) rows, streamed
+        players (list): Player names
+        penalty_types (list): (name, amount, description) tuples
+        precomputed (bool): Statistik with values computed while writing Erfassung instead of formulas
+    
+    Returns:
+        int: Number of penalty rows written
+    """
+    wb = Workbook(write_only=True)
+    create_styles(wb)
     
-    # Info message in first row
-    ws.merge_cells('H1:P1')
-    ws['H1'] = "Datum, Spieler & Vergehen wählen – Rest füllt sich automatisch. Filter nutzen, um Zeitraum/Spieler zu filtern."
-    ws['H1'].font = Font(italic=True, size=9)
-    ws['H1'].alignment = Alignment(horizontal='center')
+    ws_erfassung = wb.create_sheet("Erfassung")
+    ws_spielerliste = wb.create_sheet("Spielerliste")
+    ws_strafenkatalog = wb.create_sheet("Strafenkatalog")
+    ws_statistik = wb.create_sheet("Statistik")
     
-    # Headers
-    headers = ["Datum", "Spieler", "Vergehen", "Anzahl", "Einzelbetrag (€)", "Gesamt (€)", "Notiz"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col, value=header)
-        cell.style = "header_style"
+    # Last rows of the player and catalog tables (with room for new entries, as in the template)
+    players_end = max(len(players) + 1, 200)
+    catalog_end = max(len(penalty_types) + 1, 400)
+    
+    aggregates = StatistikAggregates() if precomputed else None
+    penalty_count = write_erfassung_sheet(ws_erfassung, penalties, players_end, catalog_end, aggregates)
+    write_spielerliste_sheet(ws_spielerliste, players, players_end)
+    write_strafenkatalog_sheet(ws_strafenkatalog, penalty_types, catalog_end)
+    write_statistik_sheet(ws_statistik, players, [name for name, _, _ in penalty_types], players_end, aggregates)
+    
+    wb.save(filename)
+    return penalty_count
+
+
+def styled_cell(ws, value=None, style=None, font=None, number_format=None):
+    """Write-only cell with a named style, font or number format"""
+    cell = WriteOnlyCell(ws, value=value)
+    if style:
+        cell.style = style
+    if font:
+        cell.font = font
+    if number_format:
+        cell.number_format = number_format
+    return cell
+
+
+def add_table(ws, name, ref, style, headers):
+    """Add a striped table like the template sheets (write-only sheets need the column names given)"""
+    table = Table(displayName=name, ref=ref)
+    table.tableColumns = [TableColumn(id=i, name=header) for i, header in enumerate(headers, 1)]
+    table.tableStyleInfo = TableStyleInfo(name=style, showFirstColumn=False,
+                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
+    with warnings.catch_warnings():
+        # openpyxl warns for every table of a write-only sheet, even with the columns set
+        warnings.simplefilter("ignore", UserWarning)
+        ws.add_table(table)
+
+
+def write_erfassung_sheet(ws, penalties, players_end, catalog_end, aggregates=None, entry_rows=0, info=None):
+    """
+    Stream the penalty rows into the Erfassung sheet (collecting the Statistik aggregates)
+    
+    entry_rows empty rows with the Einzelbetrag/Gesamt formulas follow the penalties. Number formats
+    are set on the columns, so only the formula and amount cells carry a (shared) style.
     
-    # Set column widths
-    column_widths = [13, 24, 36, 10, 18, 16, 28]
-    for col, width in enumerate(column_widths, 1):
+    Returns:
+        int: Number of penalty rows written
+    """
+    
+    # Column widths, column formats and frozen header (written before the rows)
+    for col, width in enumerate([13, 24, 36, 10, 18, 16, 28], 1):
         ws.column_dimensions[get_column_letter(col)].width = width
+    ws.column_dimensions['A'].number_format = 'DD.MM.YYYY'
+    ws.column_dimensions['E'].number_format = CURRENCY_FORMAT
+    ws.column_dimensions['F'].number_format = CURRENCY_FORMAT
+    ws.freeze_panes = 'A3'
     
-    # Add data rows (1500 rows from row 3 to 1502)
-    for row in range(3, 1503):
-        # Datum (A) - no default value
-        ws.cell(row=row, column=1)
-        
-        # Spieler (B) - no default value
-        ws.cell(row=row, column=2)
-        
-        # Vergehen (C) - no default value
-        ws.cell(row=row, column=3)
-        
-        # Anzahl (D) - default value 1
-        ws.cell(row=row, column=4, value=1)
-        
-        # Einzelbetrag (E) - formula
-        formula_e = f'=IFERROR(XLOOKUP(C{row},Strafenkatalog!$A$2:$A$400,Strafenkatalog!$B$2:$B$400),IFERROR(VLOOKUP(C{row},Strafenkatalog!$A$2:$B$400,2,FALSE),0))'
-        ws.cell(row=row, column=5, value=formula_e)
-        ws.cell(row=row, column=5).style = "currency_style"
-        
-        # Gesamt (F) - formula
-        formula_f = f'=IFERROR(D{row}*E{row},0)'
-        ws.cell(row=row, column=6, value=formula_f)
-        ws.cell(row=row, column=6).style = "currency_style"
-        
-        # Notiz (G) - empty
-        ws.cell(row=row, column=7)
+    # Info message in first row
+    if info is None:
+        info = "Exportiert am " + datetime.now().strftime("%d.%m.%Y %H:%M") + " aus der Datenbank."
+    info_cell = styled_cell(ws, info, font=Font(italic=True, size=9))
+    info_cell.alignment = Alignment(horizontal='center')
+    ws.append([None] * 7 + [info_cell])
+    ws.merged_cells.add('H1:P1')
     
-    # Create table
-    table_range = "A2:G1502"
-    table = Table(displayName="tblErfassung", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium9", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
+    # Headers
+    headers = ["Datum", "Spieler", "Vergehen", "Anzahl", "Einzelbetrag (€)", "Gesamt (€)", "Notiz"]
+    ws.append([styled_cell(ws, header, "header_style") for header in headers])
+    
+    # Data rows: the date and currency cells are styled once and reused for every row
+    date_cell = styled_cell(ws, number_format='DD.MM.YYYY')
+    unit_cell = styled_cell(ws, style="currency_style")
+    total_cell = styled_cell(ws, style="currency_style")
+    count = 0
+    for penalty_date, player, penalty_type, quantity, unit_amount, total, notes in penalties:
+        date_cell.value = penalty_date
+        unit_cell.value = unit_amount
+        total_cell.value = total
+        ws.append([date_cell, player, penalty_type, quantity, unit_cell, total_cell, notes or None])
+        if aggregates is not None:
+            aggregates.add(penalty_date, player, penalty_type, total)
+        count += 1
+    
+    # Entry rows: Anzahl 1, Einzelbetrag from the catalog, Gesamt = Anzahl × Einzelbetrag
+    if count + entry_rows == 0:
+        entry_rows = 1
+    for row in range(count + 3, count + entry_rows + 3):
+        unit_cell.value = f'=IFERROR(VLOOKUP(C{row},Strafenkatalog!$A$2:$B${catalog_end},2,FALSE),0)'
+        total_cell.value = f'=IFERROR(D{row}*E{row},0)'
+        ws.append([None, None, None, 1, unit_cell, total_cell])
+    
+    last_row = count + entry_rows + 2
+    table_range = f"A2:G{last_row}"
+    add_table(ws, "tblErfassung", table_range, "TableStyleMedium9", headers)
+    ws.auto_filter.ref = table_range
     
-    # Data validation for Datum
-    date_validation = DataValidation(type="date", operator="between", 
+    # Dropdowns and checks, one rule per column over the whole range
+    date_validation = DataValidation(type="date", operator="between",
                                    formula1=date(2000, 1, 1), formula2=date(2100, 12, 31),
-                                   errorTitle="Ungültiges Datum", 
+                                   errorTitle="Ungültiges Datum",
                                    error="Bitte geben Sie ein gültiges Datum zwischen 01.01.2000 und 31.12.2100 ein.")
-    date_validation.add(f"A3:A1502")
-    ws.add_data_validation(date_validation)
+    date_validation.add(f"A3:A{last_row}")
+    ws.data_validations.append(date_validation)
     
-    # Data validation for Spieler (dropdown)
-    player_validation = DataValidation(type="list", formula1="=Spielerliste!$A$2:$A$200",
+    player_validation = DataValidation(type="list", formula1=f"=Spielerliste!$A$2:$A${players_end}",
                                      errorTitle="Ungültiger Spieler",
                                      error="Bitte wählen Sie einen Spieler aus der Liste.")
-    player_validation.add(f"B3:B1502")
-    ws.add_data_validation(player_validation)
+    player_validation.add(f"B3:B{last_row}")
+    ws.data_validations.append(player_validation)
     
-    # Data validation for Vergehen (dropdown)
-    penalty_validation = DataValidation(type="list", formula1="=Strafenkatalog!$A$2:$A$400",
+    penalty_validation = DataValidation(type="list", formula1=f"=Strafenkatalog!$A$2:$A${catalog_end}",
                                        errorTitle="Ungültiges Vergehen",
                                        error="Bitte wählen Sie ein Vergehen aus dem Katalog.")
-    penalty_validation.add(f"C3:C1502")
-    ws.add_data_validation(penalty_validation)
+    penalty_validation.add(f"C3:C{last_row}")
+    ws.data_validations.append(penalty_validation)
     
-    # Data validation for Anzahl
     anzahl_validation = DataValidation(type="whole", operator="greaterThanOrEqual", formula1=1,
                                       errorTitle="Ungültige Anzahl",
                                       error="Die Anzahl muss mindestens 1 betragen.")
-    anzahl_validation.add(f"D3:D1502")
-    ws.add_data_validation(anzahl_validation)
+    anzahl_validation.add(f"D3:D{last_row}")
+    ws.data_validations.append(anzahl_validation)
     
-    # Conditional formatting
-    # Yellow fill for empty dates
+    # Conditional formatting: yellow for a missing date, red for a missing player or penalty,
+    # green for positive amounts
     yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-    empty_date_rule = FormulaRule(formula=[f'AND(A3="",OR(B3<>"",C3<>""))'], fill=yellow_fill)
-    ws.conditional_formatting.add(f"A3:A1502", empty_date_rule)
-    
-    # Red fill for empty player or penalty
     red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-    empty_player_rule = FormulaRule(formula=[f'AND(B3="",OR(A3<>"",C3<>""))'], fill=red_fill)
-    empty_penalty_rule = FormulaRule(formula=[f'AND(C3="",OR(A3<>"",B3<>""))'], fill=red_fill)
-    ws.conditional_formatting.add(f"B3:B1502", empty_player_rule)
-    ws.conditional_formatting.add(f"C3:C1502", empty_penalty_rule)
-    
-    # Green fill for positive amounts
     green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    positive_amount_rule = CellIsRule(operator='greaterThan', formula=['0'], fill=green_fill)
-    ws.conditional_formatting.add(f"F3:F1502", positive_amount_rule)
-    
-    # Enable filter
-    ws.auto_filter.ref = table_range
-    
-    # Freeze panes
-    ws.freeze_panes = 'A3'
+    ws.conditional_formatting.add(f"A3:A{last_row}",
+                                  FormulaRule(formula=['AND(A3="",OR(B3<>"",C3<>""))'], fill=yellow_fill))
+    ws.conditional_formatting.add(f"B3:B{last_row}",
+                                  FormulaRule(formula=['AND(B3="",OR(A3<>"",C3<>""))'], fill=red_fill))
+    ws.conditional_formatting.add(f"C3:C{last_row}",
+                                  FormulaRule(formula=['AND(C3="",OR(A3<>"",B3<>""))'], fill=red_fill))
+    ws.conditional_formatting.add(f"F3:F{last_row}",
+                                  CellIsRule(operator='greaterThan', formula=['0'], fill=green_fill))
+    return count
 
 
-def create_spielerliste_sheet(ws):
-    """Create the player list sheet"""
-    
-    # Header
-    ws['A1'] = "Spieler"
-    ws['A1'].style = "header_style"
-    
-    # Player names
-    players = [
-        "Maximilian Hofer", "Hannes Peintner", "Alex Braunhofer", "Alex Schraffel",
-        "Andreas Fusco", "Armin Feretti", "Hannes Larcher", "Julian Brunner",
-        "Leo Tauber", "Lukas Mayr", "Manuel Troger", "Martin Gasser",
-        "Matthias Schmid", "Maximilian Schraffl", "Michael Mitterrutzner", "Michael Peintner",
-        "Patrick Auer", "Patrick Pietersteiner", "Stefan Filo", "Stefan Peintner",
-        "Manuel Auer", "Mauro Monti", "Tobias", "Jakob Unterholzner",
-        "Fabian Bacher", "Emil Gabrieli", "Mardochee", "Oleg Schleiermann"
-    ]
-    
-    # Add players to sheet
-    for i, player in enumerate(players, 2):
-        ws.cell(row=i, column=1, value=player)
-    
-    # Set column width
+def write_spielerliste_sheet(ws, players, players_end):
+    """Write the player list"""
     ws.column_dimensions['A'].width = 26
-    
-    # Create table
-    table_range = "A1:A200"
-    table = Table(displayName="tblSpieler", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
+    ws.append([styled_cell(ws, "Spieler", "header_style")])
+    for player in players:
+        ws.append([player])
+    add_table(ws, "tblSpieler", f"A1:A{players_end}", "TableStyleMedium2", ["Spieler"])
 
 
-def create_strafenkatalog_sheet(ws):
-    """Create the penalty catalog sheet"""
+def write_strafenkatalog_sheet(ws, penalty_types, catalog_end):
+    """Write the penalty catalog"""
+    for col, width in zip("ABC", [50, 20, 30]):
+        ws.column_dimensions[col].width = width
     
-    # Headers
     headers = ["Vergehen", "Strafe (€) pro Einheit", "Beschreibung (optional)"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.style = "header_style"
-    
-    # Penalty data
-    penalties = [
-        ("Unentschuldigtes Fehlen im Trainingslager", 50, ""),
-        ("Bier bei Essen Trainingslager", 10, ""),
-        ("Busfahrer pflanzen", 5, ""),
-        ("Alpha Aktion", 5, ""),
-        ("Ball in Q5", 2, ""),
-        ("Socken ohschneiden", 20, ""),
-        ("Valentinstog fahln", 50, ""),
-        ("Abschlussmatch verloren", 2, ""),
-        ("Fehlen beim Spiel wegen Urlaub", 30, ""),
-        ("Abwesenheit Urlaub während Meisterschaft", 10, ""),
-        ("Unentschuldigtes Fehlen Spiel", 50, ""),
-        ("Unentschieden Meisterschaftsspiel", 1, ""),
-        ("Niederlage Meisterschaftsspiel", 2, ""),
-        ("Spiel Socken ohschneiden", 20, ""),
-        ("Elfer verursachen", 10, ""),
-        ("Unentschuldigtes Fehlen beim Training", 20, ""),
-        ("100%ige Chance liegen lossen", 5, ""),
-        ("Falscher Einwurf", 5, ""),
-        ("Elfer verschiaßn", 10, ""),
-        ("Tormonn Papelle kregn", 5, ""),
-        ("Freitig glei nochn Training gian", 2, ""),
-        ("Schuache in Kabine ohklopfn", 5, ""),
-        ("Kistenplan net einholten /pro Kopf", 30, ""),
-        ("Übung bei training vertschecken", 1, ""),
-        ("Torello 20 Pässe", 2, ""),
-        ("Übern tennisplotz mit FB schuach gian", 5, ""),
-        ("Nochn training gian ohne eps zu verraumen", 5, ""),
-        ("Gelbsperre/Rotsperre pro Spiel", 15, ""),
-        ("Kabinendienst vernachlässigt", 10, ""),
-        ("Freitags Abschluss-Spiel verloren", 2, ""),
-        ("Abwesenheit Urlaub in Vorbereitung", 5, ""),
-        ("Glei nochn Hoamspiel gian(min 30 min.)", 10, ""),
-        ("Saufn vorn Spiel", 50, ""),
-        ("Unsportliches Verhalten gegenüber Mitspieler/Trai", 50, ""),
-        ("Erstes Tor/Startelfeinsatz", 0, "Kasten (ansonsten 20€)"),
-        ("Eigentor", 0, "Kasten (ansonsten 20€)"),
-        ("Foto in Zeitung/Online", 2, ""),
-        ("Sachen in Kabine/Platz vergessen", 5, ""),
-        ("Unentschuldigtes fehlen beim Training ohne Absage", 15, ""),
-        ("Rauchen im Trikot", 15, ""),
-        ("Bei Spiel folscher Trainer", 20, ""),
-        ("Folsches Trainingsgewond", 5, ""),
-        ("Handy leitn in do kabine", 5, ""),
-        ("Schiffn in do Dusche", 20, ""),
-        ("Oan setzn in do Kabine (wenns stinkt 20€)", 5, ""),
-        ("Frau/freindin fa an Mitspieler verraumen", 500, ""),
-        ("Geburtstogsessen net innerholb 1 Monat gebrocht", 150, ""),
-        ("Rote Karte wegn Unsportlichkeit", 50, ""),
-        ("Gelbe Karte wegn Unsportlichkeit", 20, ""),
-        ("Zu spät - Pauschale", 5, "")
-    ]
-    
-    # Add penalty data
-    for i, (penalty, amount, description) in enumerate(penalties, 2):
-        ws.cell(row=i, column=1, value=penalty)
-        ws.cell(row=i, column=2, value=amount).style = "currency_style"
-        ws.cell(row=i, column=3, value=description)
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 50
-    ws.column_dimensions['B'].width = 20
-    ws.column_dimensions['C'].width = 30
-    
-    # Create table with 200 additional empty rows for future entries
-    table_range = "A1:C400"
-    table = Table(displayName="tblKatalog", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
+    ws.append([styled_cell(ws, header, "header_style") for header in headers])
+    for name, amount, description in penalty_types:
+        ws.append([name, styled_cell(ws, amount, "currency_style"), description or None])
+    add_table(ws, "tblKatalog", f"A1:C{catalog_end}", "TableStyleMedium2", headers)
 
 
-def create_statistik_sheet(ws):
-    """Create the comprehensive statistics sheet"""
-    
-    # Control section headers
-    ws['A2'] = "Zeitraum Start"
-    ws['A2'].style = "header_style"
-    ws['B2'] = f"=DATE(YEAR(TODAY()),MONTH(TODAY()),1)"
-    
-    ws['C2'] = "Zeitraum Ende"
-    ws['C2'].style = "header_style"
-    ws['D2'] = "=TODAY()"
-    
-    ws['A4'] = "Spieler (Auswahl)"
-    ws['A4'].style = "header_style"
-    
-    # Player selection dropdown
-    player_validation = DataValidation(type="list", formula1="=Spielerliste!$A$2:$A$200")
-    player_validation.add("B4")
-    ws.add_data_validation(player_validation)
-    
-    # Set column widths for control section
-    ws.column_dimensions['A'].width = 36
-    ws.column_dimensions['B'].width = 16
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 16
-    
-    # KPIs section
-    ws['A6'] = "Gesamtbetrag (Zeitraum)"
-    ws['A6'].style = "header_style"
-    ws['B6'] = '=IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0)'
-    ws['B6'].style = "currency_style"
-    
-    ws['A7'] = "Anzahl Einträge (Zeitraum)"
-    ws['A7'].style = "header_style"
-    ws['B7'] = '=IFERROR(COUNTIFS(tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0)'
-    
-    ws['A8'] = "Ø Betrag pro Eintrag"
-    ws['A8'].style = "header_style"
-    ws['B8'] = '=IF(B7=0,0,B6/B7)'
-    ws['B8'].style = "currency_style"
-    
-    ws['A9'] = "Höchste Einzelstrafe"
-    ws['A9'].style = "header_style"
-    ws['B9'] = '=IFERROR(AGGREGATE(14,6,tblErfassung[Gesamt (€)]/(tblErfassung[Datum]>=$B$2)/(tblErfassung[Datum]<=$D$2),1),0)'
-    ws['B9'].style = "currency_style"
-    
-    # Player statistics table
-    ws['A11'] = "Spieler"
-    ws['A11'].style = "header_style"
-    ws['B11'] = "Summe (€)"
-    ws['B11'].style = "header_style"
-    ws['C11'] = "Anzahl"
-    ws['C11'].style = "header_style"
-    ws['D11'] = "Ø (€)"
-    ws['D11'].style = "header_style"
-    
-    # Add players and formulas
-    players = [
-        "Maximilian Hofer", "Hannes Peintner", "Alex Braunhofer", "Alex Schraffel",
-        "Andreas Fusco", "Armin Feretti", "Hannes Larcher", "Julian Brunner",
-        "Leo Tauber", "Lukas Mayr", "Manuel Troger", "Martin Gasser",
-        "Matthias Schmid", "Maximilian Schraffl", "Michael Mitterrutzner", "Michael Peintner",
-        "Patrick Auer", "Patrick Pietersteiner", "Stefan Filo", "Stefan Peintner",
-        "Manuel Auer", "Mauro Monti", "Tobias", "Jakob Unterholzner",
-        "Fabian Bacher", "Emil Gabrieli", "Mardochee", "Oleg Schleiermann"
-    ]
-    
-    for i, player in enumerate(players, 12):
-        ws.cell(row=i, column=1, value=player)
-        ws.cell(row=i, column=2, value=f'=IF(A{i}="",0,IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Spieler],A{i},tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0))').style = "currency_style"
-        ws.cell(row=i, column=3, value=f'=IF(A{i}="",0,IFERROR(COUNTIFS(tblErfassung[Spieler],A{i},tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0))')
-        ws.cell(row=i, column=4, value=f'=IF(C{i}=0,0,B{i}/C{i})').style = "currency_style"
-    
-    # Penalty statistics table
-    ws['F11'] = "Vergehen"
-    ws['F11'].style = "header_style"
-    ws['G11'] = "Summe (€)"
-    ws['G11'].style = "header_style"
-    ws['H11'] = "Anzahl"
-    ws['H11'].style = "header_style"
-    ws['I11'] = "Ø (€)"
-    ws['I11'].style = "header_style"
-    
-    # Add penalty formulas (using first 50 penalties as example)
-    penalties = [
-        "Unentschuldigtes Fehlen im Trainingslager", "Bier bei Essen Trainingslager", "Busfahrer pflanzen",
-        "Alpha Aktion", "Ball in Q5", "Socken ohschneiden", "Valentinstog fahln", "Abschlussmatch verloren",
-        "Fehlen beim Spiel wegen Urlaub", "Abwesenheit Urlaub während Meisterschaft"
-    ]
-    
-    for i, penalty in enumerate(penalties[:10], 12):  # Show first 10 as example
-        ws.cell(row=i, column=6, value=penalty)
-        ws.cell(row=i, column=7, value=f'=IF(F{i}="",0,IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Vergehen],F{i},tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0))').style = "currency_style"
-        ws.cell(row=i, column=8, value=f'=IF(F{i}="",0,IFERROR(COUNTIFS(tblErfassung[Vergehen],F{i},tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2),0))')
-        ws.cell(row=i, column=9, value=f'=IF(H{i}=0,0,G{i}/H{i})').style = "currency_style"
-    
-    # Create player statistics table
-    table_range = "A11:D40"
-    table = Table(displayName="tblStatSpieler", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
+def write_trainingsplan_sheet(ws, sessions):
+    """Write the training schedule"""
+    for col in "ABCDE":
+        ws.column_dimensions[col].width = 18
     
-    # Create penalty statistics table
-    table_range = "F11:I21"
-    table = Table(displayName="tblStatVergehen", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium7", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
-    
-    # Time series section
-    ws['A25'] = "Strafen über Zeit – Spieler"
-    ws['A25'].font = Font(bold=True)
-    ws['F24'] = "Tage anzeigen"
-    ws['F24'].style = "header_style"
-    ws['G24'] = 90
+    headers = ["Datum", "Tag", "Uhrzeit", "Einheit", "Schuhe"]
+    ws.append([styled_cell(ws, header, "header_style") for header in headers])
+    for session in sessions:
+        ws.append(list(session))
+    add_table(ws, "tblTrainingsplan", f"A1:E{max(len(sessions) + 1, 20)}", "TableStyleLight9", headers)
+
+
+class StatistikAggregates:
+    """
+    Everything the Statistik sheet sums up, collected in one pass over the Erfassung rows
+    
+    Same ranges as the template formulas: totals per player and penalty type within the period,
+    daily amounts per player for series_days days from the period start and monthly amounts per player
+    for the month of the period start and the following ones.
+    """
+    
+    def __init__(self, date_from=None, date_to=None, series_days=90, months=12):
+        today = date.today()
+        self.date_from = date_from or today.replace(day=1)
+        self.date_to = date_to or today
+        self.series_days = series_days
+        self.months = months
+        self.player_totals = defaultdict(lambda: [0.0, 0])
+        self.type_totals = defaultdict(lambda: [0.0, 0])
+        self.daily = defaultdict(lambda: [0.0] * series_days)
+        self.monthly = defaultdict(lambda: [0.0] * months)
+    
+    def add(self, penalty_date, player, penalty_type, total):
+        if isinstance(penalty_date, datetime):
+            penalty_date = penalty_date.date()
+        if not isinstance(penalty_date, date):
+            return
+        total = total or 0
+        
+        if self.date_from <= penalty_date <= self.date_to:
+            self.player_totals[player][0] += total
+            self.player_totals[player][1] += 1
+            self.type_totals[penalty_type][0] += total
+            self.type_totals[penalty_type][1] += 1
+        
+        day = (penalty_date - self.date_from).days
+        if 0 <= day < self.series_days:
+            self.daily[player][day] += total
+        
+        month = (penalty_date.year - self.date_from.year) * 12 + penalty_date.month - self.date_from.month
+        if 0 <= month < self.months:
+            self.monthly[player][month] += total
+    
+    def series_dates(self):
+        return [self.date_from + timedelta(days=day) for day in range(self.series_days)]
+    
+    def month_ends(self):
+        """Last day of every matrix month (the EOMONTH values of the template)"""
+        ends = []
+        year, month = self.date_from.year, self.date_from.month
+        for _ in range(self.months):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            ends.append(date(year, month, 1) - timedelta(days=1))
+        return ends
+
+
+def write_statistik_sheet(ws, players, penalty_types, players_end, aggregates=None):
+    """
+    Write the statistics sheet for the given players and penalty types
+    
+    Without aggregates every figure is a formula over tblErfassung, recalculated by Excel on every change.
+    With aggregates (StatistikAggregates) the tables, series and matrix are written as values for the
+    period of the aggregates; only the KPI summary stays live and the series follows the player
+    selection in B4 by looking up precomputed columns.
+    """
+    
+    # Column widths and frozen header (written before the rows)
+    for col, width in zip("ABCD", [36, 16, 20, 16]):
+        ws.column_dimensions[col].width = width
+    ws.freeze_panes = 'A12'
     
-    # Date series and amounts for time series
-    for i in range(26, 116):  # 90 days
-        ws.cell(row=i, column=1, value=f'=IF(ROW()-ROW($A$26)+1<=$G$24,$B$2+ROW()-ROW($A$26),"")')
-        ws.cell(row=i, column=2, value=f'=IF(A{i}="","",IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Spieler],$B$4,tblErfassung[Datum],A{i}),0))')
+    header = lambda value: styled_cell(ws, value, "header_style")
+    currency = lambda value: styled_cell(ws, value, "currency_style")
+    bold = lambda value: styled_cell(ws, value, font=Font(bold=True))
+    day = lambda value: styled_cell(ws, value, number_format='DD.MM.YYYY')
+    in_range = 'tblErfassung[Datum],">="&$B$2,tblErfassung[Datum],"<="&$D$2'
+    rows = {}
+    
+    # Control section and KPIs (the KPIs stay live formulas in both modes)
+    if aggregates is None:
+        rows[2] = [header("Zeitraum Start"), "=DATE(YEAR(TODAY()),MONTH(TODAY()),1)",
+                   header("Zeitraum Ende"), "=TODAY()"]
+    else:
+        rows[1] = [styled_cell(ws, "Werte berechnet am " + datetime.now().strftime("%d.%m.%Y %H:%M")
+                               + " – neu berechnen: python build_strafenlog.py --refresh <Datei>",
+                               font=Font(italic=True, size=9))]
+        rows[2] = [header("Zeitraum Start"), day(aggregates.date_from),
+                   header("Zeitraum Ende"), day(aggregates.date_to)]
+    rows[4] = [header("Spieler (Auswahl)")]
+    rows[6] = [header("Gesamtbetrag (Zeitraum)"),
+               currency(f'=IFERROR(SUMIFS(tblErfassung[Gesamt (€)],{in_range}),0)')]
+    rows[7] = [header("Anzahl Einträge (Zeitraum)"), f'=IFERROR(COUNTIFS({in_range}),0)']
+    rows[8] = [header("Ø Betrag pro Eintrag"), currency('=IF(B7=0,0,B6/B7)')]
+    rows[9] = [header("Höchste Einzelstrafe"),
+               currency('=IFERROR(AGGREGATE(14,6,tblErfassung[Gesamt (€)]/(tblErfassung[Datum]>=$B$2)'
+                        '/(tblErfassung[Datum]<=$D$2),1),0)')]
+    
+    def stat_cells(i, column, name, criteria, totals):
+        """Name, sum, count and average of one row of the player or penalty table"""
+        name_col, sum_col, count_col = (get_column_letter(column + offset) for offset in range(3))
+        if totals is None:
+            return [
+                name,
+                currency(f'=IF({name_col}{i}="",0,IFERROR(SUMIFS(tblErfassung[Gesamt (€)],{criteria},{name_col}{i},{in_range}),0))'),
+                f'=IF({name_col}{i}="",0,IFERROR(COUNTIFS({criteria},{name_col}{i},{in_range}),0))',
+                currency(f'=IF({count_col}{i}=0,0,{sum_col}{i}/{count_col}{i})')
+            ]
+        amount, count = totals.get(name, (0.0, 0))
+        return [name, currency(round(amount, 2)), count, currency(round(amount / count, 2) if count else 0)]
+    
+    # Player and penalty statistics side by side
+    rows[11] = [header("Spieler"), header("Summe (€)"), header("Anzahl"), header("Ø (€)"), None,
+                header("Vergehen"), header("Summe (€)"), header("Anzahl"), header("Ø (€)")]
+    for i in range(12, 12 + max(len(players), len(penalty_types))):
+        row = [None] * 9
+        if i - 12 < len(players):
+            row[0:4] = stat_cells(i, 1, players[i - 12], 'tblErfassung[Spieler]',
+                                  aggregates and aggregates.player_totals)
+        if i - 12 < len(penalty_types):
+            row[5:9] = stat_cells(i, 6, penalty_types[i - 12], 'tblErfassung[Vergehen]',
+                                  aggregates and aggregates.type_totals)
+        rows[i] = row
+    add_table(ws, "tblStatSpieler", f"A11:D{11 + max(len(players), 1)}", "TableStyleMedium2",
+              ["Spieler", "Summe (€)", "Anzahl", "Ø (€)"])
+    add_table(ws, "tblStatVergehen", f"F11:I{11 + max(len(penalty_types), 1)}", "TableStyleMedium7",
+              ["Vergehen", "Summe (€)", "Anzahl", "Ø (€)"])
+    
+    # Time series of the selected player below the tables
+    series_days = aggregates.series_days if aggregates else 90
+    series_row = 14 + max(len(players), len(penalty_types), 1)
+    first, last = series_row + 1, series_row + series_days
+    rows[series_row] = [bold("Strafen über Zeit – Spieler"), None, None, None, None,
+                        header("Tage anzeigen"), series_days]
+    if aggregates is None:
+        for i in range(first, last + 1):
+            rows[i] = [
+                f'=IF(ROW()-ROW($A${first})+1<=$G${series_row},$B$2+ROW()-ROW($A${first}),"")',
+                f'=IF(A{i}="","",IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Spieler],$B$4,tblErfassung[Datum],A{i}),0))'
+            ]
+    else:
+        # One precomputed column per player from column P on, B picks the column of the selected player
+        first_col, last_col = get_column_letter(16), get_column_letter(15 + max(len(players), 1))
+        rows[series_row] += [None] * 8 + [header(player) for player in players]
+        for offset, series_date in enumerate(aggregates.series_dates()):
+            i = first + offset
+            rows[i] = [
+                day(series_date),
+                currency(f'=IFERROR(INDEX(${first_col}{i}:${last_col}{i},MATCH($B$4,${first_col}${series_row}:${last_col}${series_row},0)),0)')
+            ] + [None] * 13 + [round(aggregates.daily[player][offset], 2) if player in aggregates.daily else 0
+                               for player in players]
     
-    # Create time series chart
     chart = LineChart()
     chart.title = "Strafen über Zeit – Spieler"
     chart.y_axis.title = "Betrag (€)"
     chart.x_axis.title = "Datum"
-    
-    # Chart data
-    dates = Reference(ws, min_col=1, min_row=26, max_row=115)
-    amounts = Reference(ws, min_col=2, min_row=26, max_row=115)
-    chart.add_data(amounts, titles_from_data=False)
-    chart.set_categories(dates)
-    
-    # Position and size the chart
-    chart.width = 26 * 7  # Approximately 26 columns width
-    chart.height = 12 * 15  # Approximately 12 rows height
-    ws.add_chart(chart, "A36")
-    
-    # Monthly matrix section
-    ws['A65'] = "Monatsmatrix (Summe €)"
-    ws['A65'].font = Font(bold=True)
-    
-    # Month headers
-    for col in range(2, 14):  # 12 months
-        col_letter = get_column_letter(col)
-        if col == 2:
-            ws[f'{col_letter}65'] = '=EOMONTH($B$2,0)'
+    chart.add_data(Reference(ws, min_col=2, min_row=first, max_row=last), titles_from_data=False)
+    chart.set_categories(Reference(ws, min_col=1, min_row=first, max_row=last))
+    chart.width = 26 * 7
+    chart.height = 12 * 15
+    ws.add_chart(chart, f"D{first}")
+    
+    # Monthly matrix
+    matrix_row = last + 2
+    if aggregates is None:
+        months = [styled_cell(ws, '=EOMONTH($B$2,0)', number_format='MMM YYYY')]
+        for col in range(3, 14):
+            months.append(styled_cell(ws, f'=EOMONTH({get_column_letter(col - 1)}{matrix_row},1)',
+                                      number_format='MMM YYYY'))
+    else:
+        months = [styled_cell(ws, month_end, number_format='MMM YYYY') for month_end in aggregates.month_ends()]
+    rows[matrix_row] = [bold("Monatsmatrix (Summe €)")] + months
+    for i, player in enumerate(players, matrix_row + 1):
+        if aggregates is None:
+            rows[i] = [player] + [
+                currency(f'=IF($A{i}="",0,IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Spieler],$A{i},'
+                         f'tblErfassung[Datum],">="&EOMONTH({get_column_letter(col)}${matrix_row},-1)+1,'
+                         f'tblErfassung[Datum],"<="&EOMONTH({get_column_letter(col)}${matrix_row},0)),0))')
+                for col in range(2, 14)
+            ]
         else:
-            prev_col = get_column_letter(col-1)
-            ws[f'{col_letter}65'] = f'=EOMONTH({prev_col}65,1)'
-        ws[f'{col_letter}65'].number_format = 'MMM YYYY'
-    
-    # Player names and monthly data
-    for i, player in enumerate(players, 66):
-        ws.cell(row=i, column=1, value=player)
-        for col in range(2, 14):  # 12 months
-            col_letter = get_column_letter(col)
-            formula = f'=IF($A{i}="",0,IFERROR(SUMIFS(tblErfassung[Gesamt (€)],tblErfassung[Spieler],$A{i},tblErfassung[Datum],">="&EOMONTH({col_letter}$65,-1)+1,tblErfassung[Datum],"<="&EOMONTH({col_letter}$65,0)),0))'
-            ws.cell(row=i, column=col, value=formula).style = "currency_style"
-    
-    # Freeze panes
-    ws.freeze_panes = 'A12'
+            amounts = aggregates.monthly[player] if player in aggregates.monthly else [0] * aggregates.months
+            rows[i] = [player] + [currency(round(amount, 2)) for amount in amounts]
+    
+    # Player selection dropdown
+    player_validation = DataValidation(type="list", formula1=f"=Spielerliste!$A$2:$A${players_end}")
+    player_validation.add("B4")
+    ws.data_validations.append(player_validation)
+    
+    for i in range(1, max(rows) + 1):
+        ws.append(rows.get(i, []))
 
 
-def create_trainingsplan_sheet(ws):
-    """Create the training schedule sheet"""
+def refresh_statistik(filename):
+    """
+    Recompute the Statistik sheet of an existing workbook from its Erfassung rows (values mode)
+    
+    Reads Erfassung, Spielerliste and Strafenkatalog once and replaces the Statistik sheet.
+    
+    Returns:
+        int: Number of Erfassung rows taken into account
+    """
+    wb = load_workbook(filename)
+    for name in ("Erfassung", "Spielerliste", "Strafenkatalog"):
+        if name not in wb.sheetnames:
+            raise ValueError(f"Arbeitsblatt '{name}' nicht gefunden!")
+    
+    players = [value for value, in wb["Spielerliste"].iter_rows(min_row=2, max_col=1, values_only=True) if value]
+    catalog = {name: amount for name, amount in wb["Strafenkatalog"].iter_rows(min_row=2, max_col=2, values_only=True)
+               if name}
+    
+    aggregates = StatistikAggregates()
+    count = 0
+    for penalty_date, player, penalty_type, quantity, unit_amount, total, *_ in \
+            wb["Erfassung"].iter_rows(min_row=3, max_col=7, values_only=True):
+        if not player or not penalty_type:
+            continue
+        if not isinstance(total, (int, float)):
+            # Formula rows of the template: Anzahl × Einzelbetrag from the catalog, as the formulas do
+            if not isinstance(unit_amount, (int, float)):
+                unit_amount = catalog.get(penalty_type)
+            if not isinstance(quantity, (int, float)):
+                quantity = 1
+            total = quantity * unit_amount if isinstance(unit_amount, (int, float)) else 0
+        aggregates.add(penalty_date, player, penalty_type, total)
+        count += 1
+    
+    index = wb.sheetnames.index("Statistik") if "Statistik" in wb.sheetnames else len(wb.sheetnames)
+    if "Statistik" in wb.sheetnames:
+        wb.remove(wb["Statistik"])
+    if "header_style" not in wb.named_styles:
+        create_styles(wb)
+    ws = wb.create_sheet("Statistik", index)
+    write_statistik_sheet(ws, players, list(catalog), max(len(players) + 1, 200), aggregates)
     
-    # Headers
-    headers = ["Datum", "Tag", "Uhrzeit", "Einheit", "Schuhe"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.style = "header_style"
-    
-    # Sample training data
-    training_data = [
-        ("2024-08-01", "Donnerstag", "19:00", "Konditionstraining", "Stollen"),
-        ("2024-08-03", "Samstag", "10:00", "Testspiel", "Stollen"),
-        ("2024-08-05", "Montag", "19:30", "Techniktraining", "Halle"),
-        ("2024-08-08", "Donnerstag", "19:00", "Spielaufbau", "Stollen"),
-        ("2024-08-10", "Samstag", "15:00", "Meisterschaftsspiel", "Stollen")
-    ]
-    
-    # Add training data
-    for i, (datum, tag, zeit, einheit, schuhe) in enumerate(training_data, 2):
-        ws.cell(row=i, column=1, value=datum)
-        ws.cell(row=i, column=2, value=tag)
-        ws.cell(row=i, column=3, value=zeit)
-        ws.cell(row=i, column=4, value=einheit)
-        ws.cell(row=i, column=5, value=schuhe)
-    
-    # Set column widths
-    for col in range(1, 6):
-        ws.column_dimensions[get_column_letter(col)].width = 18
-    
-    # Create table
-    table_range = "A1:E20"
-    table = Table(displayName="tblTrainingsplan", ref=table_range)
-    table.tableStyleInfo = TableStyleInfo(name="TableStyleLight9", showFirstColumn=False,
-                                        showLastColumn=False, showRowStripes=True, showColumnStripes=False)
-    ws.add_table(table)
+    wb.save(filename)
+    return count
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Excel-Datei zur Strafenerfassung des ASV Natz erstellen")
+    parser.add_argument("filename", nargs="?", default="Strafenerfassung_ASV_Natz.xlsx")
+    parser.add_argument("--rows", type=int, default=TEMPLATE_ROWS,
+                        help=f"Vorbelegte Zeilen im Blatt Erfassung (Standard: {TEMPLATE_ROWS})")
+    parser.add_argument("--refresh", metavar="DATEI", help="Statistik einer bestehenden Datei neu berechnen")
+    args = parser.parse_args()
+    
+    if args.refresh:
+        rows = refresh_statistik(args.refresh)
+        print(f"✅ Statistik in '{args.refresh}' aus {rows} Einträgen neu berechnet!")
+        sys.exit(0)
+    
     try:
-        filename = create_penalty_tracking_workbook()
+        filename = create_penalty_tracking_workbook(args.filename, rows=args.rows)
         print(f"Penalty tracking system successfully created: {filename}")
     except Exception as e:
         print(f"Error creating workbook: {str(e)}")
@@ -6,18 +6,127 @@ Exports penalty data from Excel workbook to CSV format
 """
 
 import openpyxl
+import argparse
+import contextlib
 import csv
+import glob
+import hashlib
+import io
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import os
+import sys
 
 
-def export_penalties_to_csv(excel_filename="Strafenerfassung_ASV_Natz.xlsx", csv_filename="Erfassung_Export.csv"):
+# Consecutive empty rows after which the export stops reading (the template pre-allocates formula rows)
+EMPTY_ROW_LIMIT = 1000
+
+
+def format_row(values):
+    """
+    Format the cell values of one Erfassung row for the CSV
+    
+    Returns:
+        tuple: (formatted values, whether the row holds actual data rather than formula zeros)
+    """
+    row_data = []
+    has_data = False
+    
+    for col, cell_value in enumerate(values, 1):
+        # Format the value appropriately
+        if cell_value is None:
+            formatted_value = ""
+        elif isinstance(cell_value, datetime):
+            # Format dates as YYYY-MM-DD
+            formatted_value = cell_value.strftime("%Y-%m-%d")
+            has_data = True
+        elif isinstance(cell_value, (int, float)):
+            # Format numbers without currency symbols, use decimal point
+            if cell_value == 0 and col > 3:  # Don't count zero amounts as data
+                formatted_value = "0"
+            else:
+                formatted_value = str(cell_value).replace(',', '.')
+                if col <= 3:  # Date, Player, Penalty columns count as data
+                    has_data = True
+                elif cell_value > 0:  # Only positive amounts count as data
+                    has_data = True
+        else:
+            # String values
+            formatted_value = str(cell_value).strip()
+            if formatted_value:  # Non-empty strings count as data
+                has_data = True
+        
+        row_data.append(formatted_value)
+    
+    # Additional check: at least date OR player OR penalty must be filled
+    return row_data, has_data and any(row_data[:3])
+
+
+def read_erfassung(workbook):
+    """
+    Headers of the Erfassung sheet (row 2, A to G) and an iterator over the data rows below
+    
+    Returns:
+        tuple: (headers, iterator of cell value tuples)
+    """
+    
+    # Get the Erfassung worksheet
+    if "Erfassung" not in workbook.sheetnames:
+        raise ValueError("Arbeitsblatt 'Erfassung' nicht gefunden!")
+    
+    rows = workbook["Erfassung"].iter_rows(min_row=2, max_col=7, values_only=True)
+    headers = []
+    for cell_value in next(rows, ()):
+        if cell_value:
+            headers.append(str(cell_value))
+        else:
+            break
+    
+    if not headers:
+        raise ValueError("Keine Kopfzeilen in Zeile 2 gefunden!")
+    
+    return headers, rows
+
+
+def iter_filled_rows(rows, max_col, empty_row_limit=EMPTY_ROW_LIMIT, counts=None):
+    """
+    Yield the formatted rows that hold actual data (not just formulas with 0 results)
+    
+    Stops after empty_row_limit consecutive empty rows. If given, counts (dict) receives the number of
+    processed rows and whether reading stopped early.
+    """
+    counts = counts if counts is not None else {}
+    counts.update(processed=0, stopped=False)
+    empty_run = 0
+    
+    for values in rows:
+        counts["processed"] += 1
+        row_data, filled = format_row(values[:max_col])
+        if filled:
+            empty_run = 0
+            yield row_data
+        else:
+            empty_run += 1
+            if empty_row_limit is not None and empty_run >= empty_row_limit:
+                counts["stopped"] = True
+                return
+
+
+def export_penalties_to_csv(excel_filename="Strafenerfassung_ASV_Natz.xlsx", csv_filename="Erfassung_Export.csv",
+                            empty_row_limit=EMPTY_ROW_LIMIT):
     """
     Export penalty data from Excel workbook to CSV file
     
+    The workbook is read in read-only mode and every filled row is written as soon as it is read,
+    so memory use does not grow with the size of the workbook.
+    
     Args:
         excel_filename (str): Path to the Excel workbook
         csv_filename (str): Path for the output CSV file
+        empty_row_limit (int): Stop after this many consecutive empty rows (None reads every row)
     
     Returns:
         str: Path to the created CSV file
@@ -27,125 +136,204 @@ def export_penalties_to_csv(excel_filename="Strafenerfassung_ASV_Natz.xlsx", csv
     if not os.path.exists(excel_filename):
         raise FileNotFoundError(f"Excel file '{excel_filename}' not found!")
     
+    partial_filename = csv_filename + ".part"
+    workbook = None
     try:
-        # Load workbook
+        # Load workbook (read-only: rows are parsed while iterating)
         print(f"📖 Lade Excel-Datei: {excel_filename}")
-        workbook = openpyxl.load_workbook(excel_filename, data_only=True)
-        
-        # Get the Erfassung worksheet
-        if "Erfassung" not in workbook.sheetnames:
-            raise ValueError("Arbeitsblatt 'Erfassung' nicht gefunden!")
-        
-        worksheet = workbook["Erfassung"]
-        print(f"✅ Arbeitsblatt 'Erfassung' gefunden")
-        
-        # Find the table boundaries
-        # Headers should be in row 2
-        headers = []
-        max_col = 0
-        
-        # Get headers from row 2
-        for col in range(1, 8):  # A to G
-            cell_value = worksheet.cell(row=2, column=col).value
-            if cell_value:
-                headers.append(str(cell_value))
-                max_col = col
-            else:
-                break
-        
-        if not headers:
-            raise ValueError("Keine Kopfzeilen in Zeile 2 gefunden!")
+        workbook = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
         
+        headers, rows = read_erfassung(workbook)
+        print("✅ Arbeitsblatt 'Erfassung' gefunden")
         print(f"📋 Gefundene Spalten: {headers}")
         
-        # Collect data rows (only filled rows)
-        data_rows = []
-        processed_rows = 0
+        # Write the filled rows while reading, next to the target until complete
+        counts = {}
         filled_rows = 0
+        sample_rows = []
         
-        # Start from row 3 (data rows)
-        for row in range(3, worksheet.max_row + 1):
-            row_data = []
-            has_data = False
-            
-            # Check each column for this row
-            for col in range(1, max_col + 1):
-                cell = worksheet.cell(row=row, column=col)
-                cell_value = cell.value
-                
-                # Format the value appropriately
-                if cell_value is None:
-                    formatted_value = ""
-                elif isinstance(cell_value, datetime):
-                    # Format dates as YYYY-MM-DD
-                    formatted_value = cell_value.strftime("%Y-%m-%d")
-                    has_data = True
-                elif isinstance(cell_value, (int, float)):
-                    # Format numbers without currency symbols, use decimal point
-                    if cell_value == 0 and col > 3:  # Don't count zero amounts as data
-                        formatted_value = "0"
-                    else:
-                        formatted_value = str(cell_value).replace(',', '.')
-                        if col <= 3:  # Date, Player, Penalty columns count as data
-                            has_data = True
-                        elif cell_value > 0:  # Only positive amounts count as data
-                            has_data = True
-                else:
-                    # String values
-                    formatted_value = str(cell_value).strip()
-                    if formatted_value:  # Non-empty strings count as data
-                        has_data = True
-                
-                row_data.append(formatted_value)
-            
-            processed_rows += 1
-            
-            # Only add row if it contains actual data (not just formulas with 0 results)
-            if has_data:
-                # Additional check: at least date OR player OR penalty must be filled
-                date_filled = row_data[0] if len(row_data) > 0 else ""
-                player_filled = row_data[1] if len(row_data) > 1 else ""
-                penalty_filled = row_data[2] if len(row_data) > 2 else ""
-                
-                if date_filled or player_filled or penalty_filled:
-                    data_rows.append(row_data)
-                    filled_rows += 1
-        
-        print(f"📊 Verarbeitete Zeilen: {processed_rows}")
-        print(f"📋 Befüllte Zeilen gefunden: {filled_rows}")
-        
-        # Write to CSV file
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        with open(partial_filename, 'w', newline='', encoding='utf-8') as csvfile:
             # Use semicolon as delimiter (German standard)
             writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL)
             
             # Write headers
             writer.writerow(headers)
             
-            # Write data rows
-            for row_data in data_rows:
+            for row_data in iter_filled_rows(rows, len(headers), empty_row_limit, counts):
                 writer.writerow(row_data)
+                filled_rows += 1
+                if len(sample_rows) < 3:
+                    sample_rows.append(row_data)
         
+        os.replace(partial_filename, csv_filename)
+        
+        print(f"📊 Verarbeitete Zeilen: {counts['processed']}")
+        if counts["stopped"]:
+            print(f"⏹️  Abbruch nach {empty_row_limit} leeren Zeilen in Folge")
+        print(f"📋 Befüllte Zeilen gefunden: {filled_rows}")
         print(f"✅ CSV-Export erfolgreich: {csv_filename}")
-        print(f"📁 Exportierte Datensätze: {len(data_rows)}")
+        print(f"📁 Exportierte Datensätze: {filled_rows}")
         
         # Show sample of exported data
-        if data_rows:
-            print(f"\n📋 Beispiel der ersten exportierten Zeilen:")
+        if sample_rows:
+            print("\n📋 Beispiel der ersten exportierten Zeilen:")
             print(f"Kopfzeilen: {'; '.join(headers)}")
-            for i, row in enumerate(data_rows[:3]):  # Show first 3 rows
+            for i, row in enumerate(sample_rows):  # Show first 3 rows
                 print(f"Zeile {i+1}: {'; '.join(row)}")
-            if len(data_rows) > 3:
-                print(f"... und {len(data_rows)-3} weitere Zeilen")
+            if filled_rows > 3:
+                print(f"... und {filled_rows-3} weitere Zeilen")
         else:
             print("⚠️  Keine Daten zum Exportieren gefunden")
         
-        workbook.close()
         return csv_filename
         
     except Exception as e:
         print(f"❌ Fehler beim CSV-Export: {str(e)}")
+        if os.path.exists(partial_filename):
+            os.remove(partial_filename)
         raise
+    finally:
+        # Read-only workbooks keep the file open until closed
+        if workbook is not None:
+            workbook.close()
+
+
+# Incremental export: a state file next to the CSV remembers the workbook (mtime, size, SHA-256) and a
+# short hash per exported row. Unchanged workbooks are skipped without parsing, new rows at the end are
+# appended, and any change to earlier rows (edit, delete, reorder, other headers) rewrites the CSV.
+
+def file_hash(filename):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_hash(row_data):
+    """Short content hash of one formatted CSV row"""
+    return hashlib.sha1("\x1f".join(row_data).encode('utf-8')).hexdigest()[:16]
+
+
+def load_export_state(state_filename):
+    """Previous export state, or None if missing or unreadable"""
+    try:
+        with open(state_filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_export_state(state_filename, state):
+    """Write the export state atomically"""
+    partial_filename = state_filename + ".part"
+    with open(partial_filename, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(partial_filename, state_filename)
+
+
+def export_penalties_incremental(excel_filename="Strafenerfassung_ASV_Natz.xlsx", csv_filename="Erfassung_Export.csv",
+                                 state_filename=None, empty_row_limit=EMPTY_ROW_LIMIT):
+    """
+    Bring the CSV export up to date, appending new rows instead of rewriting the file
+    
+    Args:
+        excel_filename (str): Path to the Excel workbook
+        csv_filename (str): Path of the CSV file to update
+        state_filename (str): Path of the state file (default: <csv_filename>.state.json)
+        empty_row_limit (int): Stop after this many consecutive empty rows (None reads every row)
+    
+    Returns:
+        dict: status ("skipped", "appended" or "rewritten"), rows (total exported) and new_rows
+    """
+    
+    # Check if Excel file exists
+    if not os.path.exists(excel_filename):
+        raise FileNotFoundError(f"Excel file '{excel_filename}' not found!")
+    
+    state_filename = state_filename or csv_filename + ".state.json"
+    state = load_export_state(state_filename)
+    stat = os.stat(excel_filename)
+    
+    # The CSV must still be the one the state describes, otherwise start over
+    if state and not (os.path.exists(csv_filename) and os.path.getsize(csv_filename) == state.get("csv_size")):
+        state = None
+    
+    # Unchanged workbook: same mtime and size, or touched but with the same content
+    if state and state.get("mtime_ns") == stat.st_mtime_ns and state.get("size") == stat.st_size:
+        print(f"⏭️  Keine Änderungen seit dem letzten Export: {excel_filename}")
+        return {"status": "skipped", "rows": state["row_count"], "new_rows": 0}
+    
+    workbook_hash = file_hash(excel_filename)
+    if state and state.get("sha256") == workbook_hash:
+        state.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        save_export_state(state_filename, state)
+        print(f"⏭️  Inhalt unverändert seit dem letzten Export: {excel_filename}")
+        return {"status": "skipped", "rows": state["row_count"], "new_rows": 0}
+    
+    print(f"📖 Lade Excel-Datei: {excel_filename}")
+    workbook = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
+    try:
+        headers, rows = read_erfassung(workbook)
+        previous = state["row_hashes"] if state and state.get("headers") == headers else None
+        
+        # Compare the exported rows and append the ones after them
+        hashes = []
+        if previous is not None:
+            with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+                for row_data in iter_filled_rows(rows, len(headers), empty_row_limit):
+                    hashes.append(row_hash(row_data))
+                    if len(hashes) <= len(previous):
+                        if hashes[-1] != previous[len(hashes) - 1]:
+                            break
+                    else:
+                        writer.writerow(row_data)
+            if hashes[:len(previous)] != previous:
+                previous = None
+        
+        # Earlier rows changed (or first run): rewrite the whole file
+        if previous is None:
+            if hashes:
+                # The rows were partly read for the comparison, start over
+                workbook.close()
+                workbook = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
+                headers, rows = read_erfassung(workbook)
+            partial_filename = csv_filename + ".part"
+            hashes = []
+            try:
+                with open(partial_filename, 'w', newline='', encoding='utf-8') as csvfile:
+                    writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+                    writer.writerow(headers)
+                    for row_data in iter_filled_rows(rows, len(headers), empty_row_limit):
+                        writer.writerow(row_data)
+                        hashes.append(row_hash(row_data))
+                os.replace(partial_filename, csv_filename)
+            except Exception:
+                if os.path.exists(partial_filename):
+                    os.remove(partial_filename)
+                raise
+    finally:
+        workbook.close()
+    
+    save_export_state(state_filename, {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": workbook_hash,
+        "headers": headers,
+        "row_count": len(hashes),
+        "row_hashes": hashes,
+        "csv_size": os.path.getsize(csv_filename)
+    })
+    
+    if previous is None:
+        print(f"✅ CSV-Export neu geschrieben: {csv_filename} ({len(hashes)} Datensätze)")
+        return {"status": "rewritten", "rows": len(hashes), "new_rows": len(hashes)}
+    
+    new_rows = len(hashes) - len(previous)
+    print(f"✅ CSV-Export ergänzt: {csv_filename} (+{new_rows} Datensätze, gesamt {len(hashes)})")
+    return {"status": "appended", "rows": len(hashes), "new_rows": new_rows}
 
 
 def validate_csv_export(csv_filename="Erfassung_Export.csv"):
@@ -186,20 +374,210 @@ def validate_csv_export(csv_filename="Erfassung_Export.csv"):
         return {"valid": False, "error": str(e)}
 
 
+# Batch export: several workbooks (one per season and team) exported in a process pool, one worker per
+# workbook since parsing the sheet is CPU-bound. Workers write one CSV each; a merged export joins them
+# afterwards in input order with the source workbook as an extra column.
+
+def find_workbooks(paths):
+    """Workbooks for the given files, directories (every .xlsx inside) or glob patterns, without duplicates"""
+    found = []
+    for path in paths:
+        pattern = os.path.join(path, "*.xlsx") if os.path.isdir(path) else path
+        for filename in sorted(glob.glob(pattern)):
+            # Skip the lock files Excel keeps next to open workbooks
+            if not os.path.basename(filename).startswith("~$"):
+                found.append(os.path.normpath(filename))
+    return list(dict.fromkeys(found))
+
+
+def export_workbook_job(excel_filename, csv_filename, incremental=False):
+    """Export one workbook in a worker process (its console output is discarded), returns a result dict"""
+    start = time.perf_counter()
+    result = {"workbook": excel_filename, "csv": csv_filename, "status": None, "error": None}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if incremental:
+                result["status"] = export_penalties_incremental(excel_filename, csv_filename)["status"]
+            else:
+                export_penalties_to_csv(excel_filename, csv_filename)
+                result["status"] = "exported"
+        result["validation"] = validate_csv_export(csv_filename)
+        if not result["validation"]["valid"]:
+            result["error"] = result["validation"]["error"]
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def merge_csv_exports(results, merged_filename):
+    """
+    Join the CSV files of successful results into one file with a "Quelle" column (workbook name)
+    
+    Results whose headers differ from the first file are marked as failed and left out.
+    
+    Returns:
+        int: Number of data rows written
+    """
+    headers = None
+    row_count = 0
+    partial_filename = merged_filename + ".part"
+    with open(partial_filename, 'w', newline='', encoding='utf-8') as merged:
+        writer = csv.writer(merged, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        for result in results:
+            if result["error"]:
+                continue
+            source = os.path.basename(result["workbook"])
+            with open(result["csv"], 'r', newline='', encoding='utf-8') as csvfile:
+                reader = csv.reader(csvfile, delimiter=';')
+                file_headers = next(reader)
+                if headers is None:
+                    headers = file_headers
+                    writer.writerow(headers + ["Quelle"])
+                elif file_headers != headers:
+                    result["error"] = f"Abweichende Kopfzeilen: {file_headers}"
+                    continue
+                for row in reader:
+                    writer.writerow(row + [source])
+                    row_count += 1
+    
+    if headers is None:
+        os.remove(partial_filename)
+        raise ValueError("Keine Arbeitsmappe erfolgreich exportiert, nichts zusammenzuführen!")
+    os.replace(partial_filename, merged_filename)
+    return row_count
+
+
+def export_workbooks(workbooks, output_dir=None, merged_filename=None, workers=None, incremental=False):
+    """
+    Export several workbooks in parallel
+    
+    Args:
+        workbooks (list): Paths of the Excel workbooks
+        output_dir (str): Directory for the per-workbook CSVs (default: next to each workbook)
+        merged_filename (str): Write one merged CSV with a source column instead of one CSV per workbook
+        workers (int): Number of worker processes (default: number of CPUs)
+        incremental (bool): Use export_penalties_incremental() for the per-workbook CSVs
+    
+    Returns:
+        list: One result dict per workbook, in input order
+    """
+    if merged_filename and incremental:
+        raise ValueError("Inkrementeller Export ist nur mit einer CSV-Datei pro Arbeitsmappe möglich!")
+    
+    workers = min(workers or os.cpu_count() or 1, len(workbooks)) or 1
+    
+    # Merged exports go through temporary files next to the target
+    scratch = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(merged_filename))) \
+        if merged_filename else contextlib.nullcontext()
+    with scratch as scratch_dir:
+        targets = []
+        for i, workbook in enumerate(workbooks):
+            name = os.path.splitext(os.path.basename(workbook))[0] + ".csv"
+            if scratch_dir:
+                targets.append(os.path.join(scratch_dir, f"{i:04d}_{name}"))
+            else:
+                targets.append(os.path.join(output_dir or os.path.dirname(workbook), name))
+        
+        duplicates = {target for target in targets if targets.count(target) > 1}
+        if duplicates:
+            raise ValueError(f"Mehrere Arbeitsmappen würden dieselbe CSV-Datei schreiben: {sorted(duplicates)}")
+        
+        results = [None] * len(workbooks)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(export_workbook_job, workbook, target, incremental): i
+                       for i, (workbook, target) in enumerate(zip(workbooks, targets))}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                marker = "❌" if result["error"] else "✅"
+                print(f"{marker} {result['workbook']} ({result['seconds']:.1f} s)")
+        
+        if merged_filename:
+            merge_csv_exports(results, merged_filename)
+    
+    return results
+
+
+def print_batch_summary(results, seconds, workers, merged_filename=None):
+    """Print the aggregated validation of a batch export"""
+    failed = [result for result in results if result["error"]]
+    exported = [result for result in results if not result["error"]]
+    total_rows = sum(result["validation"]["row_count"] for result in exported)
+    
+    print(f"\n📊 Zusammenfassung: {len(results)} Arbeitsmappen, {len(exported)} exportiert, "
+          f"{len(failed)} fehlgeschlagen ({seconds:.1f} s, {workers} Prozesse)")
+    for result in exported:
+        status = " (unverändert)" if result["status"] == "skipped" else ""
+        print(f"   📋 {os.path.basename(result['workbook'])}: {result['validation']['row_count']} Datensätze{status}")
+    for result in failed:
+        print(f"   ❌ {os.path.basename(result['workbook'])}: {result['error']}")
+    print(f"   📁 Datensätze gesamt: {total_rows}")
+    
+    if merged_filename and exported:
+        validation = validate_csv_export(merged_filename)
+        if validation["valid"] and validation["row_count"] == total_rows:
+            print(f"✅ Zusammengeführte Datei: {merged_filename} ({validation['row_count']} Datensätze, "
+                  f"{len(validation['headers'])} Spalten)")
+        else:
+            print(f"❌ Zusammengeführte Datei ungültig: {validation.get('error') or validation['row_count']}")
+            return False
+    return not failed
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strafen aus der Excel-Datei als CSV exportieren")
+    parser.add_argument("excel_file", nargs="?", default="Strafenerfassung_ASV_Natz.xlsx")
+    parser.add_argument("csv_file", nargs="?", default="Erfassung_Export.csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Nur neue Zeilen anhängen, unveränderte Dateien überspringen")
+    parser.add_argument("--state", metavar="DATEI", help="Statusdatei (Standard: <csv_file>.state.json)")
+    parser.add_argument("--batch", metavar="PFAD", nargs="+",
+                        help="Mehrere Arbeitsmappen exportieren (Dateien, Verzeichnisse oder Muster wie 'Strafenerfassung_*.xlsx')")
+    parser.add_argument("--output-dir", metavar="VERZEICHNIS", help="Zielverzeichnis der CSV-Dateien im Batch-Modus")
+    parser.add_argument("--merged", metavar="DATEI", help="Batch-Modus: eine gemeinsame CSV-Datei mit Spalte 'Quelle'")
+    parser.add_argument("--workers", type=int, help="Anzahl paralleler Prozesse (Standard: Anzahl CPUs)")
+    args = parser.parse_args()
+    
+    if args.merged and args.incremental:
+        parser.error("--incremental kann nicht mit --merged kombiniert werden")
+    
+    if args.batch:
+        workbooks = find_workbooks(args.batch)
+        if not workbooks:
+            print(f"❌ Keine Arbeitsmappen gefunden: {' '.join(args.batch)}")
+            sys.exit(1)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        
+        workers = min(args.workers or os.cpu_count() or 1, len(workbooks))
+        print(f"🚀 Starte CSV-Export von {len(workbooks)} Arbeitsmappen mit {workers} Prozessen...")
+        start = time.perf_counter()
+        try:
+            results = export_workbooks(workbooks, args.output_dir, args.merged, workers, args.incremental)
+        except ValueError as e:
+            print(f"❌ {str(e)}")
+            sys.exit(1)
+        ok = print_batch_summary(results, time.perf_counter() - start, workers, args.merged)
+        sys.exit(0 if ok else 1)
+    
     try:
         # Export penalties to CSV
-        excel_file = "Strafenerfassung_ASV_Natz.xlsx"
-        csv_file = "Erfassung_Export.csv"
+        excel_file = args.excel_file
+        csv_file = args.csv_file
         
         print("🚀 Starte CSV-Export...")
-        result_file = export_penalties_to_csv(excel_file, csv_file)
+        if args.incremental:
+            export_penalties_incremental(excel_file, csv_file, args.state)
+            result_file = csv_file
+        else:
+            result_file = export_penalties_to_csv(excel_file, csv_file)
         
         # Validate the export
         validation = validate_csv_export(result_file)
         
         if validation["valid"]:
-            print(f"\n✅ CSV-Export Validierung erfolgreich:")
+            print("\n✅ CSV-Export Validierung erfolgreich:")
             print(f"   📋 Kopfzeilen: {len(validation['headers'])}")
             print(f"   📊 Datensätze: {validation['row_count']}")
             print(f"   🔤 Kodierung: {validation['encoding']}")
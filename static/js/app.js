@@ -155,6 +155,257 @@ const PenaltyTracker = {
             });
     },
     
+    // Append older penalties from /api/penalties when the "load more" link scrolls into view
+    initInfiniteScroll: function(tbodyId, linkId) {
+        const tbody = document.getElementById(tbodyId);
+        const link = document.getElementById(linkId);
+        if (!tbody || !link || typeof IntersectionObserver === 'undefined') return;
+        
+        const playerTotals = JSON.parse(tbody.dataset.playerTotals || '{}');
+        const isKassier = tbody.dataset.kassier === '1';
+        let nextCursor = link.dataset.nextCursor;
+        let loading = false;
+        
+        const cell = (row, content, className) => {
+            const td = row.insertCell();
+            if (content instanceof Node) {
+                td.appendChild(content);
+            } else {
+                const el = document.createElement(className ? 'span' : 'strong');
+                if (className) el.className = className;
+                el.textContent = content;
+                td.appendChild(el);
+            }
+            return td;
+        };
+        
+        const button = (className, icon, onClick) => {
+            const btn = document.createElement('button');
+            btn.className = className;
+            btn.innerHTML = `<i class="fas ${icon}"></i>`;
+            btn.addEventListener('click', onClick);
+            return btn;
+        };
+        
+        const appendPenalty = (penalty) => {
+            const row = tbody.insertRow();
+            row.insertCell().textContent = this.formatDate(penalty.date);
+            cell(row, penalty.player);
+            const typeCell = row.insertCell();
+            typeCell.textContent = penalty.penalty_type;
+            if (penalty.description) {
+                const small = document.createElement('small');
+                small.className = 'text-muted';
+                small.textContent = penalty.description;
+                typeCell.append(document.createElement('br'), small);
+            }
+            cell(row, penalty.quantity, 'badge bg-primary');
+            row.insertCell().textContent = this.formatCurrency(penalty.amount);
+            cell(row, this.formatCurrency(penalty.total_amount), 'text-danger fw-bold');
+            cell(row, this.formatCurrency(playerTotals[penalty.player_id] || 0), 'badge bg-warning text-dark fs-6');
+            cell(row, penalty.notes || '-', penalty.notes ? 'small' : 'text-muted');
+            if (isKassier) {
+                const group = document.createElement('div');
+                group.className = 'btn-group btn-group-sm';
+                group.append(
+                    button('btn btn-outline-primary', 'fa-edit', () => editPenalty(
+                        penalty.id, penalty.date, penalty.player_id, penalty.penalty_type_id,
+                        penalty.quantity, penalty.notes)),
+                    button('btn btn-outline-danger', 'fa-trash', () => deletePenalty(
+                        penalty.id, penalty.player, penalty.penalty_type))
+                );
+                cell(row, group);
+            }
+        };
+        
+        const loadMore = () => {
+            if (loading || !nextCursor) return;
+            loading = true;
+            const url = new URL(link.dataset.apiUrl, window.location.origin);
+            url.searchParams.set('cursor', nextCursor);
+            
+            this.ajax(url.toString())
+                .then(data => {
+                    data.penalties.forEach(appendPenalty);
+                    nextCursor = data.next_cursor;
+                    if (!nextCursor) {
+                        observer.disconnect();
+                        link.remove();
+                    }
+                })
+                .finally(() => {
+                    loading = false;
+                });
+        };
+        
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadMore();
+        });
+        observer.observe(link);
+        link.addEventListener('click', event => {
+            event.preventDefault();
+            loadMore();
+        });
+    },
+    
+    // Dashboard live updates from the Server-Sent Events stream (KPIs, recent penalties, top players, charts)
+    initLiveDashboard: function(streamUrl, options = {}) {
+        if (typeof EventSource === 'undefined') return;
+        
+        const recent = document.getElementById('recentPenalties');
+        const topPlayers = document.getElementById('topPlayers');
+        const dates = options.dates || [];
+        const maxItems = 10;
+        
+        const setText = (id, text) => {
+            const el = document.getElementById(id);
+            if (el) el.textContent = text;
+        };
+        
+        const toggleEmpty = (list, emptyId) => {
+            const empty = document.getElementById(emptyId);
+            if (empty) empty.classList.toggle('d-none', list.children.length > 0);
+        };
+        
+        const listItem = (left, right, data) => {
+            const item = document.createElement('div');
+            item.className = 'list-group-item d-flex justify-content-between align-items-center';
+            Object.assign(item.dataset, data);
+            // Elements stacked with line breaks, as in the server-rendered list
+            const stack = (elements) => {
+                const div = document.createElement('div');
+                elements.forEach((el, index) => {
+                    if (index > 0) div.appendChild(document.createElement('br'));
+                    div.appendChild(el);
+                });
+                return div;
+            };
+            item.append(stack(left), stack(right));
+            return item;
+        };
+        
+        const element = (tag, className, text) => {
+            const el = document.createElement(tag);
+            if (className) el.className = className;
+            el.textContent = text;
+            return el;
+        };
+        
+        const penaltyItem = (penalty) => {
+            const item = listItem(
+                [element('strong', '', penalty.player),
+                 element('small', 'text-muted', penalty.penalty_type),
+                 element('small', 'text-muted', this.formatDate(penalty.date))],
+                [element('span', 'badge bg-primary', penalty.quantity + 'x'),
+                 element('strong', '', this.formatCurrency(penalty.total_amount))],
+                {penaltyId: penalty.id, playerId: penalty.player_id}
+            );
+            item.lastChild.className = 'text-end';
+            return item;
+        };
+        
+        const applyPenalty = (kind, penalty) => {
+            if (!recent || !penalty) return;
+            const existing = recent.querySelector(`[data-penalty-id="${penalty.id}"]`);
+            if (kind === 'penalty_deleted') {
+                if (existing) existing.remove();
+            } else if (existing) {
+                existing.replaceWith(penaltyItem(penalty));
+            } else if (kind === 'penalty_added') {
+                recent.prepend(penaltyItem(penalty));
+                while (recent.children.length > maxItems) recent.lastElementChild.remove();
+            }
+            toggleEmpty(recent, 'recentPenaltiesEmpty');
+        };
+        
+        const applyPlayers = (players) => {
+            if (!topPlayers || !players.length) return;
+            const ranking = new Map();
+            topPlayers.querySelectorAll('[data-player-id]').forEach(item => {
+                ranking.set(Number(item.dataset.playerId), {
+                    id: Number(item.dataset.playerId),
+                    name: item.dataset.name,
+                    penalty_count: Number(item.dataset.penaltyCount),
+                    total_amount: Number(item.dataset.totalAmount)
+                });
+            });
+            players.forEach(player => {
+                if (player.name === null || player.penalty_count === 0) {
+                    ranking.delete(player.id);
+                } else {
+                    ranking.set(player.id, player);
+                }
+            });
+            
+            const sorted = Array.from(ranking.values())
+                .sort((a, b) => b.total_amount - a.total_amount)
+                .slice(0, maxItems);
+            topPlayers.replaceChildren(...sorted.map(player => listItem(
+                [element('strong', '', player.name),
+                 element('small', 'text-muted', `${player.penalty_count} Strafen`)],
+                [element('span', 'badge bg-danger fs-6', this.formatCurrency(player.total_amount))],
+                {playerId: player.id, name: player.name,
+                 penaltyCount: player.penalty_count, totalAmount: player.total_amount}
+            )));
+            toggleEmpty(topPlayers, 'topPlayersEmpty');
+        };
+        
+        const applyDays = (days) => {
+            const daily = options.dailyChart;
+            const cumulative = options.cumulativeChart;
+            if (!daily || !cumulative) return;
+            
+            let changed = false;
+            days.forEach(day => {
+                const index = dates.indexOf(day.date);
+                if (index >= 0) {
+                    daily.data.datasets[0].data[index] = day.daily_amount;
+                    changed = true;
+                }
+            });
+            if (!changed) return;
+            
+            // Running total since the first day of the chart
+            let running = 0;
+            cumulative.data.datasets[0].data = daily.data.datasets[0].data.map(amount => {
+                running += amount;
+                return Math.round(running * 100) / 100;
+            });
+            daily.update();
+            cumulative.update();
+        };
+        
+        const applyDelta = (event) => {
+            const delta = JSON.parse(event.data);
+            const totals = delta.totals;
+            setText('kpiTotalPenalties', totals.total_penalties);
+            setText('kpiTotalAmount', this.formatCurrency(totals.total_amount));
+            setText('kpiAverage', this.formatCurrency(
+                totals.total_penalties > 0 ? totals.total_amount / totals.total_penalties : 0));
+            setText('kpiTodayPenalties', totals.today_penalties);
+            
+            if (event.type === 'player_deleted' && recent) {
+                delta.players.forEach(player => {
+                    recent.querySelectorAll(`[data-player-id="${player.id}"]`).forEach(item => item.remove());
+                });
+                toggleEmpty(recent, 'recentPenaltiesEmpty');
+            }
+            applyPenalty(event.type, delta.penalty);
+            applyPlayers(delta.players);
+            applyDays(delta.days);
+        };
+        
+        const source = new EventSource(streamUrl);
+        ['penalty_added', 'penalty_updated', 'penalty_deleted', 'penalties_added', 'player_deleted']
+            .forEach(kind => source.addEventListener(kind, applyDelta));
+        // Sent when the events missed since the last connection are gone or too many
+        source.addEventListener('reload', () => {
+            source.close();
+            window.location.reload();
+        });
+        return source;
+    },
+    
     // Initialize data tables if available
     initializeDataTables: function() {
         if (typeof $ !== 'undefined' && $.fn.DataTable) {
@@ -0,0 +1,107 @@
+"""
+Shared fixtures: the Flask app on a scratch database, a logged-in client and seeded penalties
+
+Every test using the database runs on SQLite, and on Postgres as well when DATABASE_URL (or DB_URL)
+points at one. The Postgres runs use a throwaway schema, the existing tables are not touched.
+"""
+
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import app as app_module
+
+
+def reset_process_caches():
+    """Forget the per-process caches, they are keyed by version counters that restart with every database"""
+    app_module.reference_cache.version = None
+    app_module.data_version_cache.invalidate()
+    app_module.statistics_cache.entries.clear()
+    if app_module.penalty_frame_cache is not None:
+        app_module.penalty_frame_cache.frame = None
+
+
+def postgres_url():
+    """DATABASE_URL if it names a Postgres database, else None"""
+    url = app_module.database_url()
+    return url if url.startswith('postgresql') else None
+
+
+def create_test_engine(backend, tmp_path):
+    """Engine with the app's engine options for a scratch database, returns (engine, cleanup)"""
+    if backend == 'sqlite':
+        url = f"sqlite:///{tmp_path / 'test.db'}"
+        return create_engine(url, **app_module.engine_options(url)), lambda: None
+    
+    url = postgres_url()
+    if url is None:
+        pytest.skip('DATABASE_URL zeigt nicht auf Postgres')
+    schema = f'pytest_{uuid.uuid4().hex[:12]}'
+    engine = create_engine(url, connect_args={'options': f'-csearch_path={schema}'},
+                           **app_module.engine_options(url))
+    with engine.begin() as connection:
+        connection.execute(text(f'CREATE SCHEMA {schema}'))
+    
+    def drop_schema():
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+    return engine, drop_schema
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database(request, tmp_path):
+    """Freshly initialized database; the app's engine points at it for the duration of the test"""
+    engine, cleanup = create_test_engine(request.param, tmp_path)
+    app_module.app.config['TESTING'] = True
+    
+    with app_module.app.app_context():
+        engines = app_module.db.engines
+        previous = engines[None]
+        engines[None] = engine
+        reset_process_caches()
+        try:
+            app_module.init_database()
+            yield engine
+        finally:
+            app_module.db.session.remove()
+            engines[None] = previous
+            reset_process_caches()
+            try:
+                cleanup()
+            finally:
+                engine.dispose()
+
+
+@pytest.fixture
+def client(database):
+    """Test client logged in as kassier"""
+    client = app_module.app.test_client()
+    client.post('/login', data={'access_type': 'kassier', 'access_code': '1970'})
+    # Drop the login message, pages with pending flashes skip the conditional GET
+    with client.session_transaction() as flask_session:
+        flask_session.pop('_flashes', None)
+    return client
+
+
+@pytest.fixture
+def seed_penalties(database):
+    """seed_penalties(n) books n penalties spread over players, penalty types and the last 90 days"""
+    def seed(n):
+        amounts = dict(app_module.db.session.query(app_module.PenaltyType.id, app_module.PenaltyType.amount))
+        player_ids = [player_id for player_id, in app_module.db.session.query(app_module.Player.id)]
+        type_ids = sorted(amounts)
+        rows = [
+            {
+                'date': date.today() - timedelta(days=i % 90),
+                'player_id': player_ids[i % len(player_ids)],
+                'penalty_type_id': type_ids[i % len(type_ids)],
+                'quantity': 1 + i % 3,
+                'notes': f'Test {i}'
+            }
+            for i in range(n)
+        ]
+        app_module.insert_penalties(rows, amounts)
+        app_module.db.session.commit()
+    return seed
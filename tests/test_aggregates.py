@@ -0,0 +1,56 @@
+"""
+Aggregate tables: incremental updates stay equal to a rebuild from the penalty table
+"""
+
+from datetime import date, timedelta
+
+import app as app_module
+
+
+def player_totals():
+    return {
+        row.player_id: (row.penalty_count, row.total_amount)
+        for row in app_module.db.session.query(*app_module.player_total_columns())
+    }
+
+
+def test_player_totals_follow_edits_and_deletes(client, seed_penalties):
+    seed_penalties(60)
+    penalty = app_module.Penalty.query.order_by(app_module.Penalty.id).first()
+
+    client.post('/edit_penalty', data={
+        'penalty_id': penalty.id,
+        'date': penalty.date.isoformat(),
+        'player_id': 2,
+        'penalty_type_id': penalty.penalty_type_id,
+        'quantity': 5,
+        'notes': 'umgebucht'
+    })
+    client.post('/delete_penalty', data={'penalty_id': penalty.id + 1})
+    client.post('/delete_player', data={'player_id': 3})
+    app_module.db.session.expire_all()
+
+    totals = player_totals()
+    assert 3 not in totals
+    assert app_module.rebuild_aggregates() == 0
+    assert player_totals() == totals
+
+
+def test_ledgers_match_rebuild_after_overlapping_batches(seed_penalties):
+    seed_penalties(200)
+    seed_penalties(150)
+
+    assert app_module.rebuild_aggregates() == 0
+
+
+def test_inverted_date_range_is_empty(client, seed_penalties):
+    seed_penalties(120)
+    today = date.today()
+    date_from, date_to = today - timedelta(days=10), today - timedelta(days=40)
+
+    response = client.get(f'/api/penalties?include_total=1&date_from={date_from}&date_to={date_to}')
+
+    assert response.get_json()['total'] == 0
+    assert app_module.ledger_total(date_from, date_to, player_id=1) == (0, 0.0)
+    statistics = app_module.compute_statistics_sql(date_from, date_to)
+    assert (statistics['total_count'], statistics['total_amount']) == (0, 0.0)
@@ -0,0 +1,81 @@
+"""
+Bulk entry (/add_penalties_bulk): one executemany for all rows, errors reported per row or as 400
+"""
+
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+
+
+def penalty_type_id():
+    return app_module.db.session.query(app_module.db.func.min(app_module.PenaltyType.id)).scalar()
+
+
+def test_bulk_entry_inserts_all_players_with_one_statement(database, client):
+    inserts = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO penalty '):
+            inserts.append(statement)
+    
+    event.listen(database, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.post('/add_penalties_bulk', json={
+            'date': '2024-09-01', 'penalty_type_id': penalty_type_id(), 'quantity': 2,
+            'player_ids': [1, 2, 3, 4, 5]
+        })
+    finally:
+        event.remove(database, 'before_cursor_execute', before_cursor_execute)
+    
+    assert response.status_code == 200
+    assert response.get_json() == {'inserted': 5, 'errors': []}
+    assert len(inserts) == 1
+    assert app_module.Penalty.query.count() == 5
+    assert app_module.rebuild_aggregates() == 0
+
+
+def test_bulk_entry_reports_errors_per_row(database, client):
+    type_id = penalty_type_id()
+    
+    response = client.post('/add_penalties_bulk', json={
+        'date': '2024-09-01', 'penalty_type_id': type_id,
+        'rows': [
+            {'player_id': 1},
+            {'player_id': 99999},
+            {'player_id': 2, 'date': '01.09.2024'},
+            {'player_id': 3, 'quantity': 0},
+            7,
+            ['player_id', 4],
+            {'player_id': 5, 'penalty_type_id': 'abc'},
+        ]
+    })
+    result = response.get_json()
+    
+    assert response.status_code == 200
+    assert result['inserted'] == 1
+    assert [error['row'] for error in result['errors']] == [2, 3, 4, 5, 6, 7]
+    assert app_module.Penalty.query.count() == 1
+
+
+@pytest.mark.parametrize('payload', [
+    [1, 2, 3],
+    'Spieler 1',
+    {'player_ids': 5},
+    {'player_ids': '1,2'},
+    {'rows': {'player_id': 1}},
+    {'rows': 3},
+])
+def test_bulk_entry_rejects_malformed_payloads(database, client, payload):
+    response = client.post('/add_penalties_bulk', json=payload)
+    
+    assert response.status_code == 400
+    assert response.get_json()['inserted'] == 0
+    assert app_module.Penalty.query.count() == 0
+
+
+def test_bulk_entry_without_valid_rows_is_rejected(database, client):
+    response = client.post('/add_penalties_bulk', json={'rows': [1, None, 'x']})
+    
+    assert response.status_code == 400
+    assert [error['row'] for error in response.get_json()['errors']] == [1, 2, 3]
@@ -0,0 +1,54 @@
+"""
+Concurrent writers: two workers booking penalties at the same time both succeed and keep the totals exact
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+
+
+def book_penalty(player_id, penalty_date, committed, before_commit=None):
+    """Book one penalty in its own app context (own session and connection)"""
+    with app_module.app.app_context():
+        amounts = dict(app_module.db.session.query(app_module.PenaltyType.id, app_module.PenaltyType.amount))
+        app_module.insert_penalties([{
+            'date': penalty_date,
+            'player_id': player_id,
+            'penalty_type_id': min(amounts),
+            'quantity': 1,
+            'notes': f'Worker {player_id}'
+        }], amounts)
+        if before_commit:
+            before_commit()
+        app_module.db.session.commit()
+        committed.append(player_id)
+
+
+# Day offsets of the two workers: both book the first penalty of a new day, or the first one books
+# an earlier day whose running totals carry into the new day of the second one
+@pytest.mark.parametrize('first_offset, second_offset', [(3, 3), (-5, 3)])
+def test_concurrent_bookings(database, seed_penalties, first_offset, second_offset):
+    seed_penalties(20)
+    first_day = date.today() + timedelta(days=first_offset)
+    second_day = date.today() + timedelta(days=second_offset)
+    first_booked = threading.Event()
+    committed = []
+    
+    def hold_transaction():
+        # Keep the first transaction open while the second worker books the same day and player
+        first_booked.set()
+        time.sleep(0.5)
+    
+    first = threading.Thread(target=book_penalty, args=(1, first_day, committed, hold_transaction))
+    second = threading.Thread(target=lambda: first_booked.wait() and book_penalty(1, second_day, committed))
+    first.start()
+    second.start()
+    first.join()
+    second.join()
+    
+    assert committed == [1, 1]
+    assert app_module.rebuild_aggregates() == 0
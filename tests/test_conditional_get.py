@@ -0,0 +1,39 @@
+"""
+Conditional GET: pages are answered with 304 until a write changes the data version
+"""
+
+from sqlalchemy import event
+
+import app as app_module
+
+
+def test_etag_changes_right_after_a_write(client, seed_penalties):
+    seed_penalties(10)
+    etag = client.get('/penalties').headers['ETag']
+    
+    assert client.get('/penalties', headers={'If-None-Match': etag}).status_code == 304
+    
+    penalty = app_module.Penalty.query.first()
+    client.post('/delete_penalty', data={'penalty_id': penalty.id})
+    with client.session_transaction() as flask_session:
+        flask_session.pop('_flashes', None)
+    response = client.get('/penalties', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_data_version_is_cached_between_requests(database):
+    app_module.data_version_cache.get()
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(database, 'before_cursor_execute', before_cursor_execute)
+    try:
+        app_module.data_version_cache.get()
+    finally:
+        event.remove(database, 'before_cursor_execute', before_cursor_execute)
+    
+    assert statements == []
@@ -0,0 +1,81 @@
+"""
+Dashboard live stream: writes publish events, the broadcaster delivers them, the SSE stream replays them
+"""
+
+import json
+from datetime import date
+
+import app as app_module
+
+
+def book_penalty(client, player_id=1):
+    penalty_type_id = app_module.db.session.query(app_module.db.func.min(app_module.PenaltyType.id)).scalar()
+    response = client.post('/add_penalty', data={
+        'date': date.today().isoformat(),
+        'player_id': player_id,
+        'penalty_type_id': penalty_type_id,
+        'quantity': 2,
+        'notes': 'Live'
+    })
+    assert response.status_code == 302
+
+
+def last_event():
+    return app_module.DashboardEvent.query.order_by(app_module.DashboardEvent.id.desc()).first()
+
+
+def test_write_publishes_event_with_new_totals(client, seed_penalties):
+    seed_penalties(10)
+
+    book_penalty(client, player_id=3)
+    app_module.db.session.expire_all()
+    dashboard_event = last_event()
+    payload = json.loads(dashboard_event.payload)
+
+    assert dashboard_event.kind == 'penalty_added'
+    assert payload['penalty']['player_id'] == 3
+    assert payload['totals']['total_penalties'] == 11
+    assert payload['totals']['total_amount'] == app_module.ledger_total()[1]
+    assert [player['id'] for player in payload['players']] == [3]
+    assert payload['days'][-1]['date'] == date.today().isoformat()
+
+
+def test_broadcaster_delivers_committed_events(client, seed_penalties):
+    seed_penalties(10)
+    # A long interval keeps the background thread asleep, the test polls itself
+    broadcaster = app_module.DashboardBroadcaster(interval=3600)
+    subscription = broadcaster.subscribe()
+    try:
+        broadcaster.poll()
+        assert subscription.events.empty()
+
+        book_penalty(client)
+        broadcaster.poll()
+        event_id, kind, payload = subscription.events.get_nowait()
+
+        assert kind == 'penalty_added'
+        assert event_id == last_event().id
+        assert json.loads(payload)['penalty']['notes'] == 'Live'
+        # Already delivered events are not sent again
+        broadcaster.poll()
+        assert subscription.events.empty()
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def test_stream_replays_events_after_last_event_id(client, seed_penalties):
+    seed_penalties(10)
+    seen_id = last_event().id
+    book_penalty(client)
+
+    response = client.get('/api/dashboard/stream', headers={'Last-Event-ID': str(seen_id)}, buffered=False)
+    try:
+        chunks = (chunk.decode() for chunk in response.response)
+        assert next(chunks).startswith('retry:')
+        message = next(chunks)
+    finally:
+        response.close()
+
+    assert response.mimetype == 'text/event-stream'
+    assert message.startswith(f'id: {seen_id + 1}\nevent: penalty_added\ndata: ')
+    assert not app_module.dashboard_broadcaster.subscriptions
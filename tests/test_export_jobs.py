@@ -0,0 +1,139 @@
+"""
+Background export jobs (/api/jobs): status values from queued to done or failed, and the file download
+"""
+
+import csv
+import io
+import threading
+import time
+
+import openpyxl
+import pytest
+
+import app as app_module
+
+
+class RecordingExecutor:
+    """Stands in for the job pool: keeps the submitted jobs so the test runs them itself"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'EXPORT_JOB_DIR', str(tmp_path / 'exports'))
+    return tmp_path / 'exports'
+
+
+def job_status(client, job_id):
+    # The test shares its session with the requests; forget what it read before the job thread wrote
+    app_module.db.session.rollback()
+    response = client.get(f'/api/jobs/{job_id}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def wait_for_status(client, job_id, statuses, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = job_status(client, job_id)
+        if job['status'] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def blocking_kind(kind, started, release):
+    """The job kind with a runner that waits for release before doing the real export"""
+    def run(path, params, report_progress):
+        started.set()
+        release.wait(timeout=30)
+        kind.run(path, params, report_progress)
+    return kind._replace(run=run)
+
+
+def test_csv_job_moves_from_queued_to_done(client, seed_penalties, job_dir, monkeypatch):
+    seed_penalties(40)
+    executor = RecordingExecutor()
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(app_module, 'export_executor', executor)
+    monkeypatch.setitem(app_module.EXPORT_JOB_KINDS, 'csv',
+                        blocking_kind(app_module.EXPORT_JOB_KINDS['csv'], started, release))
+
+    response = client.post('/api/jobs', json={'kind': 'csv', 'player': '1'})
+    job = response.get_json()
+
+    assert response.status_code == 202
+    assert response.headers['Location'].endswith(f'/api/jobs/{job["id"]}')
+    assert (job['status'], job['progress'], job['download_url']) == ('queued', 0, None)
+    assert client.get(f'/api/jobs/{job["id"]}/download').status_code == 409
+
+    fn, args = executor.submitted[0]
+    worker = threading.Thread(target=fn, args=args)
+    worker.start()
+    try:
+        assert started.wait(timeout=30)
+        running = job_status(client, job['id'])
+        assert running['status'] == 'running'
+        assert running['started_at'] is not None
+        assert client.get(f'/api/jobs/{job["id"]}/download').get_json()['status'] == 'running'
+    finally:
+        release.set()
+        worker.join()
+
+    done = job_status(client, job['id'])
+    assert (done['status'], done['progress']) == ('done', 100)
+    assert done['finished_at'] is not None
+
+    download = client.get(done['download_url'])
+    rows = list(csv.reader(io.StringIO(download.get_data(as_text=True)), delimiter=';'))
+    player_name = app_module.db.session.get(app_module.Player, 1).name
+    assert download.mimetype == 'text/csv'
+    assert rows[0][:3] == ['Datum', 'Spieler', 'Vergehen']
+    assert len(rows) - 1 == app_module.Penalty.query.filter_by(player_id=1).count()
+    assert {row[1] for row in rows[1:]} == {player_name}
+    assert sorted(path.name for path in job_dir.iterdir()) == [job['id'] + '.csv']
+
+
+def test_failed_job_reports_the_error(client, job_dir, monkeypatch):
+    executor = RecordingExecutor()
+    monkeypatch.setattr(app_module, 'export_executor', executor)
+
+    def fail(path, params, report_progress):
+        with open(path, 'w') as partial:
+            partial.write('halb')
+        raise RuntimeError('Festplatte voll')
+
+    kind = app_module.EXPORT_JOB_KINDS['csv']
+    monkeypatch.setitem(app_module.EXPORT_JOB_KINDS, 'csv', kind._replace(run=fail))
+
+    job = client.post('/api/jobs', json={'kind': 'csv'}).get_json()
+    fn, args = executor.submitted[0]
+    fn(*args)
+
+    failed = job_status(client, job['id'])
+    assert (failed['status'], failed['error']) == ('failed', 'Festplatte voll')
+    assert failed['download_url'] is None
+    assert client.get(f'/api/jobs/{job["id"]}/download').status_code == 409
+    assert list(job_dir.iterdir()) == []
+
+
+def test_workbook_job_runs_in_the_pool(client, seed_penalties, job_dir):
+    seed_penalties(25)
+
+    job = client.post('/api/jobs', json={'kind': 'xlsx'}).get_json()
+    done = wait_for_status(client, job['id'], ('done', 'failed'))
+
+    assert done['status'] == 'done', done['error']
+    download = client.get(done['download_url'])
+    workbook = openpyxl.load_workbook(io.BytesIO(download.get_data()), read_only=True)
+    erfassung = list(workbook['Erfassung'].iter_rows(min_row=3, values_only=True))
+    assert sum(1 for row in erfassung if row[0] is not None) == 25
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get('/api/jobs/unbekannt').status_code == 404
+    assert client.get('/api/jobs/unbekannt/download').status_code == 404
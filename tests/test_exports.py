@@ -0,0 +1,240 @@
+"""
+CSV export: filters are validated before the streamed response starts; the workbook builders and the
+command line export of Erfassung sheets
+"""
+
+import csv
+import os
+import subprocess
+import sys
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+import build_strafenlog
+import export_csv
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(build_strafenlog.__file__))
+PLAYERS = ['Anna Huber', 'Ben Moser']
+PENALTY_TYPES = [('Zu spät', 2.5, 'Training'), ('Handy', 1.0, 'Kabine')]
+
+
+def write_erfassung_workbook(path, rows):
+    """Workbook with just the Erfassung sheet; None stands for an unused template row (Anzahl 1, Gesamt 0)"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Erfassung'
+    sheet.append(['Exportiert'])
+    sheet.append(['Datum', 'Spieler', 'Vergehen', 'Anzahl', 'Einzelbetrag (€)', 'Gesamt (€)', 'Notiz'])
+    for row in rows:
+        sheet.append(row or (None, None, None, 1, None, 0, None))
+    workbook.save(path)
+    return str(path)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return list(csv.reader(csvfile, delimiter=';'))
+
+
+def statistik_tables(path):
+    """Player and penalty type rows of the Statistik tables as {name: (sum, count)}"""
+    workbook = openpyxl.load_workbook(path)
+    rows = list(workbook['Statistik'].iter_rows(min_row=12, max_row=13, max_col=9, values_only=True))
+    return {row[0]: (row[1], row[2]) for row in rows}, {row[5]: (row[6], row[7]) for row in rows}
+
+
+def run_script(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+
+def penalty_rows(day=None):
+    day = day or date.today()
+    return [
+        (day, 'Anna Huber', 'Zu spät', 2, 2.5, 5.0, 'Bus verpasst'),
+        (day, 'Ben Moser', 'Handy', 1, 1.0, 1.0, None),
+        (day, 'Anna Huber', 'Handy', 3, 1.0, 3.0, None),
+    ]
+
+
+@pytest.mark.parametrize('query', ['date_from=2024-13-01', 'date_to=gestern', 'player=abc'])
+def test_export_csv_rejects_invalid_filters(client, seed_penalties, query):
+    seed_penalties(5)
+    
+    response = client.get(f'/export_csv?{query}')
+    
+    assert response.status_code == 400
+    assert response.mimetype != 'text/csv'
+
+
+def test_export_csv_applies_filters(client, seed_penalties):
+    seed_penalties(30)
+    today = date.today().isoformat()
+    
+    response = client.get(f'/export_csv?date_from={today}&date_to={today}&player=1')
+    lines = response.get_data(as_text=True).splitlines()
+    
+    assert response.status_code == 200
+    assert lines[0].startswith('Datum;Spieler;Vergehen')
+    assert len(lines) > 1
+    assert all(line.startswith(today) for line in lines[1:])
+
+
+def test_database_workbook_streams_rows_with_german_dates(tmp_path):
+    path = tmp_path / 'export.xlsx'
+    
+    count = build_strafenlog.create_database_workbook(
+        str(path), (row for row in penalty_rows(date(2024, 9, 3))), PLAYERS, PENALTY_TYPES)
+    workbook = openpyxl.load_workbook(path)
+    erfassung = workbook['Erfassung']
+    
+    assert count == 3
+    assert [cell.value for cell in erfassung[2]][:3] == ['Datum', 'Spieler', 'Vergehen']
+    assert erfassung['A3'].value == datetime(2024, 9, 3)
+    assert {erfassung[f'A{row}'].number_format for row in range(3, 6)} == {'DD.MM.YYYY'}
+    assert erfassung['G3'].value == 'Bus verpasst'
+    assert erfassung.tables['tblErfassung'].ref == 'A2:G5'
+    assert workbook.sheetnames == ['Erfassung', 'Spielerliste', 'Strafenkatalog', 'Statistik']
+
+
+def test_precomputed_statistik_holds_values(tmp_path):
+    path = tmp_path / 'export.xlsx'
+    build_strafenlog.create_database_workbook(str(path), penalty_rows(), PLAYERS, PENALTY_TYPES)
+    
+    players, penalty_types = statistik_tables(path)
+    
+    assert players == {'Anna Huber': (8, 2), 'Ben Moser': (1, 1)}
+    assert penalty_types == {'Zu spät': (5, 1), 'Handy': (4, 2)}
+
+
+def test_refresh_replaces_statistik_formulas_with_values(tmp_path):
+    path = tmp_path / 'export.xlsx'
+    build_strafenlog.create_database_workbook(str(path), penalty_rows(), PLAYERS, PENALTY_TYPES,
+                                              precomputed=False)
+    players, _ = statistik_tables(path)
+    assert players['Anna Huber'][0].startswith('=')
+    
+    result = run_script('build_strafenlog.py', '--refresh', str(path))
+    
+    assert 'aus 3 Einträgen neu berechnet' in result.stdout
+    players, penalty_types = statistik_tables(path)
+    assert players == {'Anna Huber': (8, 2), 'Ben Moser': (1, 1)}
+    assert penalty_types == {'Zu spät': (5, 1), 'Handy': (4, 2)}
+    assert openpyxl.load_workbook(path).sheetnames[3] == 'Statistik'
+
+
+def test_template_preallocates_the_requested_rows(tmp_path):
+    path = tmp_path / 'vorlage.xlsx'
+    
+    run_script('build_strafenlog.py', str(path), '--rows', '25')
+    erfassung = openpyxl.load_workbook(path)['Erfassung']
+    
+    assert erfassung.max_row == 27
+    assert erfassung.tables['tblErfassung'].ref == 'A2:G27'
+    assert erfassung['E27'].value.startswith('=IFERROR(VLOOKUP(C27,')
+    assert erfassung['F27'].value == '=IFERROR(D27*E27,0)'
+    assert {str(validation.sqref) for validation in erfassung.data_validations.dataValidation} \
+        == {'A3:A27', 'B3:B27', 'C3:C27', 'D3:D27'}
+
+
+def test_export_stops_after_the_empty_row_limit(tmp_path):
+    rows = penalty_rows(date(2024, 9, 3))
+    excel = write_erfassung_workbook(tmp_path / 'strafen.xlsx', rows[:2] + [None] * 5 + rows[2:])
+    
+    export_csv.export_penalties_to_csv(excel, str(tmp_path / 'kurz.csv'), empty_row_limit=5)
+    export_csv.export_penalties_to_csv(excel, str(tmp_path / 'alle.csv'), empty_row_limit=None)
+    
+    short, full = read_csv(tmp_path / 'kurz.csv'), read_csv(tmp_path / 'alle.csv')
+    assert short[0] == ['Datum', 'Spieler', 'Vergehen', 'Anzahl', 'Einzelbetrag (€)', 'Gesamt (€)', 'Notiz']
+    assert short[1] == ['2024-09-03', 'Anna Huber', 'Zu spät', '2', '2.5', '5', 'Bus verpasst']
+    assert len(short) == 3
+    assert full[1:] == short[1:] + [['2024-09-03', 'Anna Huber', 'Handy', '3', '1', '3', '']]
+    assert not (tmp_path / 'kurz.csv.part').exists()
+
+
+def test_filled_rows_are_read_lazily(tmp_path):
+    excel = write_erfassung_workbook(tmp_path / 'strafen.xlsx', penalty_rows() + [None] * 20)
+    workbook = openpyxl.load_workbook(excel, read_only=True, data_only=True)
+    try:
+        headers, rows = export_csv.read_erfassung(workbook)
+        counts = {}
+        filled = export_csv.iter_filled_rows(rows, len(headers), empty_row_limit=4, counts=counts)
+        
+        assert next(filled)[1] == 'Anna Huber'
+        assert counts == {'processed': 1, 'stopped': False}
+        assert len(list(filled)) == 2
+        assert counts == {'processed': 7, 'stopped': True}
+    finally:
+        workbook.close()
+
+
+def test_incremental_export_appends_only_new_rows(tmp_path):
+    rows = penalty_rows(date(2024, 9, 3)) + penalty_rows(date(2024, 9, 10))
+    excel = write_erfassung_workbook(tmp_path / 'strafen.xlsx', rows[:2])
+    target = str(tmp_path / 'export.csv')
+    
+    first = export_csv.export_penalties_incremental(excel, target)
+    unchanged = export_csv.export_penalties_incremental(excel, target)
+    os.utime(excel, ns=(0, 0))
+    touched = export_csv.export_penalties_incremental(excel, target)
+    write_erfassung_workbook(excel, rows[:5])
+    appended = export_csv.export_penalties_incremental(excel, target)
+    
+    assert first == {'status': 'rewritten', 'rows': 2, 'new_rows': 2}
+    assert unchanged == touched == {'status': 'skipped', 'rows': 2, 'new_rows': 0}
+    assert appended == {'status': 'appended', 'rows': 5, 'new_rows': 3}
+    lines = read_csv(target)
+    assert [line[0] for line in lines] == ['Datum'] + ['2024-09-03'] * 3 + ['2024-09-10'] * 2
+    assert lines[1:] == read_csv(export_csv.export_penalties_to_csv(excel, str(tmp_path / 'voll.csv')))[1:]
+    assert export_csv.load_export_state(target + '.state.json')['row_count'] == 5
+
+
+def test_incremental_export_rewrites_after_changed_rows(tmp_path):
+    rows = penalty_rows(date(2024, 9, 3))
+    excel = write_erfassung_workbook(tmp_path / 'strafen.xlsx', rows)
+    target = str(tmp_path / 'export.csv')
+    export_csv.export_penalties_incremental(excel, target)
+    
+    write_erfassung_workbook(excel, [rows[0][:3] + (4, 2.5, 10.0, None)] + rows[1:])
+    result = export_csv.export_penalties_incremental(excel, target)
+    
+    assert result == {'status': 'rewritten', 'rows': 3, 'new_rows': 3}
+    lines = read_csv(target)
+    assert len(lines) == 4
+    assert lines[1][3:6] == ['4', '2.5', '10']
+
+
+def test_batch_export_merges_workbooks_with_source_column(tmp_path):
+    rows = penalty_rows(date(2024, 9, 3))
+    season = tmp_path / 'saisons'
+    season.mkdir()
+    first = write_erfassung_workbook(season / 'Strafen_2023.xlsx', rows[:1])
+    second = write_erfassung_workbook(season / 'Strafen_2024.xlsx', rows[1:])
+    write_erfassung_workbook(season / '~$Strafen_2024.xlsx', rows)
+    (season / 'notizen.txt').write_text('keine Arbeitsmappe')
+    
+    workbooks = export_csv.find_workbooks([str(season), second])
+    results = export_csv.export_workbooks(workbooks, merged_filename=str(tmp_path / 'alle.csv'), workers=2)
+    
+    assert workbooks == [os.path.normpath(first), os.path.normpath(second)]
+    assert [(result['status'], result['error']) for result in results] == [('exported', None)] * 2
+    merged = read_csv(tmp_path / 'alle.csv')
+    assert merged[0][-2:] == ['Notiz', 'Quelle']
+    assert [(row[1], row[-1]) for row in merged[1:]] == [
+        ('Anna Huber', 'Strafen_2023.xlsx'), ('Ben Moser', 'Strafen_2024.xlsx'), ('Anna Huber', 'Strafen_2024.xlsx')
+    ]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['alle.csv', 'saisons']
+
+
+def test_batch_export_writes_one_csv_per_workbook(tmp_path):
+    rows = penalty_rows(date(2024, 9, 3))
+    workbooks = [write_erfassung_workbook(tmp_path / f'Team_{team}.xlsx', rows) for team in 'AB']
+    output_dir = tmp_path / 'csv'
+    output_dir.mkdir()
+    
+    results = export_csv.export_workbooks(workbooks, output_dir=str(output_dir), workers=1)
+    
+    assert [result['validation']['row_count'] for result in results] == [3, 3]
+    assert sorted(path.name for path in output_dir.iterdir()) == ['Team_A.csv', 'Team_B.csv']
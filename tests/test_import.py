@@ -0,0 +1,84 @@
+"""
+Import of Erfassung rows (CSV export or workbook): name resolution, batching, re-imports and invalid rows
+"""
+
+import csv
+
+import app as app_module
+
+
+def write_import_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(app_module.IMPORT_COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def import_rows():
+    player = app_module.DEFAULT_PLAYERS[0]
+    penalty_type = app_module.DEFAULT_PENALTY_TYPES[4][0]
+    return [
+        ['2024-09-01', player, penalty_type, '1', '2,00', '2,00', ''],
+        ['2024-09-01', player, penalty_type, '1', '2,00', '2,00', ''],
+        ['01.09.2024', 'Neuer Spieler', penalty_type, '2', '', '4,00', 'Notiz'],
+        ['2024-09-08', player, 'Neues Vergehen', '', '3,50', '', ''],
+        ['2024-09-15', 'Neuer Spieler', 'Neues Vergehen', '3', '', '', ''],
+    ]
+
+
+def test_import_creates_missing_players_and_penalty_types(database, tmp_path):
+    path = write_import_csv(tmp_path / 'import.csv', import_rows())
+    players_before = app_module.Player.query.count()
+
+    summary = app_module.import_file(path, path)
+
+    assert (summary['rows'], summary['inserted'], summary['errors']) == (5, 5, [])
+    assert (summary['players_created'], summary['penalty_types_created']) == (1, 1)
+    assert app_module.Player.query.count() == players_before + 1
+    new_type = app_module.PenaltyType.query.filter_by(name='Neues Vergehen').one()
+    assert new_type.amount == 3.5
+    # The total of a row without Einzelbetrag gives the rate, the catalog rate books the others
+    amounts = sorted(penalty.total_amount for penalty in app_module.Penalty.query.all())
+    assert amounts == [2.0, 2.0, 3.5, 4.0, 10.5]
+
+
+def test_import_inserts_in_batches_and_keeps_the_aggregates(database, tmp_path):
+    path = write_import_csv(tmp_path / 'import.csv', import_rows())
+
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        summary = app_module.import_penalties(*app_module.read_csv_rows(csvfile), batch_size=2)
+
+    assert summary['inserted'] == 5
+    assert app_module.Penalty.query.count() == 5
+    assert app_module.rebuild_aggregates() == 0
+
+
+def test_reimport_inserts_nothing_and_counts_duplicates(database, tmp_path):
+    path = write_import_csv(tmp_path / 'import.csv', import_rows())
+    app_module.import_file(path, path)
+
+    summary = app_module.import_file(path, path)
+
+    assert (summary['inserted'], summary['duplicates']) == (0, 5)
+    assert (summary['players_created'], summary['penalty_types_created']) == (0, 0)
+    assert app_module.Penalty.query.count() == 5
+
+
+def test_import_reports_invalid_quantities(database, tmp_path):
+    player = app_module.DEFAULT_PLAYERS[0]
+    penalty_type = app_module.DEFAULT_PENALTY_TYPES[4][0]
+    path = write_import_csv(tmp_path / 'import.csv', [
+        ['2024-09-01', player, penalty_type, '0', '2,00', '', ''],
+        ['2024-09-01', player, penalty_type, '-2', '2,00', '', ''],
+        ['2024-09-01', player, penalty_type, '1,5', '2,00', '', ''],
+        ['2024-09-01', player, 'Vergehen mit Anzahl 0', '0', '2,00', '', ''],
+        ['2024-09-01', player, penalty_type, '2', '2,00', '', ''],
+    ])
+
+    summary = app_module.import_file(path, path)
+
+    assert [error['row'] for error in summary['errors']] == [1, 2, 3, 4]
+    assert summary['inserted'] == 1
+    assert summary['penalty_types_created'] == 0
+    assert [penalty.quantity for penalty in app_module.Penalty.query.all()] == [2]
@@ -0,0 +1,94 @@
+"""
+Keyset pagination of /penalties and /api/penalties: cursors in both directions and malformed cursors
+"""
+
+import base64
+from datetime import date
+
+import pytest
+
+import app as app_module
+
+
+def api_page(client, **params):
+    response = client.get('/api/penalties', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def page_ids(page):
+    return [penalty['id'] for penalty in page['penalties']]
+
+
+def test_cursor_round_trip(client, seed_penalties):
+    seed_penalties(45)
+    
+    pages = [api_page(client, limit=10)]
+    while pages[-1]['next_cursor']:
+        pages.append(api_page(client, limit=10, cursor=pages[-1]['next_cursor']))
+    
+    assert [len(page['penalties']) for page in pages] == [10, 10, 10, 10, 5]
+    assert pages[0]['prev_cursor'] is None
+    all_ids = [penalty_id for page in pages for penalty_id in page_ids(page)]
+    assert len(set(all_ids)) == 45
+    
+    # Back from the last page to the first one
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = api_page(client, limit=10, cursor=page['prev_cursor'])
+        assert page_ids(page) == page_ids(expected)
+    assert page['prev_cursor'] is None
+    assert page_ids(api_page(client, limit=10, cursor=page['next_cursor'])) == page_ids(pages[1])
+
+
+def test_html_pages_link_both_directions(client, seed_penalties):
+    seed_penalties(45)
+    first = api_page(client)
+    
+    response = client.get('/penalties', query_string={'cursor': first['next_cursor']})
+    second = api_page(client, cursor=first['next_cursor'])
+    html = response.get_data(as_text=True)
+    
+    assert response.status_code == 200
+    assert second['prev_cursor'] in html and second['next_cursor'] in html
+
+
+def test_equal_dates_are_ordered_by_id(database, client):
+    amounts = dict(app_module.db.session.query(app_module.PenaltyType.id, app_module.PenaltyType.amount))
+    same_day = date(2024, 9, 1)
+    app_module.insert_penalties([
+        {'date': same_day, 'player_id': 1 + i % 5, 'penalty_type_id': min(amounts), 'quantity': 1, 'notes': ''}
+        for i in range(25)
+    ], amounts)
+    app_module.db.session.commit()
+    
+    ids = []
+    cursor = None
+    while True:
+        page = api_page(client, limit=7, **({'cursor': cursor} if cursor else {}))
+        ids += page_ids(page)
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    assert len(ids) == 25
+    assert ids == sorted(ids, reverse=True)
+
+
+def encoded(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'kein-cursor!',
+    'äöü',
+    encoded('2024-09-01'),
+    encoded('gestern|12'),
+    encoded('2024-09-01|zwölf'),
+    encoded('2024-09-01|12|older'),
+])
+@pytest.mark.parametrize('url', ['/penalties', '/api/penalties'])
+def test_malformed_cursor_is_rejected(client, url, cursor):
+    response = client.get(url, query_string={'cursor': cursor})
+    
+    assert response.status_code == 400
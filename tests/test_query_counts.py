@@ -0,0 +1,47 @@
+"""
+The list routes must run a fixed number of SQL statements, however many penalties there are
+(guards against lazy loads and per-row queries creeping back in)
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# Maximum statements per request, including the session/version lookups and cold reference caches
+STATEMENT_CAPS = {
+    '/': 7,
+    '/penalties': 7,
+    '/export_csv': 2,
+    '/api/penalties': 2,
+}
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect every SQL statement executed on the engine inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.mark.parametrize('n_penalties', [10, 250])
+@pytest.mark.parametrize('url', list(STATEMENT_CAPS))
+def test_list_route_statement_cap(database, client, seed_penalties, url, n_penalties):
+    seed_penalties(n_penalties)
+    
+    with count_statements(database) as statements:
+        response = client.get(url)
+        # Streamed responses run their queries while the body is read
+        response.get_data()
+    
+    assert response.status_code == 200
+    assert len(statements) <= STATEMENT_CAPS[url], \
+        f'{url} executed {len(statements)} SQL statements (max {STATEMENT_CAPS[url]}):\n' + '\n'.join(statements)
@@ -0,0 +1,61 @@
+"""
+The route queries must be answered from indexes: EXPLAIN QUERY PLAN (SQLite) of the queries the
+routes actually build may not contain a full scan of the penalty table
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+
+DATE_FROM = date.today() - timedelta(days=90)
+DATE_TO = date.today()
+PAGE = app_module.PENALTIES_PER_PAGE + 1
+
+
+def list_query(player=None, date_from=None, date_to=None, after_cursor=False, newer_cursor=False):
+    """The /penalties page query (penalty_page() fetches one extra row)"""
+    filters = {
+        'player': player,
+        'date_from': date_from and date_from.strftime('%Y-%m-%d'),
+        'date_to': date_to and date_to.strftime('%Y-%m-%d')
+    }
+    cursor = None
+    if after_cursor or newer_cursor:
+        cursor = app_module.encode_cursor(app_module.Penalty(id=1, date=DATE_FROM), newer=newer_cursor)
+    return app_module.penalty_list_query(filters, cursor).limit(PAGE)
+
+
+# Query builders of the routes, called inside the app context of the test
+ROUTE_QUERIES = {
+    'dashboard recent penalties': lambda: app_module.recent_penalties_query(),
+    'penalties': lambda: list_query(),
+    'penalties by date range': lambda: list_query(date_from=DATE_FROM, date_to=DATE_TO),
+    'penalties by player': lambda: list_query(player=1),
+    'penalties by player and date range': lambda: list_query(player=1, date_from=DATE_FROM, date_to=DATE_TO),
+    'penalties after cursor': lambda: list_query(after_cursor=True),
+    'penalties by player after cursor': lambda: list_query(player=1, after_cursor=True),
+    'penalties before newer cursor': lambda: list_query(newer_cursor=True),
+    'penalties by player before newer cursor': lambda: list_query(player=1, newer_cursor=True),
+    'statistics': lambda: app_module.statistics_query(DATE_FROM, DATE_TO),
+}
+
+
+def query_plan(query):
+    """EXPLAIN QUERY PLAN details of an ORM query"""
+    db = app_module.db
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}'))]
+
+
+@pytest.mark.parametrize('name', list(ROUTE_QUERIES))
+def test_route_query_uses_index(database, seed_penalties, name):
+    if database.dialect.name != 'sqlite':
+        pytest.skip('EXPLAIN QUERY PLAN is SQLite only')
+    seed_penalties(50)
+    
+    plan = query_plan(ROUTE_QUERIES[name]())
+    # "SCAN penalty USING INDEX ..." only walks an index; a bare "SCAN penalty" reads the whole table
+    scans = [step for step in plan if step.startswith('SCAN penalty') and 'USING' not in step]
+    assert not scans, f'{name} scans the penalty table: {" | ".join(plan)}'